@@ -0,0 +1,240 @@
+"""接口数据捕获模块 - 监听页面的接口响应，直接解析搜索结果和笔记详情的 JSON 数据"""
+
+import asyncio
+import time
+from datetime import datetime
+
+# 搜索结果、笔记详情和评论接口路径
+SEARCH_API_PATH = "/api/sns/web/v1/search/notes"
+FEED_API_PATH = "/api/sns/web/v1/feed"
+COMMENT_API_PATH = "/api/sns/web/v2/comment/page"
+SUB_COMMENT_API_PATH = "/api/sns/web/v2/comment/sub/page"
+
+# 读取服务端渲染的初始状态，直接打开笔记页面时笔记数据不会通过接口返回
+_INITIAL_NOTE_STATE_JS = '''
+    () => {
+        try {
+            const state = window.__INITIAL_STATE__;
+            const map = state && state.note && state.note.noteDetailMap;
+            if (!map) return null;
+            const raw = map._rawValue || map._value || map;
+            const items = [];
+            for (const key of Object.keys(raw)) {
+                const entry = raw[key];
+                const note = entry && (entry.note || (entry._rawValue && entry._rawValue.note));
+                if (note && (note.noteId || note.note_id)) {
+                    items.push({ id: note.noteId || note.note_id, note_card: JSON.parse(JSON.stringify(note)) });
+                }
+            }
+            return items.length ? { data: { items } } : null;
+        } catch (e) {
+            return null;
+        }
+    }
+'''
+
+def _pick(data: dict, *keys, default=None):
+    """按顺序取第一个存在的键，兼容接口的下划线命名和初始状态的驼峰命名"""
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ""):
+            return value
+    return default
+
+def _parse_interact_info(card: dict) -> dict:
+    """解析互动数据"""
+    info = _pick(card, "interact_info", "interactInfo", default={}) or {}
+    return {
+        "liked_count": _pick(info, "liked_count", "likedCount", default=""),
+        "collected_count": _pick(info, "collected_count", "collectedCount", default=""),
+        "comment_count": _pick(info, "comment_count", "commentCount", default=""),
+        "shared_count": _pick(info, "shared_count", "shareCount", default="")
+    }
+
+def parse_search_items(payload: dict) -> list:
+    """解析搜索接口返回的笔记列表
+
+    Returns:
+        list: 每项包含 note_id、xsec_token、title、author 及互动数据
+    """
+    items = ((payload or {}).get("data") or {}).get("items") or []
+    results = []
+    for item in items:
+        card = item.get("note_card") or {}
+        note_id = item.get("id")
+        if not note_id or (item.get("model_type") not in (None, "note")):
+            continue
+        user = card.get("user") or {}
+        record = {
+            "note_id": note_id,
+            "xsec_token": item.get("xsec_token", ""),
+            "title": _pick(card, "display_title", "title", default=""),
+            "author": _pick(user, "nickname", "nick_name", default=""),
+            "note_type": card.get("type", "")
+        }
+        record.update(_parse_interact_info(card))
+        results.append(record)
+    return results
+
+def parse_note_feed(payload: dict) -> list:
+    """解析笔记详情接口（或初始状态）返回的笔记
+
+    Returns:
+        list: 每项包含 note_id、title、author、publish_time、content 及互动数据
+    """
+    items = ((payload or {}).get("data") or {}).get("items") or []
+    results = []
+    for item in items:
+        card = item.get("note_card") or {}
+        note_id = _pick(card, "note_id", "noteId", default=item.get("id"))
+        if not note_id:
+            continue
+        user = card.get("user") or {}
+        publish_time = card.get("time")
+        if isinstance(publish_time, (int, float)) and publish_time > 0:
+            publish_time = datetime.fromtimestamp(publish_time / 1000).strftime("%Y-%m-%d %H:%M")
+        record = {
+            "note_id": note_id,
+            "xsec_token": _pick(card, "xsec_token", "xsecToken", default=item.get("xsec_token", "")),
+            "title": _pick(card, "title", "display_title", default=""),
+            "author": _pick(user, "nickname", "nick_name", default=""),
+            "publish_time": publish_time or "",
+            "content": _pick(card, "desc", default=""),
+            "ip_location": _pick(card, "ip_location", "ipLocation", default="")
+        }
+        record.update(_parse_interact_info(card))
+        results.append(record)
+    return results
+
+def _parse_comment(comment: dict, parent_id: str = None) -> dict:
+    """解析单条评论，parent_id 为空时取被回复评论的ID"""
+    user = _pick(comment, "user_info", "userInfo", default={}) or {}
+    target = _pick(comment, "target_comment", "targetComment", default={}) or {}
+    created_at = _pick(comment, "create_time", "createTime", default=0)
+    publish_time = ""
+    if isinstance(created_at, (int, float)) and created_at > 0:
+        publish_time = datetime.fromtimestamp(created_at / 1000).strftime("%Y-%m-%d %H:%M")
+    else:
+        created_at = 0
+    return {
+        "comment_id": comment.get("id"),
+        "parent_id": parent_id or target.get("id"),
+        "author": _pick(user, "nickname", "nick_name", default=""),
+        "content": comment.get("content", ""),
+        "publish_time": publish_time,
+        "created_at": int(created_at),
+        "like_count": _pick(comment, "like_count", "likeCount", default=""),
+        "reply_count": _pick(comment, "sub_comment_count", "subCommentCount", default="")
+    }
+
+def parse_comments(payload: dict) -> list:
+    """解析评论接口（一级评论或展开回复）返回的评论
+    
+    一级评论中内嵌的回复一并展开，回复的 parent_id 为所属一级评论ID；
+    展开回复接口返回的回复 parent_id 为被回复评论的ID。
+    
+    Returns:
+        list: 每项包含 comment_id、parent_id、author、content、publish_time、created_at 及点赞数、回复数
+    """
+    comments = ((payload or {}).get("data") or {}).get("comments") or []
+    results = []
+    for comment in comments:
+        if not comment.get("id"):
+            continue
+        results.append(_parse_comment(comment))
+        for reply in _pick(comment, "sub_comments", "subComments", default=[]) or []:
+            if reply.get("id"):
+                results.append(_parse_comment(reply, parent_id=comment["id"]))
+    return results
+
+class ResponseCapture:
+    """监听页面上指定路径的接口响应，解析后按 key 字段（默认 note_id）去重累积
+
+    页面来自页面池，退出上下文时会移除监听器，避免影响下一次调用。
+
+    用法:
+        async with ResponseCapture(page, SEARCH_API_PATH, parse_search_items) as capture:
+            await page.goto(url)
+            await capture.wait_for_items(limit, timeout)
+    """
+
+    def __init__(self, page, path: str, parser, key: str = "note_id"):
+        self.page = page
+        self.path = path
+        self.parser = parser
+        self.key = key
+        self.items = []
+        self.has_more = True
+        self._seen_ids = set()
+        self._tasks = []
+        self._updated = asyncio.Event()
+
+    async def __aenter__(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        return False
+
+    def _on_response(self, response):
+        if self.path in response.url and response.status == 200:
+            self._tasks.append(asyncio.ensure_future(self._parse(response)))
+
+    async def _parse(self, response):
+        try:
+            payload = await response.json()
+        except Exception as e:
+            print(f"解析接口响应时出错: {str(e)}")
+            return
+        self.add_payload(payload)
+
+    def add_payload(self, payload) -> int:
+        """解析一份 JSON 数据并累积新的条目，返回新增数量"""
+        added = 0
+        data = (payload or {}).get("data") if isinstance(payload, dict) else None
+        if isinstance(data, dict) and data.get("has_more") is False:
+            self.has_more = False
+        try:
+            records = self.parser(payload)
+        except Exception as e:
+            print(f"解析接口数据时出错: {str(e)}")
+            return 0
+        for record in records:
+            if record[self.key] in self._seen_ids:
+                continue
+            self._seen_ids.add(record[self.key])
+            self.items.append(record)
+            added += 1
+        if added:
+            self._updated.set()
+        return added
+
+    async def wait_for_items(self, count: int, timeout: int) -> bool:
+        """等待累积条目达到 count，超时（毫秒）返回False"""
+        deadline = time.monotonic() + timeout / 1000
+        while len(self.items) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._updated.clear()
+            try:
+                await asyncio.wait_for(self._updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def capture_initial_note_state(self) -> int:
+        """从笔记页面的服务端渲染初始状态中读取笔记数据"""
+        try:
+            payload = await self.page.evaluate(_INITIAL_NOTE_STATE_JS)
+        except Exception as e:
+            print(f"读取页面初始状态时出错: {str(e)}")
+            return 0
+        return self.add_payload(payload) if payload else 0
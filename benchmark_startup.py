@@ -0,0 +1,136 @@
+"""MCP 服务器启动性能测试
+
+以 MCP 客户端的方式通过 stdio 启动服务器，测量从启动进程到收到 tools/list 响应的耗时，
+以及服务器进程的峰值内存占用。多次运行后输出最小值、中位数和最大值。
+
+用法:
+    python benchmark_startup.py              # 默认运行5次
+    python benchmark_startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "xiaohongshu_mcp.py")
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def _send(process, message: dict):
+    process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+    process.stdin.flush()
+
+def _read_response(process, request_id: int) -> dict:
+    """读取指定ID的 JSON-RPC 响应，跳过通知和非 JSON 输出"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("服务器在响应前退出")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("id") == request_id:
+            return message
+
+class _PeakMemorySampler(threading.Thread):
+    """后台采样进程的常驻内存，记录峰值（需要 psutil）"""
+
+    def __init__(self, pid: int, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                info = self.process.memory_info()
+                # Windows 直接提供峰值工作集
+                self.peak = max(self.peak, getattr(info, "peak_wset", 0) or info.rss)
+            except psutil.Error:
+                break
+            self._stopped.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stopped.set()
+        self.join()
+        return self.peak
+
+def run_once() -> dict:
+    """启动一次服务器，返回 tools/list 耗时（毫秒）、工具数量和峰值内存（MB）"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    sampler = _PeakMemorySampler(process.pid) if psutil else None
+    if sampler:
+        sampler.start()
+
+    try:
+        _send(process, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "startup-benchmark", "version": "1.0"}
+            }
+        })
+        _read_response(process, 1)
+        _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        response = _read_response(process, 2)
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        peak = sampler.stop() if sampler else 0
+        process.stdin.close()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    if not sampler and os.name != "nt":
+        # 没有 psutil 时退回到子进程资源统计（Linux 单位为KB，macOS 为字节）
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024
+
+    return {
+        "list_tools_ms": elapsed,
+        "tool_count": len(response.get("result", {}).get("tools", [])),
+        "peak_rss_mb": peak / 1024 / 1024
+    }
+
+def _summary(values: list) -> str:
+    return f"最小 {min(values):.1f} / 中位数 {statistics.median(values):.1f} / 最大 {max(values):.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="测量 MCP 服务器启动到响应工具列表的耗时和峰值内存")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数，默认5次")
+    args = parser.parse_args()
+
+    results = []
+    for i in range(1, args.runs + 1):
+        result = run_once()
+        results.append(result)
+        print(f"第{i}次: tools/list {result['list_tools_ms']:.1f}ms，"
+              f"工具数 {result['tool_count']}，峰值内存 {result['peak_rss_mb']:.1f}MB")
+
+    print(f"\n启动到响应工具列表 (ms): {_summary([r['list_tools_ms'] for r in results])}")
+    print(f"峰值内存 (MB): {_summary([r['peak_rss_mb'] for r in results])}")
+    if not psutil:
+        print("提示: 未安装 psutil，峰值内存为所有已结束子进程中的最大值")
+
+if __name__ == "__main__":
+    main()
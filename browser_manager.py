@@ -1,71 +1,584 @@
 """浏览器管理模块 - 处理浏览器初始化、登录和状态管理"""
 
 import asyncio
+import glob
 import os
 import shutil
 import tempfile
-from playwright.async_api import async_playwright
+import time
+from contextlib import asynccontextmanager
 from config import (
-    BROWSER_DATA_DIR, TEMP_PLAYWRIGHT_DIR, PLAYWRIGHT_BROWSERS_DIR,
-    browser_context, main_page, is_logged_in
+    BROWSER_DATA_DIR, TEMP_PLAYWRIGHT_DIR, PLAYWRIGHT_BROWSERS_DIR, PAGE_POOL_SIZE, DATA_DIR,
+    HEADLESS, BROWSER_WORKERS, WORKER_PROFILES_DIR, PROFILE_CLONE_IGNORE,
+    LOGIN_CACHE_TTL, LOGIN_SESSION_COOKIE, LOGIN_INVALID_STATUS_CODES,
+    RESOURCE_BLOCK_PROFILES, DEFAULT_BLOCK_PROFILE, RESOURCE_SIZE_ESTIMATES,
+    browser_context, main_page, page_pool, is_logged_in, init_environment
 )
 import config
+from page_readiness import wait_for_page_ready, wait_for_any_selector
+
+# 浏览器启动锁，避免并发的工具调用重复启动浏览器（延迟创建以绑定到运行中的事件循环）
+_browser_lock = None
+
+# 登录状态缓存：最近一次确认登录的时间，以及当时的会话Cookie值
+_login_verified_at = 0.0
+_verified_session = None
+
+# Playwright 驱动实例，重置登录后重新启动浏览器时复用，无需重新启动驱动进程
+_playwright = None
+
+# 多实例模式下主实例之外的浏览器实例，每项为 (浏览器上下文, 页面池, 配置目录)
+_workers = []
+
+# 后台清理上次运行留下的临时文件的任务
+_cleanup_task = None
+
+# 浏览器启动耗时统计：冷启动（启动浏览器并检查登录）与热调用（浏览器已启动）分开记录
+browser_timing = {
+    "cold_starts": 0,
+    "last_cold_start_ms": 0.0,
+    "max_cold_start_ms": 0.0,
+    "warm_calls": 0,
+    "total_warm_ms": 0.0,
+    "max_warm_ms": 0.0,
+    "prewarmed": False,
+    "prewarm_ms": 0.0
+}
+
+# 资源拦截统计：拦截的请求数、估算节省的字节数，以及各资源类型实际观测到的平均大小
+resource_block_stats = {
+    "blocked_requests": 0,
+    "estimated_bytes_saved": 0,
+    "by_type": {}
+}
+_observed_sizes = {}
+
+class PagePool:
+    """页面池 - 在共享的持久化上下文中为每次工具调用分配独立页面
+    
+    借出页面的数量由信号量限制，归还的页面会被重置为空白页后放回池中复用。
+    """
+    
+    def __init__(self, context, size: int = PAGE_POOL_SIZE):
+        self.context = context
+        self.size = max(1, size)
+        self.in_use = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.size)
+        self._idle_pages = []
+    
+    async def acquire(self):
+        """借出一个页面，池已满时等待其他调用归还"""
+        # 排队中的调用单独计数，等待期间被取消（CancelledError）时也能正确扣减
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        try:
+            while self._idle_pages:
+                page = self._idle_pages.pop()
+                if not page.is_closed():
+                    return page
+            return await self.context.new_page()
+        except BaseException:
+            self._semaphore.release()
+            self.in_use -= 1
+            raise
+    
+    @property
+    def load(self) -> int:
+        """借出和排队等待中的页面数，用于把工具调用分派到最空闲的实例"""
+        return self.in_use + self.waiting
+    
+    async def release(self, page):
+        """归还页面，重置成功的页面放回池中，失败的页面直接关闭"""
+        try:
+            if not page.is_closed() and await self._reset_page(page):
+                self._idle_pages.append(page)
+        finally:
+            self._semaphore.release()
+            self.in_use -= 1
+    
+    async def _reset_page(self, page) -> bool:
+        """将页面重置为空白页，清除上一次调用留下的页面状态"""
+        try:
+            await page.goto("about:blank", timeout=10000)
+            return True
+        except Exception as e:
+            print(f"重置页面时出错，关闭该页面: {str(e)}")
+            try:
+                await page.close()
+            except Exception:
+                pass
+            return False
+    
+    async def prewarm(self, count: int = None):
+        """预先打开空闲页面，首次工具调用无需再创建页面"""
+        count = min(self.size, count or self.size)
+        while len(self._idle_pages) < count:
+            self._idle_pages.append(await self.context.new_page())
+    
+    async def close(self):
+        """关闭池中所有空闲页面"""
+        for page in self._idle_pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self._idle_pages.clear()
+
+def _estimate_resource_size(resource_type: str) -> int:
+    """估算被拦截资源的大小，优先使用运行中观测到的平均值"""
+    observed = _observed_sizes.get(resource_type)
+    if observed and observed[1] > 0:
+        return observed[0] // observed[1]
+    return RESOURCE_SIZE_ESTIMATES.get(resource_type, RESOURCE_SIZE_ESTIMATES["other"])
+
+def _record_observed_size(response):
+    """记录未被拦截资源的实际大小，用于估算节省的流量"""
+    length = response.headers.get("content-length")
+    if not length or not length.isdigit():
+        return
+    total, count = _observed_sizes.get(response.request.resource_type, (0, 0))
+    _observed_sizes[response.request.resource_type] = (total + int(length), count + 1)
+
+def _make_block_handler(profile: dict):
+    """根据拦截配置生成路由处理函数"""
+    resource_types = set(profile.get("resource_types", []))
+    url_keywords = tuple(profile.get("url_keywords", []))
+    
+    async def handler(route):
+        request = route.request
+        resource_type = request.resource_type
+        if resource_type in resource_types or any(k in request.url for k in url_keywords):
+            resource_block_stats["blocked_requests"] += 1
+            resource_block_stats["estimated_bytes_saved"] += _estimate_resource_size(resource_type)
+            by_type = resource_block_stats["by_type"]
+            by_type[resource_type] = by_type.get(resource_type, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    return handler
+
+def get_worker_stats() -> list:
+    """获取各浏览器实例的页面使用情况，第一项为主实例"""
+    stats = []
+    if config.page_pool is not None:
+        stats.append({"profile": BROWSER_DATA_DIR, "in_use": config.page_pool.in_use, "waiting": config.page_pool.waiting, "size": config.page_pool.size})
+    for _, worker_pool, profile_dir in _workers:
+        stats.append({"profile": profile_dir, "in_use": worker_pool.in_use, "waiting": worker_pool.waiting, "size": worker_pool.size})
+    return stats
+
+def get_resource_block_stats() -> dict:
+    """获取资源拦截统计"""
+    return {
+        "blocked_requests": resource_block_stats["blocked_requests"],
+        "estimated_bytes_saved": resource_block_stats["estimated_bytes_saved"],
+        "by_type": dict(resource_block_stats["by_type"])
+    }
+
+@asynccontextmanager
+async def acquire_page(block_profile: str = DEFAULT_BLOCK_PROFILE):
+    """从页面池借出一个独立页面，退出上下文时自动归还
+    
+    Args:
+        block_profile: 资源拦截配置名称（见 RESOURCE_BLOCK_PROFILES），
+            传入 None 表示不拦截任何资源（如发布评论）
+    
+    用法:
+        async with acquire_page() as page:
+            await page.goto(url)
+    """
+    if config.page_pool is None:
+        raise RuntimeError("浏览器尚未初始化，请先调用 ensure_browser()")
+    
+    # 多实例模式下分派到借出页面（含排队等待）最少的实例
+    pools = [config.page_pool] + [worker_pool for _, worker_pool, _ in _workers]
+    pool = min(pools, key=lambda p: p.load)
+    page = await pool.acquire()
+    handler = None
+    try:
+        profile = RESOURCE_BLOCK_PROFILES.get(block_profile) if block_profile else None
+        if profile:
+            handler = _make_block_handler(profile)
+            await page.route("**/*", handler)
+        yield page
+    finally:
+        if handler is not None:
+            try:
+                await page.unroute("**/*", handler)
+            except Exception:
+                pass
+        await pool.release(page)
+
+def _get_browser_lock():
+    """获取浏览器启动锁"""
+    global _browser_lock
+    if _browser_lock is None:
+        _browser_lock = asyncio.Lock()
+    return _browser_lock
+
+def _record_browser_timing(cold: bool, elapsed_ms: float):
+    """记录一次 ensure_browser 的耗时"""
+    if cold:
+        browser_timing["cold_starts"] += 1
+        browser_timing["last_cold_start_ms"] = elapsed_ms
+        browser_timing["max_cold_start_ms"] = max(browser_timing["max_cold_start_ms"], elapsed_ms)
+    else:
+        browser_timing["warm_calls"] += 1
+        browser_timing["total_warm_ms"] += elapsed_ms
+        browser_timing["max_warm_ms"] = max(browser_timing["max_warm_ms"], elapsed_ms)
+
+def get_browser_timing() -> dict:
+    """获取浏览器冷启动和热调用的耗时统计"""
+    timing = dict(browser_timing)
+    timing["avg_warm_ms"] = timing["total_warm_ms"] / timing["warm_calls"] if timing["warm_calls"] else 0.0
+    return timing
 
 async def ensure_browser():
     """确保浏览器已启动并登录"""
-    global browser_context, main_page, is_logged_in
+    started = time.perf_counter()
+    async with _get_browser_lock():
+        cold = browser_context is None
+        result = await _ensure_browser_locked()
+    _record_browser_timing(cold, (time.perf_counter() - started) * 1000)
+    return result
+
+async def prewarm_browser() -> bool:
+    """预热浏览器：启动浏览器、打开页面池页面并检查登录状态，在服务器启动时于后台执行
+    
+    Returns:
+        bool: 是否已登录
+    """
+    started = time.perf_counter()
+    try:
+        logged_in = await ensure_browser()
+        if config.page_pool is not None:
+            await config.page_pool.prewarm()
+    except Exception as e:
+        print(f"预热浏览器时出错: {str(e)}")
+        return False
+    browser_timing["prewarmed"] = True
+    browser_timing["prewarm_ms"] = (time.perf_counter() - started) * 1000
+    print(f"🔥 浏览器预热完成，用时 {browser_timing['prewarm_ms']:.0f}ms，登录状态: {'已登录' if logged_in else '未登录'}")
+    return logged_in
+
+def _remove_entry(path: str):
+    """删除单个文件或目录"""
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+async def _remove_paths(paths: list):
+    """逐个删除目录中的条目，每个条目在线程中删除，不阻塞事件循环"""
+    for path in paths:
+        if not os.path.isdir(path):
+            await asyncio.to_thread(_remove_entry, path)
+            continue
+        try:
+            entries = await asyncio.to_thread(os.listdir, path)
+        except OSError:
+            continue
+        for entry in entries:
+            await asyncio.to_thread(_remove_entry, os.path.join(path, entry))
+        await asyncio.to_thread(_remove_entry, path)
+
+async def _cleanup_temp_dirs():
+    """清理上次运行留下的临时文件
+    
+    先把旧目录重命名移走（瞬间完成）并重新创建空的临时目录，再在后台逐步删除移走的目录；
+    无法重命名（如被占用）的目录在启动浏览器前删除，删除同样在线程中进行。
+    """
+    global _cleanup_task
+    
+    targets = [TEMP_PLAYWRIGHT_DIR]
+    targets += glob.glob(os.path.join(os.environ.get('TEMP', ''), 'playwright-artifacts*'))
+    # 上次运行未删完的目录
+    trash = glob.glob(f"{TEMP_PLAYWRIGHT_DIR}.trash-*")
+    blocking = []
+    for path in targets:
+        if not os.path.exists(path):
+            continue
+        moved = f"{path}.trash-{int(time.time() * 1000)}"
+        try:
+            os.rename(path, moved)
+            trash.append(moved)
+        except OSError:
+            blocking.append(path)
+    
+    if blocking:
+        await _remove_paths(blocking)
+    os.makedirs(TEMP_PLAYWRIGHT_DIR, exist_ok=True)
+    
+    if trash and (_cleanup_task is None or _cleanup_task.done()):
+        _cleanup_task = asyncio.ensure_future(_remove_paths(trash))
+
+def _worker_count() -> int:
+    """浏览器实例数，BROWSER_WORKERS 为0时按CPU核数"""
+    return max(1, BROWSER_WORKERS or os.cpu_count() or 1)
+
+# 配置目录中记录克隆时间（实例目录）或上次重新登录时间（主配置目录）的标记文件
+_PROFILE_STAMP = ".profile_stamp"
+
+def _profile_stamp_time(profile_dir: str):
+    """读取配置目录标记文件的修改时间，没有标记时返回None"""
+    try:
+        return os.path.getmtime(os.path.join(profile_dir, _PROFILE_STAMP))
+    except OSError:
+        return None
+
+def _touch_profile_stamp(profile_dir: str):
+    """更新配置目录的标记文件"""
+    with open(os.path.join(profile_dir, _PROFILE_STAMP), "w"):
+        pass
+
+def _needs_clone(target: str) -> bool:
+    """实例配置目录不存在，或克隆时间早于主配置目录上次重新登录时才需要重新克隆
+
+    Chrome 每次运行都会改写配置目录中的文件，因此不按文件修改时间比较；
+    实例运行期间的登录变化由 _sync_worker_cookies 同步，同步后的Cookie会保存在实例自己的配置目录中。
+    """
+    cloned_at = _profile_stamp_time(target)
+    if cloned_at is None:
+        return True
+    seed_changed_at = _profile_stamp_time(BROWSER_DATA_DIR)
+    return seed_changed_at is not None and seed_changed_at > cloned_at
+
+def _clone_profile(target: str):
+    """从主配置目录克隆出实例配置目录（跳过锁文件和缓存），已有的旧克隆会被替换"""
+    if os.path.exists(target):
+        shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(BROWSER_DATA_DIR, target, ignore=shutil.ignore_patterns(*PROFILE_CLONE_IGNORE))
+    _touch_profile_stamp(target)
+
+async def _prepare_worker_profiles() -> list:
+    """在主实例启动前（主配置目录未被占用时）为缺少或过期的实例克隆配置目录，返回配置目录列表"""
+    os.makedirs(WORKER_PROFILES_DIR, exist_ok=True)
+    profiles = [os.path.join(WORKER_PROFILES_DIR, f"worker-{i}") for i in range(1, _worker_count())]
+    if os.path.isdir(BROWSER_DATA_DIR):
+        stale = [profile for profile in profiles if _needs_clone(profile)]
+        if stale:
+            print(f"克隆浏览器配置目录: {len(stale)} 个")
+            await asyncio.gather(*(asyncio.to_thread(_clone_profile, profile) for profile in stale))
+    return profiles
+
+async def _launch_worker(profile_dir: str):
+    """启动一个附加浏览器实例"""
+    context = await _launch_context(profile_dir)
+    context.on("response", _on_context_response)
+    return context, PagePool(context, PAGE_POOL_SIZE), profile_dir
+
+async def _sync_worker_cookies():
+    """登录后把主实例的Cookie同步到其余实例，无需重新克隆配置目录"""
+    if not _workers or browser_context is None:
+        return
+    try:
+        cookies = await browser_context.cookies()
+        for context, _, _ in _workers:
+            await context.add_cookies(cookies)
+    except Exception as e:
+        print(f"同步登录状态到其他浏览器实例时出错: {str(e)}")
+
+async def _close_workers():
+    """关闭主实例之外的浏览器实例"""
+    global _workers
+    workers, _workers = _workers, []
+    for context, worker_pool, _ in workers:
+        await worker_pool.close()
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"关闭浏览器实例时出错: {str(e)}")
+
+async def _start_playwright(restart: bool = False):
+    """启动 Playwright 驱动，已启动时直接复用；restart 为True时先停止原驱动（仅在驱动本身失效时使用）
+    
+    必须在持有启动锁、且尚未并发启动各浏览器实例时调用，保证所有实例共用同一个驱动。
+    """
+    global _playwright
+    
+    if _playwright is not None and not restart:
+        return _playwright
+    if _playwright is not None:
+        try:
+            await _playwright.stop()
+        except Exception:
+            pass
+        _playwright = None
+    
+    # 启动Playwright（首次启动浏览器时才导入，避免拖慢服务器启动）
+    from playwright.async_api import async_playwright
+    _playwright = await async_playwright().start()
+    return _playwright
+
+async def _launch_context(user_data_dir: str = BROWSER_DATA_DIR):
+    """用已启动的 Playwright 驱动启动持久化浏览器上下文，启动失败时直接抛出异常，不影响共用的驱动"""
+    # 每个实例使用独立的磁盘缓存目录
+    cache_dir = TEMP_PLAYWRIGHT_DIR
+    if user_data_dir != BROWSER_DATA_DIR:
+        cache_dir = os.path.join(TEMP_PLAYWRIGHT_DIR, os.path.basename(user_data_dir))
+    launch_options = dict(
+        user_data_dir=user_data_dir,
+        headless=HEADLESS,
+        args=[
+            '--no-sandbox',
+            '--disable-blink-features=AutomationControlled',
+            '--disable-web-security',
+            '--disable-features=VizDisplayCompositor',
+            f'--user-data-dir={user_data_dir}',
+            f'--disk-cache-dir={cache_dir}'
+        ],
+        viewport={'width': 1280, 'height': 720}
+    )
+    return await _playwright.chromium.launch_persistent_context(**launch_options)
+
+async def _launch_all(worker_profiles: list) -> list:
+    """同时启动主实例和其余实例，返回 [主实例上下文, 实例...]，启动失败的项为异常"""
+    return await asyncio.gather(
+        _launch_context(),
+        *(_launch_worker(profile) for profile in worker_profiles),
+        return_exceptions=True
+    )
+
+async def _ensure_browser_locked():
+    """在持有启动锁的情况下启动浏览器并检查登录状态"""
+    global browser_context, main_page, page_pool, is_logged_in
     
     if browser_context is None:
-        # 强制设置当前进程的环境变量
-        # 清理可能存在的临时文件
+        # 强制设置当前进程的环境变量（必须在启动Playwright之前完成）
+        init_environment()
+        
+        # 清理可能存在的临时文件并重新创建临时目录
         try:
-            temp_dirs = [TEMP_PLAYWRIGHT_DIR, os.path.join(os.environ.get('TEMP', ''), 'playwright-artifacts*')]
-            for temp_pattern in temp_dirs:
-                if '*' in temp_pattern:
-                    import glob
-                    for path in glob.glob(temp_pattern):
-                        if os.path.exists(path):
-                            shutil.rmtree(path, ignore_errors=True)
-                elif os.path.exists(temp_pattern):
-                    shutil.rmtree(temp_pattern, ignore_errors=True)
+            await _cleanup_temp_dirs()
         except Exception as e:
             print(f"清理临时文件时出错: {e}")
+            os.makedirs(TEMP_PLAYWRIGHT_DIR, exist_ok=True)
+        
+        # 多实例模式下先克隆配置目录，再同时启动主实例和其余实例
+        worker_profiles = []
+        if _worker_count() > 1:
+            try:
+                worker_profiles = await _prepare_worker_profiles()
+            except Exception as e:
+                print(f"克隆浏览器配置目录时出错，仅启动主实例: {str(e)}")
         
-        # 重新创建临时目录
-        os.makedirs(TEMP_PLAYWRIGHT_DIR, exist_ok=True)
-        
-        # 启动Playwright
-        playwright = await async_playwright().start()
-        
-        # 启动浏览器，使用持久化上下文
-        browser_context = await playwright.chromium.launch_persistent_context(
-            user_data_dir=BROWSER_DATA_DIR,
-            headless=False,
-            args=[
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
-                f'--user-data-dir={BROWSER_DATA_DIR}',
-                f'--disk-cache-dir={TEMP_PLAYWRIGHT_DIR}'
-            ],
-            viewport={'width': 1280, 'height': 720}
-        )
-        
-        # 创建主页面
+        # 先启动（或复用）唯一的Playwright驱动，再用它同时启动各浏览器实例
+        await _start_playwright()
+        launched = await _launch_all(worker_profiles)
+        if all(isinstance(item, Exception) for item in launched):
+            # 所有实例都启动失败，说明复用的驱动可能已失效：重启驱动后再试一次
+            print(f"启动浏览器失败，重新启动Playwright驱动: {str(launched[0])}")
+            await _start_playwright(restart=True)
+            launched = await _launch_all(worker_profiles)
+        if isinstance(launched[0], Exception):
+            for worker in launched[1:]:
+                if not isinstance(worker, Exception):
+                    await worker[0].close()
+            raise launched[0]
+        browser_context = launched[0]
+        for profile, worker in zip(worker_profiles, launched[1:]):
+            if isinstance(worker, Exception):
+                print(f"启动浏览器实例 {profile} 时出错: {str(worker)}")
+            else:
+                _workers.append(worker)
+        if worker_profiles:
+            print(f"🧩 已启动 {1 + len(_workers)} 个浏览器实例（{'无头' if HEADLESS else '有界面'}模式）")
+        
+        # 创建主页面（用于登录流程），其余工具调用从页面池借用页面
         main_page = await browser_context.new_page()
+        page_pool = PagePool(browser_context, PAGE_POOL_SIZE)
+        
+        # 监听上下文内所有响应，出现登录失效信号时使缓存失效
+        browser_context.on("response", _on_context_response)
         
         # 更新全局变量
         config.browser_context = browser_context
         config.main_page = main_page
+        config.page_pool = page_pool
+    
+    # 登录状态仍在缓存有效期内，直接返回
+    if is_logged_in and time.monotonic() - _login_verified_at < LOGIN_CACHE_TTL:
+        return True
+    
+    # 缓存过期时先检查会话Cookie，Cookie未变化则无需访问首页
+    session = await _get_session_cookie()
+    if not session:
+        print("未找到登录会话Cookie，需要登录")
+        _set_logged_out()
+        return False
+    if is_logged_in and session == _verified_session:
+        _mark_login_verified(session)
+        return True
     
     # 检查登录状态
     login_status = await _check_login_status()
     return login_status
 
+def _mark_login_verified(session=None):
+    """记录已确认的登录状态"""
+    global is_logged_in, _login_verified_at, _verified_session
+    is_logged_in = True
+    config.is_logged_in = True
+    _login_verified_at = time.monotonic()
+    _verified_session = session
+
+def _set_logged_out():
+    """清除登录状态缓存"""
+    global is_logged_in, _login_verified_at, _verified_session
+    is_logged_in = False
+    config.is_logged_in = False
+    _login_verified_at = 0.0
+    _verified_session = None
+
+def invalidate_login_cache(reason: str = ""):
+    """使登录状态缓存失效，下次调用 ensure_browser() 时重新检查"""
+    if is_logged_in:
+        print(f"登录状态缓存已失效: {reason}")
+    _set_logged_out()
+
+def _on_context_response(response):
+    """浏览器上下文响应回调，检测登录失效信号并记录资源大小"""
+    try:
+        _record_observed_size(response)
+        if response.status in LOGIN_INVALID_STATUS_CODES and "xiaohongshu.com" in response.url:
+            invalidate_login_cache(f"响应状态码 {response.status}: {response.url}")
+        elif "/login" in response.url and response.request.resource_type == "document":
+            invalidate_login_cache(f"页面跳转到登录页: {response.url}")
+    except Exception as e:
+        print(f"处理响应登录信号时出错: {str(e)}")
+
+async def _get_session_cookie():
+    """读取登录会话Cookie的值，不存在时返回None"""
+    if not browser_context:
+        return None
+    
+    try:
+        cookies = await browser_context.cookies("https://www.xiaohongshu.com")
+    except Exception as e:
+        print(f"读取Cookie时出错: {str(e)}")
+        return None
+    
+    now = time.time()
+    for cookie in cookies:
+        if cookie.get("name") != LOGIN_SESSION_COOKIE:
+            continue
+        expires = cookie.get("expires", -1)
+        if expires is not None and 0 < expires < now:
+            return None
+        return cookie.get("value") or None
+    return None
+
 async def _check_login_status():
-    """检查当前登录状态"""
-    global is_logged_in, main_page
+    """访问首页检查当前登录状态"""
+    global main_page
     
     if not main_page:
         return False
@@ -73,26 +586,23 @@ async def _check_login_status():
     try:
         # 访问小红书首页检查登录状态
         await main_page.goto("https://www.xiaohongshu.com", timeout=30000)
-        await asyncio.sleep(3)
+        await wait_for_page_ready(main_page, "home")
         
         # 检查是否存在登录按钮
         login_elements = await main_page.query_selector_all('text="登录"')
         
         if login_elements:
             print("检测到需要登录")
-            is_logged_in = False
-            config.is_logged_in = False
+            _set_logged_out()
             return False
         else:
             print("检测到已登录状态")
-            is_logged_in = True
-            config.is_logged_in = True
+            _mark_login_verified(await _get_session_cookie())
             return True
             
     except Exception as e:
         print(f"检查登录状态时出错: {str(e)}")
-        is_logged_in = False
-        config.is_logged_in = False
+        _set_logged_out()
         return False
 
 async def login() -> str:
@@ -111,15 +621,15 @@ async def login() -> str:
         
         # 访问小红书登录页面
         await main_page.goto("https://www.xiaohongshu.com", timeout=60000)
-        await asyncio.sleep(3)
+        await wait_for_page_ready(main_page, "home")
         
         # 检查是否已经登录
         login_elements = await main_page.query_selector_all('text="登录"')
         
         if not login_elements:
             print("✅ 检测到已登录状态")
-            is_logged_in = True
-            config.is_logged_in = True
+            _mark_login_verified(await _get_session_cookie())
+            await _sync_worker_cookies()
             return "✅ 检测到已登录状态"
         
         print("🔑 需要登录，正在准备登录界面...")
@@ -129,12 +639,21 @@ async def login() -> str:
             login_button = await main_page.query_selector('text="登录"')
             if login_button:
                 await login_button.click()
-                await asyncio.sleep(2)
+                await wait_for_any_selector(main_page, ['.login-container', '.qrcode-img'], label="login")
                 print("✅ 已点击登录按钮")
         except Exception as e:
             print(f"点击登录按钮时出错: {str(e)}")
         
-        print("📱 请在浏览器中完成登录操作（扫码或其他方式）")
+        if HEADLESS:
+            # 无头模式下看不到浏览器窗口，把登录二维码截图保存到数据目录
+            qrcode_path = os.path.join(DATA_DIR, "login_qrcode.png")
+            try:
+                await main_page.screenshot(path=qrcode_path)
+                print(f"📷 登录二维码已保存到 {qrcode_path}，请打开图片扫码登录")
+            except Exception as e:
+                print(f"保存登录二维码截图时出错: {str(e)}")
+        else:
+            print("📱 请在浏览器中完成登录操作（扫码或其他方式）")
         print("⏳ 等待登录完成，最多等待5分钟...")
         
         # 等待登录完成（最多5分钟）
@@ -159,8 +678,14 @@ async def login() -> str:
                 await asyncio.sleep(1)
         
         if login_success:
-            is_logged_in = True
-            config.is_logged_in = True
+            _mark_login_verified(await _get_session_cookie())
+            await _sync_worker_cookies()
+            # 记录重新登录时间，之后冷启动时重新克隆早于此时间的实例配置目录
+            if _workers or _worker_count() > 1:
+                try:
+                    await asyncio.to_thread(_touch_profile_stamp, BROWSER_DATA_DIR)
+                except OSError as e:
+                    print(f"更新配置目录标记时出错: {str(e)}")
             print("✅ 登录成功！")
             return "✅ 登录成功！登录状态已保存，下次使用时无需重新登录。"
         else:
@@ -177,14 +702,20 @@ async def reset_login() -> str:
     当遇到登录相关问题时，可以使用此功能清除登录状态，
     然后重新调用login()函数进行登录。
     """
-    global is_logged_in, browser_context, main_page
+    global is_logged_in, browser_context, main_page, page_pool
     
     try:
         print("🔄 正在重置登录状态...")
         
-        # 重置登录标志
-        is_logged_in = False
-        config.is_logged_in = False
+        # 重置登录标志及登录状态缓存
+        _set_logged_out()
+        
+        # 关闭页面池中的空闲页面
+        if page_pool:
+            await page_pool.close()
+        
+        # 关闭其余浏览器实例
+        await _close_workers()
         
         # 如果浏览器上下文存在，关闭它
         if browser_context:
@@ -197,8 +728,10 @@ async def reset_login() -> str:
         # 重置全局变量
         browser_context = None
         main_page = None
+        page_pool = None
         config.browser_context = None
         config.main_page = None
+        config.page_pool = None
         
         print("✅ 登录状态已重置")
         return "✅ 登录状态已重置。请重新调用login()函数进行登录。"
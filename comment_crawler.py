@@ -0,0 +1,297 @@
+"""评论抓取模块 - 滚动评论区直到加载完毕或达到数量上限，展开楼中楼回复，按评论ID去重"""
+
+import hashlib
+from dataclasses import dataclass, asdict
+from config import (
+    EXTRACTION_MODE, PAGE_READY_TIMEOUTS, COMMENT_MAX_COMMENTS, COMMENT_MAX_SCROLLS, COMMENT_STALL_ROUNDS
+)
+from url_canonical import process_url, extract_note_id
+from api_capture import ResponseCapture, COMMENT_API_PATH, SUB_COMMENT_API_PATH, parse_comments
+from page_readiness import (
+    wait_for_page_ready, wait_for_count_growth, count_elements, SETTLE_SELECTORS, ERROR_TEXTS
+)
+
+@dataclass
+class CommentRecord:
+    """评论记录，parent_id 为空表示一级评论
+
+    created_at 为评论发布时间的毫秒时间戳，只有接口数据中才有，DOM 提取时为0。
+    """
+    __slots__ = (
+        "comment_id", "parent_id", "author", "content", "publish_time",
+        "created_at", "like_count", "reply_count"
+    )
+    comment_id: str
+    parent_id: str
+    author: str
+    content: str
+    publish_time: str
+    created_at: int
+    like_count: str
+    reply_count: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """从接口或页面提取的数据创建记录"""
+        return cls(
+            comment_id=data["comment_id"],
+            parent_id=data.get("parent_id") or None,
+            author=data.get("author") or "匿名用户",
+            content=data.get("content") or "",
+            publish_time=data.get("publish_time") or "",
+            created_at=int(data.get("created_at") or 0),
+            like_count=str(data.get("like_count") or ""),
+            reply_count=str(data.get("reply_count") or "")
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+@dataclass
+class CommentCrawlResult:
+    """一次评论抓取的结果
+
+    exhausted 表示评论区已经加载到底，为False时说明因数量上限或滚动次数停止。
+    """
+    __slots__ = ("url", "note_id", "comments", "exhausted", "error")
+    url: str
+    note_id: str
+    comments: list
+    exhausted: bool
+    error: str
+
+_ERROR_PAGE_JS = '''
+    (errorTexts) => {
+        const text = document.body ? document.body.innerText : '';
+        return errorTexts.find(t => text.includes(t)) || null;
+    }
+'''
+
+# 滚动评论区：笔记弹窗中评论在 .note-scroller 内滚动，独立笔记页则滚动整个页面
+_SCROLL_COMMENTS_JS = '''
+    () => {
+        const scroller = document.querySelector('.note-scroller');
+        if (scroller) {
+            scroller.scrollTop = scroller.scrollHeight;
+        } else {
+            window.scrollTo(0, document.body.scrollHeight);
+        }
+    }
+'''
+
+_COMMENTS_END_JS = '''
+    () => {
+        return !!document.querySelector('.end-container, .no-comments');
+    }
+'''
+
+# 点击“展开N条回复”/“展开更多回复”，每轮最多点击 maxClicks 个，返回点击数量
+_EXPAND_REPLIES_JS = '''
+    (maxClicks) => {
+        const buttons = document.querySelectorAll('.show-more, .reply-container .show-more, .expand-reply');
+        let clicked = 0;
+        for (const button of buttons) {
+            if (clicked >= maxClicks) break;
+            const text = button.textContent || '';
+            if (!text.includes('展开') || text.includes('收起')) continue;
+            button.click();
+            clicked++;
+        }
+        return clicked;
+    }
+'''
+
+# 增量提取：只读取尚未标记的评论元素并打上标记，每轮只处理新加载的评论，不重复读取整个评论区
+_NEW_COMMENTS_JS = '''
+    (limit) => {
+        const marker = 'data-xhs-extracted';
+        const elements = document.querySelectorAll(
+            '.comment-item:not([' + marker + ']), .feed-comment:not([' + marker + '])'
+        );
+        const idOf = (el) => {
+            if (!el) return null;
+            const raw = el.id || el.getAttribute('data-id') || '';
+            return raw.replace(/^comment-/, '') || null;
+        };
+        const firstText = (el, selectors) => {
+            for (const selector of selectors) {
+                const node = el.querySelector(selector);
+                const text = node && node.textContent ? node.textContent.trim() : '';
+                if (text) return text;
+            }
+            return '';
+        };
+
+        const comments = [];
+        for (const el of elements) {
+            if (comments.length >= limit) break;
+            el.setAttribute(marker, '1');
+
+            let parentId = null;
+            const replyContainer = el.closest('.reply-container');
+            if (replyContainer) {
+                const thread = replyContainer.closest('.parent-comment');
+                parentId = idOf(thread && thread.querySelector(':scope > .comment-item'));
+            }
+
+            const author = firstText(el, ['.author .name', '.username', '.user-name', '.name', 'a[href*="user"]']);
+            let content = firstText(el, ['.content .note-text', '.content', '.comment-content', '.comment-text', '.text']);
+            if (!content) {
+                content = el.textContent.trim();
+                if (author && content.includes(author)) {
+                    content = content.replace(author, '').replace(/^[：:\\s]+/, '').trim();
+                }
+            }
+            const time = firstText(el, ['.info .date span', '.date', '.time', '.publish-time', 'time']);
+            let likes = firstText(el, ['.like .count', '.like-wrapper .count', '.like']);
+            if (!/\\d/.test(likes)) likes = '';
+
+            if (content && content !== author) {
+                comments.push({
+                    comment_id: idOf(el),
+                    parent_id: parentId,
+                    author,
+                    content,
+                    publish_time: time,
+                    like_count: likes
+                });
+            }
+        }
+        return comments;
+    }
+'''
+
+# 每轮展开回复时最多点击的按钮数，避免单轮等待过久
+_EXPAND_CLICKS_PER_ROUND = 10
+
+def _dom_comment_id(comment: dict) -> str:
+    """页面元素没有评论ID时，用作者和内容生成稳定的ID用于去重"""
+    digest = hashlib.md5(f"{comment.get('author', '')}\n{comment.get('content', '')}".encode("utf-8"))
+    return f"dom-{digest.hexdigest()[:16]}"
+
+def build_comment_threads(comments: list) -> list:
+    """将评论整理为楼层结构
+
+    回复的回复归到所属一级评论下；找不到所属一级评论的回复按一级评论处理。
+
+    Returns:
+        list: 每项为 (一级评论, 回复列表)
+    """
+    by_id = {comment.comment_id: comment for comment in comments}
+
+    def root_of(comment):
+        seen = set()
+        while comment.parent_id and comment.parent_id in by_id and comment.comment_id not in seen:
+            seen.add(comment.comment_id)
+            comment = by_id[comment.parent_id]
+        return comment
+
+    threads = {}
+    for comment in comments:
+        root = root_of(comment)
+        replies = threads.setdefault(root.comment_id, (root, []))[1]
+        if root is not comment:
+            replies.append(comment)
+    return list(threads.values())
+
+async def crawl_comments(page, url: str, max_comments: int = COMMENT_MAX_COMMENTS,
+                         expand_replies: bool = True, extraction_mode: str = EXTRACTION_MODE,
+                         stop_when=None) -> CommentCrawlResult:
+    """在给定页面中打开笔记，滚动评论区抓取评论
+
+    每轮先展开回复，再增量收集新加载的评论，直到评论区到底、达到 max_comments 条、
+    连续 COMMENT_STALL_ROUNDS 次滚动没有新评论，或达到 COMMENT_MAX_SCROLLS 次滚动。
+
+    Args:
+        page: 从页面池借出的页面
+        url: 笔记 URL
+        max_comments: 最多抓取的评论数（含回复）
+        expand_replies: 是否展开楼中楼回复
+        extraction_mode: "api" 优先解析评论接口数据，未捕获到时回退到DOM提取；"dom" 只使用DOM提取
+        stop_when: 可选的判断函数，以每批新评论调用，返回True时停止滚动（如增量同步遇到已知评论）
+
+    Returns:
+        CommentCrawlResult: 抓取结果，comments 按抓取顺序排列
+    """
+    note_id = extract_note_id(url)
+    collected = {}
+    processed_url = process_url(url)
+    print(f"处理后的URL: {processed_url}")
+
+    async with ResponseCapture(page, COMMENT_API_PATH, parse_comments, key="comment_id") as roots, \
+            ResponseCapture(page, SUB_COMMENT_API_PATH, parse_comments, key="comment_id") as replies:
+        await page.goto(processed_url, timeout=60000)
+        await wait_for_page_ready(page, "note")
+
+        error_text = await page.evaluate(_ERROR_PAGE_JS, ERROR_TEXTS)
+        if error_text:
+            return CommentCrawlResult(
+                url, note_id, [], False,
+                f"无法获取笔记评论: {error_text}\n请检查链接是否有效或尝试使用带有有效token的完整URL。"
+            )
+
+        await wait_for_page_ready(page, "comments")
+        comment_selector = SETTLE_SELECTORS["comments"]
+        use_api = extraction_mode == "api"
+        if use_api and await count_elements(page, comment_selector) > 0:
+            await roots.wait_for_items(1, PAGE_READY_TIMEOUTS["scroll"])
+        api_offsets = {"roots": 0, "replies": 0}
+
+        async def collect_batch():
+            """收集上一轮之后新增的评论，接口数据可用时优先使用接口数据"""
+            if use_api and (roots.items or replies.items):
+                raw = roots.items[api_offsets["roots"]:] + replies.items[api_offsets["replies"]:]
+                api_offsets["roots"] = len(roots.items)
+                api_offsets["replies"] = len(replies.items)
+            else:
+                raw = await page.evaluate(_NEW_COMMENTS_JS, max_comments)
+            batch = []
+            for item in raw:
+                item["comment_id"] = item.get("comment_id") or _dom_comment_id(item)
+                if item["comment_id"] in collected:
+                    continue
+                collected[item["comment_id"]] = CommentRecord.from_dict(item)
+                batch.append(collected[item["comment_id"]])
+            return batch
+
+        scrolls = 0
+        stalls = 0
+        exhausted = False
+        while True:
+            clicked = 0
+            if expand_replies:
+                clicked = await page.evaluate(_EXPAND_REPLIES_JS, _EXPAND_CLICKS_PER_ROUND)
+                if clicked:
+                    previous = await count_elements(page, comment_selector)
+                    await wait_for_count_growth(page, comment_selector, previous, label="comment_replies")
+
+            batch = await collect_batch()
+            if batch:
+                stalls = 0
+            elif scrolls > 0:
+                stalls += 1
+
+            if len(collected) >= max_comments:
+                break
+            if stop_when is not None and batch and stop_when(batch):
+                print("已到达上次同步的位置，停止加载")
+                break
+            at_end = await page.evaluate(_COMMENTS_END_JS) or (use_api and roots.items and not roots.has_more)
+            # 评论区到底后仍可能有未展开的回复，没有新评论也没有可展开的回复时才算抓取完整
+            if at_end and not batch and not clicked:
+                exhausted = True
+                break
+            if stalls >= COMMENT_STALL_ROUNDS:
+                print(f"连续 {stalls} 次滚动没有新评论，停止加载")
+                break
+            if scrolls >= COMMENT_MAX_SCROLLS:
+                break
+
+            previous = await count_elements(page, comment_selector)
+            await page.evaluate(_SCROLL_COMMENTS_JS)
+            scrolls += 1
+            await wait_for_count_growth(page, comment_selector, previous, label="comment_scroll")
+
+    comments = list(collected.values())[:max_comments]
+    print(f"评论抓取完成: 滚动 {scrolls} 次，获取 {len(comments)} 条评论")
+    return CommentCrawlResult(url, note_id, comments, exhausted, None)
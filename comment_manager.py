@@ -1,212 +1,139 @@
 """评论管理模块 - 处理评论获取、生成和发布"""
 
 import asyncio
-from browser_manager import ensure_browser
-from config import main_page, process_url
+from browser_manager import ensure_browser, acquire_page
+from config import COMMENT_MAX_COMMENTS, COMMENT_SYNC_KNOWN_ROUNDS
+from url_canonical import process_url, extract_note_id
 from content_analyzer import analyze_note
+from comment_crawler import crawl_comments, build_comment_threads, CommentCrawlResult
+from comment_sync import comment_sync_store
+from storage import storage_writer
+from page_readiness import wait_for_page_ready, wait_for_condition
 
-async def get_note_comments(url: str) -> str:
+# 评论发送后的确认条件：评论出现在列表中，或评论输入框已被清空/移除
+# （点击发送后焦点在按钮上，因此检查传入的输入框本身而不是 document.activeElement）
+_COMMENT_SENT_JS = '''
+    ([text, input]) => {
+        const items = document.querySelectorAll('.comment-item, .feed-comment, .comments-container');
+        for (const item of items) {
+            if (item.innerText && item.innerText.includes(text)) return true;
+        }
+        if (!input || !input.isConnected) return true;
+        const current = 'value' in input ? input.value : input.innerText;
+        return !(current || '').trim();
+    }
+'''
+
+async def get_note_comments(url: str, max_comments: int = COMMENT_MAX_COMMENTS, expand_replies: bool = True) -> str:
     """获取笔记的评论内容
     
     Args:
         url: 笔记 URL
+        max_comments: 最多获取的评论数（含回复）
+        expand_replies: 是否展开楼中楼回复
     """
     login_status = await ensure_browser()
     if not login_status:
         return "请先登录小红书账号"
     
-    if not main_page:
-        return "浏览器初始化失败，请重试"
-    
     try:
-        # 处理URL
-        processed_url = process_url(url)
-        print(f"处理后的URL: {processed_url}")
-        
-        # 访问帖子链接
-        await main_page.goto(processed_url, timeout=60000)
-        await asyncio.sleep(5)  # 等待页面加载
-        
-        # 检查是否加载了错误页面
-        error_page = await main_page.evaluate('''
-            () => {
-                const errorTexts = [
-                    "当前笔记暂时无法浏览",
-                    "内容不存在",
-                    "页面不存在",
-                    "内容已被删除"
-                ];
-                
-                for (const text of errorTexts) {
-                    if (document.body.innerText.includes(text)) {
-                        return {
-                            isError: true,
-                            errorText: text
-                        };
-                    }
-                }
-                
-                return { isError: false };
-            }
-        ''')
-        
-        if error_page.get("isError", False):
-            return f"无法获取笔记评论: {error_page.get('errorText', '未知错误')}\n请检查链接是否有效或尝试使用带有有效token的完整URL。"
-        
-        # 滚动页面以加载更多评论
-        print("滚动页面以加载更多评论...")
-        for i in range(3):  # 滚动3次
-            await main_page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await asyncio.sleep(2)
-        
-        # 获取评论内容
-        comments = await main_page.evaluate('''
-            () => {
-                const comments = [];
-                
-                // 多种评论选择器
-                const commentSelectors = [
-                    '.comment-item',
-                    '.feed-comment',
-                    '.comment-list .comment',
-                    'div[data-v-aed4aacc]',
-                    '.comments-container .comment'
-                ];
-                
-                let commentElements = [];
-                
-                // 尝试不同的选择器
-                for (const selector of commentSelectors) {
-                    const elements = document.querySelectorAll(selector);
-                    if (elements.length > 0) {
-                        commentElements = Array.from(elements);
-                        console.log(`使用选择器 ${selector} 找到 ${elements.length} 个评论`);
-                        break;
-                    }
-                }
-                
-                // 如果没有找到评论元素，尝试更通用的方法
-                if (commentElements.length === 0) {
-                    // 查找包含用户名和评论内容的元素
-                    const allDivs = document.querySelectorAll('div');
-                    for (const div of allDivs) {
-                        const text = div.textContent.trim();
-                        // 如果包含典型的评论特征（用户名 + 内容），且不是太长
-                        if (text.length > 10 && text.length < 500 && 
-                            (text.includes('：') || text.includes(': ') || text.includes('回复'))) {
-                            commentElements.push(div);
-                        }
-                    }
-                }
-                
-                console.log(`总共找到 ${commentElements.length} 个潜在评论元素`);
-                
-                for (let i = 0; i < Math.min(commentElements.length, 20); i++) {
-                    const element = commentElements[i];
-                    
-                    try {
-                        // 尝试获取用户名
-                        let username = '';
-                        const usernameSelectors = [
-                            '.username',
-                            '.user-name',
-                            '.name',
-                            '.author',
-                            'a[href*="user"]',
-                            'span.user'
-                        ];
-                        
-                        for (const selector of usernameSelectors) {
-                            const usernameEl = element.querySelector(selector);
-                            if (usernameEl && usernameEl.textContent.trim()) {
-                                username = usernameEl.textContent.trim();
-                                break;
-                            }
-                        }
-                        
-                        // 尝试获取评论内容
-                        let content = '';
-                        const contentSelectors = [
-                            '.content',
-                            '.comment-content',
-                            '.text',
-                            '.comment-text',
-                            'span:not(.username):not(.user-name):not(.name):not(.time)'
-                        ];
-                        
-                        for (const selector of contentSelectors) {
-                            const contentEl = element.querySelector(selector);
-                            if (contentEl && contentEl.textContent.trim() && 
-                                contentEl.textContent.trim() !== username) {
-                                content = contentEl.textContent.trim();
-                                break;
-                            }
-                        }
-                        
-                        // 如果没有找到内容，尝试直接从元素获取文本
-                        if (!content) {
-                            const fullText = element.textContent.trim();
-                            // 移除用户名部分
-                            if (username && fullText.includes(username)) {
-                                content = fullText.replace(username, '').replace(/^[：:：\s]+/, '').trim();
-                            } else {
-                                content = fullText;
-                            }
-                        }
-                        
-                        // 尝试获取时间
-                        let time = '';
-                        const timeSelectors = [
-                            '.time',
-                            '.date',
-                            '.publish-time',
-                            'time',
-                            'span[title*="20"]'
-                        ];
-                        
-                        for (const selector of timeSelectors) {
-                            const timeEl = element.querySelector(selector);
-                            if (timeEl && timeEl.textContent.trim()) {
-                                time = timeEl.textContent.trim();
-                                break;
-                            }
-                        }
-                        
-                        // 只有当有实际内容时才添加评论
-                        if (content && content.length > 2 && content !== username) {
-                            comments.push({
-                                username: username || '匿名用户',
-                                content: content,
-                                time: time || '未知时间'
-                            });
-                        }
-                        
-                    } catch (e) {
-                        console.log('处理评论元素时出错:', e);
-                        continue;
-                    }
-                }
-                
-                return comments;
-            }
-        ''')
-        
-        if not comments or len(comments) == 0:
-            return "未找到评论内容，可能该笔记没有评论或评论加载失败"
-        
-        # 格式化评论内容
-        result = f"找到 {len(comments)} 条评论:\n\n"
-        for i, comment in enumerate(comments, 1):
-            result += f"{i}. {comment['username']}\n"
-            result += f"   内容: {comment['content']}\n"
-            if comment['time'] != '未知时间':
-                result += f"   时间: {comment['time']}\n"
-            result += "\n"
-        
-        return result
-    
+        async with acquire_page() as page:
+            result = await crawl_comments(page, url, max_comments=max_comments, expand_replies=expand_replies)
     except Exception as e:
         return f"获取评论时出错: {str(e)}"
+    
+    if result.error:
+        return result.error
+    _store_comments(result)
+    return format_comment_threads(result)
+
+def _store_comments(result: CommentCrawlResult):
+    """将抓取到的评论交给后台线程写入数据库，不等待写入完成"""
+    if result.note_id and result.comments:
+        storage_writer.upsert_comments(result.note_id, result.comments)
+
+async def sync_note_comments(url: str, max_comments: int = COMMENT_MAX_COMMENTS, reset: bool = False) -> str:
+    """增量同步笔记评论，只返回上次同步之后的新评论
+    
+    按笔记ID记录已见过的评论ID和最新评论时间。评论区按热度排序，已知的置顶/热门评论可能排在
+    新评论之前，因此连续 COMMENT_SYNC_KNOWN_ROUNDS 批评论全部是已知评论时才停止滚动，
+    最后仍按已见ID和最新评论时间过滤出新评论。首次同步会抓取全部评论作为基线。
+    
+    Args:
+        url: 笔记 URL
+        max_comments: 最多抓取的评论数（含回复）
+        reset: 是否清除已有的同步状态，重新建立基线
+    """
+    note_id = extract_note_id(url)
+    if not note_id:
+        return "无法从链接中识别笔记ID，无法进行增量同步"
+    
+    login_status = await ensure_browser()
+    if not login_status:
+        return "请先登录小红书账号"
+    
+    # 同步状态的读写都是SQLite查询和提交，放到线程中执行，不阻塞事件循环
+    if reset:
+        await asyncio.to_thread(comment_sync_store.reset, note_id)
+    state = await asyncio.to_thread(comment_sync_store.get_state, note_id)
+    is_known = await asyncio.to_thread(comment_sync_store.known_filter, note_id)
+    
+    known_rounds = 0
+    
+    def reached_known(batch):
+        nonlocal known_rounds
+        known_rounds = known_rounds + 1 if all(is_known(comment) for comment in batch) else 0
+        return known_rounds >= COMMENT_SYNC_KNOWN_ROUNDS
+    
+    try:
+        async with acquire_page() as page:
+            result = await crawl_comments(page, url, max_comments=max_comments, stop_when=reached_known)
+    except Exception as e:
+        return f"同步评论时出错: {str(e)}"
+    
+    if result.error:
+        return result.error
+    
+    new_comments = [comment for comment in result.comments if not is_known(comment)]
+    await asyncio.to_thread(comment_sync_store.record, note_id, new_comments)
+    _store_comments(result)
+    
+    if state is None:
+        header = f"首次同步，已记录 {len(new_comments)} 条评论作为基线"
+    else:
+        header = f"上次同步后新增 {len(new_comments)} 条评论"
+    if not new_comments:
+        return header
+    result.comments = new_comments
+    # 到达上次同步的位置而停止属于正常结束，不提示评论未全部加载
+    reached_last_sync = known_rounds >= COMMENT_SYNC_KNOWN_ROUNDS
+    return f"{header}\n\n{format_comment_threads(result, mark_incomplete=not reached_last_sync)}"
+
+def format_comment_threads(result: CommentCrawlResult, mark_incomplete: bool = True) -> str:
+    """将评论抓取结果按楼层格式化为文本，mark_incomplete 为True时在未加载完时提示"""
+    if not result.comments:
+        return "未找到评论内容，可能该笔记没有评论或评论加载失败"
+    
+    threads = build_comment_threads(result.comments)
+    reply_total = len(result.comments) - len(threads)
+    
+    output = f"找到 {len(result.comments)} 条评论（{len(threads)} 条主评论，{reply_total} 条回复）"
+    if mark_incomplete and not result.exhausted:
+        output += "，评论未全部加载"
+    output += ":\n\n"
+    
+    for i, (comment, replies) in enumerate(threads, 1):
+        likes = f" (赞 {comment.like_count})" if comment.like_count else ""
+        output += f"{i}. {comment.author}{likes}\n"
+        output += f"   内容: {comment.content}\n"
+        if comment.publish_time:
+            output += f"   时间: {comment.publish_time}\n"
+        for reply in replies:
+            reply_likes = f" (赞 {reply.like_count})" if reply.like_count else ""
+            output += f"   ↳ {reply.author}{reply_likes}: {reply.content}\n"
+        output += "\n"
+    
+    return output
 
 async def post_smart_comment(url: str, comment_type: str = "点赞") -> str:
     """根据笔记内容智能生成并准备评论
@@ -219,14 +146,14 @@ async def post_smart_comment(url: str, comment_type: str = "点赞") -> str:
         # 分析笔记内容
         note_analysis = await analyze_note(url)
         
-        if "error" in note_analysis:
-            return f"无法分析笔记内容: {note_analysis['error']}"
+        if note_analysis.error:
+            return f"无法分析笔记内容: {note_analysis.error}"
         
         # 根据笔记内容和评论类型生成评论建议
-        title = note_analysis.get("标题", "")
-        content = note_analysis.get("内容", "")
-        domains = note_analysis.get("领域", [])
-        keywords = note_analysis.get("关键词", [])
+        title = note_analysis.record.title
+        content = note_analysis.record.content
+        domains = note_analysis.domains
+        keywords = note_analysis.keywords
         
         # 生成评论建议
         comment_suggestions = {
@@ -283,20 +210,32 @@ async def post_comment(url: str, comment_text: str) -> str:
     if not login_status:
         return "请先登录小红书账号"
     
-    if not main_page:
-        return "浏览器初始化失败，请重试"
+    try:
+        # 发布评论需要完整的页面交互，不拦截任何资源
+        async with acquire_page(block_profile=None) as page:
+            return await _submit_comment(page, url, comment_text)
+    except Exception as e:
+        return f"发布评论时出错: {str(e)}"
+
+async def _submit_comment(page, url: str, comment_text: str) -> str:
+    """在给定页面中打开笔记并发布评论
     
+    Args:
+        page: 从页面池借出的页面
+        url: 笔记 URL
+        comment_text: 要发布的评论内容
+    """
     try:
         # 处理URL
         processed_url = process_url(url)
         print(f"处理后的URL: {processed_url}")
         
         # 访问帖子链接
-        await main_page.goto(processed_url, timeout=60000)
-        await asyncio.sleep(5)  # 等待页面加载
+        await page.goto(processed_url, timeout=60000)
+        await wait_for_page_ready(page, "note")
         
         # 检查是否加载了错误页面
-        error_page = await main_page.evaluate('''
+        error_page = await page.evaluate('''
             () => {
                 const errorTexts = [
                     "当前笔记暂时无法浏览",
@@ -322,8 +261,8 @@ async def post_comment(url: str, comment_text: str) -> str:
             return f"无法访问笔记: {error_page.get('errorText', '未知错误')}\n请检查链接是否有效。"
         
         # 滚动到评论区域
-        await main_page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-        await asyncio.sleep(2)
+        await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+        await wait_for_page_ready(page, "comment_input")
         
         # 查找评论输入框
         comment_input = None
@@ -340,7 +279,7 @@ async def post_comment(url: str, comment_text: str) -> str:
         
         for selector in input_selectors:
             try:
-                comment_input = await main_page.query_selector(selector)
+                comment_input = await page.query_selector(selector)
                 if comment_input:
                     print(f"找到评论输入框: {selector}")
                     break
@@ -351,7 +290,7 @@ async def post_comment(url: str, comment_text: str) -> str:
         # 如果没有找到输入框，尝试使用JavaScript查找
         if not comment_input:
             print("尝试使用JavaScript查找评论输入框")
-            comment_input_found = await main_page.evaluate('''
+            comment_input_found = await page.evaluate('''
                 () => {
                     const inputs = document.querySelectorAll('input, textarea');
                     for (const input of inputs) {
@@ -368,16 +307,14 @@ async def post_comment(url: str, comment_text: str) -> str:
             
             if comment_input_found:
                 # 重新查找已聚焦的输入框
-                comment_input = await main_page.query_selector(':focus')
+                comment_input = await page.query_selector(':focus')
         
         if not comment_input:
             return "未找到评论输入框，可能该笔记不支持评论或页面结构已变化"
         
         # 点击输入框并输入评论
         await comment_input.click()
-        await asyncio.sleep(1)
         await comment_input.fill(comment_text)
-        await asyncio.sleep(2)
         
         print(f"已输入评论内容: {comment_text}")
         
@@ -397,7 +334,7 @@ async def post_comment(url: str, comment_text: str) -> str:
         
         for selector in send_selectors:
             try:
-                send_button = await main_page.query_selector(selector)
+                send_button = await page.query_selector(selector)
                 if send_button:
                     await send_button.click()
                     print(f"点击发送按钮: {selector}")
@@ -419,7 +356,7 @@ async def post_comment(url: str, comment_text: str) -> str:
         # 方法3: 使用JavaScript查找并点击发送按钮
         if not send_success:
             try:
-                js_send_success = await main_page.evaluate('''
+                js_send_success = await page.evaluate('''
                     () => {
                         const buttons = document.querySelectorAll('button');
                         for (const button of buttons) {
@@ -440,7 +377,9 @@ async def post_comment(url: str, comment_text: str) -> str:
                 print(f"使用JavaScript点击发送按钮时出错: {str(e)}")
         
         if send_success:
-            await asyncio.sleep(3)  # 等待评论发送
+            sent = await wait_for_condition(page, _COMMENT_SENT_JS, [comment_text, comment_input], label="comment_sent")
+            if not sent:
+                return f"已尝试发送评论，但未能确认发布成功（评论未出现在列表中，输入框也未清空），请到笔记页面核实: {comment_text}"
             return f"评论发送成功: {comment_text}"
         else:
             return f"评论内容已输入但可能需要手动点击发送按钮: {comment_text}"
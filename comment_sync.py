@@ -0,0 +1,111 @@
+"""评论增量同步模块 - 按笔记ID记录已见过的评论ID和最新评论时间（高水位），重复轮询时只返回新评论"""
+
+import os
+import sqlite3
+import threading
+import time
+from config import COMMENT_SYNC_DB
+
+class CommentSyncStore:
+    """评论同步状态
+
+    每篇笔记记录已见过的评论ID集合和最新评论的时间戳，保存在 SQLite 中，进程重启后仍然有效。
+    各方法会在线程中调用（asyncio.to_thread），共用的连接和内存集合由锁保护。
+    """
+
+    def __init__(self, db_path: str = COMMENT_SYNC_DB):
+        self.db_path = db_path
+        self._conn = None
+        self._seen = {}
+        self._lock = threading.RLock()
+
+    def _get_conn(self):
+        """延迟打开SQLite连接，首次使用时建表"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS comment_sync_state ("
+                "note_id TEXT PRIMARY KEY, newest_created_at INTEGER NOT NULL, "
+                "seen_count INTEGER NOT NULL, synced_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS comment_seen ("
+                "note_id TEXT NOT NULL, comment_id TEXT NOT NULL, PRIMARY KEY (note_id, comment_id))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_state(self, note_id: str):
+        """读取笔记的同步状态，从未同步过返回None
+
+        Returns:
+            dict: newest_created_at、seen_count、synced_at
+        """
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT newest_created_at, seen_count, synced_at FROM comment_sync_state WHERE note_id = ?",
+                (note_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"newest_created_at": row[0], "seen_count": row[1], "synced_at": row[2]}
+
+    def seen_ids(self, note_id: str) -> set:
+        """获取笔记已见过的评论ID集合"""
+        with self._lock:
+            if note_id not in self._seen:
+                rows = self._get_conn().execute(
+                    "SELECT comment_id FROM comment_seen WHERE note_id = ?", (note_id,)
+                ).fetchall()
+                self._seen[note_id] = {row[0] for row in rows}
+            return self._seen[note_id]
+
+    def known_filter(self, note_id: str):
+        """生成判断评论是否已同步过的函数：ID已见过，或发布时间不晚于高水位"""
+        with self._lock:
+            seen = self.seen_ids(note_id)
+            state = self.get_state(note_id)
+            newest = state["newest_created_at"] if state else 0
+
+        def is_known(comment) -> bool:
+            return comment.comment_id in seen or bool(comment.created_at and comment.created_at <= newest)
+        return is_known
+
+    def record(self, note_id: str, comments: list):
+        """记录本次同步得到的新评论，更新高水位"""
+        with self._lock:
+            seen = self.seen_ids(note_id)
+            state = self.get_state(note_id) or {"newest_created_at": 0}
+            newest = max([state["newest_created_at"]] + [comment.created_at for comment in comments])
+            new_ids = [comment.comment_id for comment in comments if comment.comment_id not in seen]
+            try:
+                conn = self._get_conn()
+                conn.executemany(
+                    "INSERT OR IGNORE INTO comment_seen (note_id, comment_id) VALUES (?, ?)",
+                    [(note_id, comment_id) for comment_id in new_ids]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO comment_sync_state (note_id, newest_created_at, seen_count, synced_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (note_id, newest, len(seen) + len(new_ids), time.time())
+                )
+                conn.commit()
+                seen.update(new_ids)
+            except sqlite3.Error as e:
+                print(f"写入评论同步状态时出错: {str(e)}")
+
+    def reset(self, note_id: str):
+        """清除笔记的同步状态，下次同步将重新抓取全部评论"""
+        with self._lock:
+            self._seen.pop(note_id, None)
+            try:
+                conn = self._get_conn()
+                conn.execute("DELETE FROM comment_seen WHERE note_id = ?", (note_id,))
+                conn.execute("DELETE FROM comment_sync_state WHERE note_id = ?", (note_id,))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"清除评论同步状态时出错: {str(e)}")
+
+# 全局评论同步状态实例
+comment_sync_store = CommentSyncStore()
@@ -2,62 +2,169 @@
 
 import os
 import subprocess
-from datetime import datetime
-
-# 设置环境变量强制Playwright使用英文路径的临时目录（必须在导入playwright之前设置）
-os.environ['TMPDIR'] = 'C:\\temp_playwright'
-os.environ['TMP'] = 'C:\\temp_playwright'
-os.environ['TEMP'] = 'C:\\temp_playwright'
-os.environ['PLAYWRIGHT_BROWSERS_PATH'] = 'C:\\playwright_browsers'
-
-# 设置Windows系统环境变量（用户级别）
-try:
-    subprocess.run(['setx', 'TEMP', 'C:\\temp_playwright'], check=False, capture_output=True)
-    subprocess.run(['setx', 'TMP', 'C:\\temp_playwright'], check=False, capture_output=True)
-except Exception:
-    pass  # 忽略设置失败
 
 # 全局变量 - 使用英文绝对路径避免中文路径权限问题
 BROWSER_DATA_DIR = "C:\\browser_data"
 DATA_DIR = "C:\\redbook_data"
 TEMP_PLAYWRIGHT_DIR = "C:\\temp_playwright"
 PLAYWRIGHT_BROWSERS_DIR = "C:\\playwright_browsers"
-TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# 确保目录存在
-os.makedirs(BROWSER_DATA_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(TEMP_PLAYWRIGHT_DIR, exist_ok=True)
-os.makedirs(PLAYWRIGHT_BROWSERS_DIR, exist_ok=True)
+# 页面池大小 - 同时可并发执行的浏览器页面数量
+PAGE_POOL_SIZE = 4
 
-# 用于存储浏览器上下文，以便在不同方法之间共享
-browser_context = None
-main_page = None
-is_logged_in = False
+# 浏览器运行模式：HEADLESS 为True时以无头模式运行；BROWSER_WORKERS 为浏览器实例数（0 表示按CPU核数），
+# 多于1个时，主实例使用 BROWSER_DATA_DIR，其余实例各自使用从主配置目录克隆的配置目录，工具调用分派到最空闲的实例
+HEADLESS = False
+BROWSER_WORKERS = 1
+WORKER_PROFILES_DIR = "C:\\browser_data_workers"
+# 克隆配置目录时跳过的锁文件和缓存目录
+PROFILE_CLONE_IGNORE = [
+    "Singleton*", "lockfile", "LOCK", "*.tmp",
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "Service Worker"
+]
 
-def process_url(url: str) -> str:
-    """处理URL，确保格式正确并保留所有参数
-    
-    Args:
-        url: 原始URL
+# 是否在服务器启动时预热浏览器（后台启动浏览器、打开页面池页面并检查登录状态），也可通过 --prewarm 参数开启
+PREWARM_BROWSER = False
+
+# 登录状态缓存有效期（秒），过期后先检查会话Cookie，必要时才访问首页确认
+LOGIN_CACHE_TTL = 600
+# 登录会话Cookie名称，以及表示登录已失效的响应状态码
+LOGIN_SESSION_COOKIE = "web_session"
+LOGIN_INVALID_STATUS_CODES = (401, 461)
+
+# 各类页面等待就绪的超时时间（毫秒），条件满足后立即返回，不再固定等待
+PAGE_READY_TIMEOUTS = {
+    "default": 15000,
+    "home": 10000,
+    "search": 15000,
+    "note": 15000,
+    "comments": 8000,
+    "comment_input": 8000,
+    "comment_sent": 5000,
+    "scroll": 3000
+}
+
+# 资源拦截配置：只读取文字和链接的工具使用拦截配置，中止图片、视频、字体及统计脚本请求
+RESOURCE_BLOCK_PROFILES = {
+    "scrape": {
+        "resource_types": ["image", "media", "font"],
+        "url_keywords": [
+            "apm-fe.xiaohongshu.com",
+            "t2.xiaohongshu.com",
+            "lng.xiaohongshu.com",
+            "google-analytics.com",
+            "googletagmanager.com"
+        ]
+    }
+}
+DEFAULT_BLOCK_PROFILE = "scrape"
+
+# 数据提取模式："api" 优先解析页面接口返回的JSON数据，未捕获到数据时回退到DOM提取；"dom" 只使用DOM提取
+EXTRACTION_MODE = "api"
+
+# 笔记内容缓存：内存中最多缓存的笔记数、缓存有效期（秒）及持久化数据库路径
+NOTE_CACHE_MAX_ENTRIES = 500
+NOTE_CACHE_TTL = 6 * 3600
+NOTE_CACHE_DB = os.path.join(DATA_DIR, "note_cache.db")
+
+# 智能搜索中同时执行的搜索策略数量上限（每个策略占用页面池中的一个页面）
+SEARCH_FANOUT = 3
+
+# 搜索分页：单次搜索最多返回的结果数、最多滚动次数，以及连续多少次滚动没有新结果时停止
+SEARCH_MAX_RESULTS = 200
+SEARCH_MAX_SCROLLS = 40
+SEARCH_STALL_ROUNDS = 2
+
+# 批量获取笔记：同时获取的笔记数上限（受页面池大小限制）、失败后的最大重试次数及首次重试前的等待时间（秒，之后按倍数递增）
+NOTE_BATCH_CONCURRENCY = 4
+NOTE_BATCH_MAX_RETRIES = 2
+NOTE_BATCH_RETRY_DELAY = 2.0
+
+# 评论抓取：单次最多抓取的评论数（含回复）、最多滚动次数，以及连续多少次滚动没有新评论时停止
+COMMENT_MAX_COMMENTS = 200
+COMMENT_MAX_SCROLLS = 60
+COMMENT_STALL_ROUNDS = 2
+
+# 数据库路径：笔记、搜索结果、评论和分析报告统一存储在此；EXPORT_FILES 为True时额外导出CSV/JSON文件
+STORAGE_DB = os.path.join(DATA_DIR, "redbook.db")
+EXPORT_FILES = False
+
+# 后台持久化：每个事务最多合并的写入任务数、等待凑满一批的最长时间（秒），以及退出时等待写完的最长时间（秒）
+PERSIST_BATCH_SIZE = 100
+PERSIST_FLUSH_INTERVAL = 0.5
+PERSIST_SHUTDOWN_TIMEOUT = 10
+
+# 评论增量同步状态（每篇笔记已见过的评论ID和最新评论时间）的数据库路径，以及连续多少批评论全部已知时停止加载
+# （评论区按热度排序，置顶和热门评论排在前面，只凭一批已知评论不能说明后面没有新评论）
+COMMENT_SYNC_DB = os.path.join(DATA_DIR, "comment_sync.db")
+COMMENT_SYNC_KNOWN_ROUNDS = 3
+
+# 关键词提取：每篇笔记返回的关键词数，以及从已存储笔记增量更新文档频率（IDF，保存在 STORAGE_DB 中）的最短间隔（秒）
+KEYWORD_TOP_K = 20
+KEYWORD_IDF_REFRESH_INTERVAL = 300
+
+# 智能搜索查询扩展词表文件（修改后自动重新加载），以及检查文件是否修改的间隔（秒）
+QUERY_EXPANSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_expansion.json")
+QUERY_EXPANSION_CHECK_INTERVAL = 2
+
+# 智能搜索结果排序：各策略按 limit 的倍数多取结果后用 BM25 重新排序；BM25 参数及标题相对正文的权重
+SMART_SEARCH_OVERFETCH = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+RANK_TITLE_WEIGHT = 2.0
+
+# 近似重复笔记检测：SimHash 指纹位数、分段索引的段数、判定为近似重复的最大汉明距离（须小于段数），
+# 以及参与比较的最少特征词数（特征词过少的短文本只按笔记ID去重）
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_MAX_DISTANCE = 3
+SIMHASH_MIN_FEATURES = 3
+
+# 估算节省流量时各资源类型的默认大小（字节），运行中观测到的实际大小会替代该估计值
+RESOURCE_SIZE_ESTIMATES = {
+    "image": 60000,
+    "media": 500000,
+    "font": 40000,
+    "script": 20000,
+    "other": 5000
+}
+
+# 运行环境是否已初始化
+_environment_ready = False
+
+def init_environment():
+    """初始化运行环境：设置 Playwright 使用的临时目录和浏览器目录，并创建数据目录
     
-    Returns:
-        str: 处理后的URL
+    在启动浏览器之前调用（可重复调用，只执行一次）。导入本模块不会产生任何副作用。
     """
-    processed_url = url.strip()
+    global _environment_ready
+    if _environment_ready:
+        return
     
-    # 移除可能的@符号前缀
-    if processed_url.startswith('@'):
-        processed_url = processed_url[1:]
+    # 设置环境变量强制Playwright使用英文路径的临时目录（必须在启动Playwright之前设置）
+    os.environ['TMPDIR'] = TEMP_PLAYWRIGHT_DIR
+    os.environ['TMP'] = TEMP_PLAYWRIGHT_DIR
+    os.environ['TEMP'] = TEMP_PLAYWRIGHT_DIR
+    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = PLAYWRIGHT_BROWSERS_DIR
     
-    # 确保URL使用https协议
-    if processed_url.startswith('http://'):
-        processed_url = 'https://' + processed_url[7:]
-    elif not processed_url.startswith('https://'):
-        processed_url = 'https://' + processed_url
-        
-    # 如果URL不包含www.xiaohongshu.com，则添加它
-    if 'xiaohongshu.com' in processed_url and 'www.xiaohongshu.com' not in processed_url:
-        processed_url = processed_url.replace('xiaohongshu.com', 'www.xiaohongshu.com')
+    # 设置Windows系统环境变量（用户级别）
+    if os.name == 'nt':
+        try:
+            subprocess.run(['setx', 'TEMP', TEMP_PLAYWRIGHT_DIR], check=False, capture_output=True)
+            subprocess.run(['setx', 'TMP', TEMP_PLAYWRIGHT_DIR], check=False, capture_output=True)
+        except Exception:
+            pass  # 忽略设置失败
     
-    return processed_url
\ No newline at end of file
+    # 确保目录存在
+    os.makedirs(BROWSER_DATA_DIR, exist_ok=True)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(TEMP_PLAYWRIGHT_DIR, exist_ok=True)
+    os.makedirs(PLAYWRIGHT_BROWSERS_DIR, exist_ok=True)
+    
+    _environment_ready = True
+
+# 用于存储浏览器上下文，以便在不同方法之间共享
+browser_context = None
+main_page = None
+page_pool = None
+is_logged_in = False
@@ -1,364 +1,393 @@
 """内容分析模块 - 处理笔记内容获取和分析"""
 
 import asyncio
-import re
-from browser_manager import ensure_browser
-from config import main_page, process_url
+from dataclasses import dataclass, asdict
+from browser_manager import ensure_browser, acquire_page
+from config import (
+    EXTRACTION_MODE, PAGE_READY_TIMEOUTS,
+    NOTE_BATCH_CONCURRENCY, NOTE_BATCH_MAX_RETRIES, NOTE_BATCH_RETRY_DELAY, KEYWORD_TOP_K
+)
+from url_canonical import process_url, extract_note_id, note_key, has_access_token
+from note_cache import note_cache
+from storage import storage_writer
+from api_capture import ResponseCapture, FEED_API_PATH, parse_note_feed
+from page_readiness import wait_for_page_ready
+from keyword_matcher import domain_matcher
+from keyword_extractor import keyword_extractor
 
-async def get_note_content(url: str) -> str:
-    """获取笔记详细内容
+@dataclass
+class NoteRecord:
+    """笔记记录 - 内部传递的结构化笔记数据，格式化输出只在 MCP 工具层进行
     
-    Args:
-        url: 笔记 URL
+    获取失败时 error 为错误信息，其余字段为空字符串。
     """
-    login_status = await ensure_browser()
-    if not login_status:
-        return "请先登录小红书账号"
+    __slots__ = (
+        "url", "note_id", "title", "author", "publish_time", "content",
+        "liked_count", "collected_count", "comment_count", "error"
+    )
+    url: str
+    note_id: str
+    title: str
+    author: str
+    publish_time: str
+    content: str
+    liked_count: str
+    collected_count: str
+    comment_count: str
+    error: str
     
-    if not main_page:
-        return "浏览器初始化失败，请重试"
+    @classmethod
+    def create(cls, url: str, note_id: str = None, title: str = None, author: str = None,
+               publish_time: str = None, content: str = None, liked_count="",
+               collected_count="", comment_count=""):
+        """创建笔记记录，缺失的字段使用默认占位文本"""
+        return cls(
+            url=url,
+            note_id=note_id or "",
+            title=title or "未知标题",
+            author=author or "未知作者",
+            publish_time=publish_time or "未知时间",
+            content=content or "未能获取内容",
+            liked_count=str(liked_count or ""),
+            collected_count=str(collected_count or ""),
+            comment_count=str(comment_count or ""),
+            error=None
+        )
     
-    try:
-        # 处理URL
-        processed_url = process_url(url)
-        print(f"处理后的URL: {processed_url}")
-        
-        # 访问帖子链接
-        await main_page.goto(processed_url, timeout=60000)
-        await asyncio.sleep(5)  # 等待页面加载
+    @classmethod
+    def failed(cls, url: str, error: str):
+        """创建表示获取失败的记录"""
+        return cls(url, extract_note_id(url) or "", "", "", "", "", "", "", "", error)
+    
+    @classmethod
+    def from_dict(cls, data: dict):
+        """从缓存数据还原记录"""
+        return cls(**{name: data[name] for name in cls.__slots__})
+    
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+@dataclass
+class NoteAnalysis:
+    """笔记分析结果"""
+    __slots__ = ("record", "domains", "domain_hits", "keywords", "error")
+    record: NoteRecord
+    domains: list
+    domain_hits: dict
+    keywords: list
+    error: str
+
+# 未登录和笔记本身无法浏览（已删除、不存在等）时的错误信息，这类错误重试也不会成功
+LOGIN_REQUIRED_ERROR = "请先登录小红书账号"
+NOTE_UNAVAILABLE_ERROR = "无法获取笔记内容"
+
+# 笔记详情提取脚本：错误页检测、标题/作者/时间选择器级联和三种正文提取方法全部在页面内完成，
+# 一次 evaluate 即可返回完整记录
+_NOTE_DETAIL_JS = '''
+    () => {
+        const errorTexts = [
+            "当前笔记暂时无法浏览",
+            "内容不存在",
+            "页面不存在",
+            "内容已被删除"
+        ];
+        const bodyText = document.body ? document.body.innerText : '';
+        for (const text of errorTexts) {
+            if (bodyText.includes(text)) {
+                return { isError: true, errorText: text };
+            }
+        }
         
-        # 检查是否加载了错误页面
-        error_page = await main_page.evaluate('''
-            () => {
-                const errorTexts = [
-                    "当前笔记暂时无法浏览",
-                    "内容不存在",
-                    "页面不存在",
-                    "内容已被删除"
-                ];
-                
-                for (const text of errorTexts) {
-                    if (document.body.innerText.includes(text)) {
-                        return {
-                            isError: true,
-                            errorText: text
-                        };
-                    }
-                }
-                
-                return { isError: false };
+        const firstText = (selectors) => {
+            for (const selector of selectors) {
+                const el = document.querySelector(selector);
+                const text = el && el.textContent ? el.textContent.trim() : '';
+                if (text) return text;
             }
-        ''')
+            return null;
+        };
         
-        if error_page.get("isError", False):
-            return f"无法获取笔记内容: {error_page.get('errorText', '未知错误')}\n请检查链接是否有效或尝试使用带有有效token的完整URL。"
+        const title = firstText([
+            '#detail-title',
+            'h1.title',
+            '.note-content .title',
+            'div.title',
+            'span.title'
+        ]);
+        const author = firstText([
+            '.user-info .username',
+            '.author-info .name',
+            'a.user-name',
+            '.user .name',
+            'span.author'
+        ]);
+        const publishTime = firstText([
+            '.publish-time',
+            '.time',
+            '.date',
+            'time',
+            'span.time'
+        ]);
         
-        # 初始化帖子内容字典
-        post_content = {
-            "标题": "未知标题",
-            "作者": "未知作者",
-            "发布时间": "未知时间",
-            "内容": "未能获取内容"
+        // 评论区域内的元素不能作为正文
+        const commentAreas = [];
+        const commentSelectors = [
+            '.comments-container',
+            '.comment-list',
+            '.feed-comment',
+            'div[data-v-aed4aacc]',
+            '.comment-item',
+            '.content span.note-text'
+        ];
+        for (const selector of commentSelectors) {
+            document.querySelectorAll(selector).forEach(el => commentAreas.push(el));
         }
+        const inComment = (el) => commentAreas.some(area => area.contains(el));
         
-        # 获取帖子标题
-        try:
-            print("尝试获取帖子标题")
-            title_selectors = [
-                '#detail-title',
-                'h1.title',
-                '.note-content .title',
-                'div.title',
-                'span.title'
-            ]
-            
-            for selector in title_selectors:
-                try:
-                    title_element = await main_page.query_selector(selector)
-                    if title_element:
-                        title_text = await title_element.text_content()
-                        if title_text and len(title_text.strip()) > 0:
-                            post_content["标题"] = title_text.strip()
-                            print(f"获取到标题: {post_content['标题'][:50]}...")
-                            break
-                except Exception as e:
-                    print(f"使用选择器 {selector} 获取标题时出错: {str(e)}")
-                    continue
-        except Exception as e:
-            print(f"获取标题出错: {str(e)}")
-        
-        # 获取作者信息
-        try:
-            print("尝试获取作者信息")
-            author_selectors = [
-                '.user-info .username',
-                '.author-info .name',
-                'a.user-name',
-                '.user .name',
-                'span.author'
-            ]
-            
-            for selector in author_selectors:
-                try:
-                    author_element = await main_page.query_selector(selector)
-                    if author_element:
-                        author_text = await author_element.text_content()
-                        if author_text and len(author_text.strip()) > 0:
-                            post_content["作者"] = author_text.strip()
-                            print(f"获取到作者: {post_content['作者']}")
-                            break
-                except Exception as e:
-                    print(f"使用选择器 {selector} 获取作者时出错: {str(e)}")
-                    continue
-        except Exception as e:
-            print(f"获取作者信息出错: {str(e)}")
+        let content = null;
         
-        # 获取发布时间
-        try:
-            print("尝试获取发布时间")
-            time_selectors = [
-                '.publish-time',
-                '.time',
-                '.date',
-                'time',
-                'span.time'
-            ]
-            
-            for selector in time_selectors:
-                try:
-                    time_element = await main_page.query_selector(selector)
-                    if time_element:
-                        time_text = await time_element.text_content()
-                        if time_text and len(time_text.strip()) > 0:
-                            post_content["发布时间"] = time_text.strip()
-                            print(f"获取到发布时间: {post_content['发布时间']}")
-                            break
-                except Exception as e:
-                    print(f"使用选择器 {selector} 获取时间时出错: {str(e)}")
-                    continue
-        except Exception as e:
-            print(f"获取发布时间出错: {str(e)}")
+        // 方法1：使用精确的ID和class选择器
+        const descText = document.querySelector('#detail-desc .note-text');
+        if (descText && !inComment(descText)) {
+            const text = descText.textContent.trim();
+            if (text.length > 50) content = text;
+        }
         
-        # 获取帖子正文内容 - 方法1：使用精确的ID和class选择器
-        try:
-            print("尝试获取正文内容 - 方法1：使用精确的ID和class选择器")
-            
-            # 先明确标记评论区域
-            await main_page.evaluate('''
-                () => {
-                    const commentSelectors = [
-                        '.comments-container', 
-                        '.comment-list',
-                        '.feed-comment',
-                        'div[data-v-aed4aacc]',
-                        '.content span.note-text'
-                    ];
-                    
-                    for (const selector of commentSelectors) {
-                        const elements = document.querySelectorAll(selector);
-                        elements.forEach(el => {
-                            if (el) {
-                                el.setAttribute('data-is-comment', 'true');
-                                console.log('标记评论区域:', el.tagName, el.className);
-                            }
-                        });
-                    }
-                }
-            ''')
-            
-            # 先尝试获取detail-desc和note-text组合
-            content_element = await main_page.query_selector('#detail-desc .note-text')
-            if content_element:
-                # 检查是否在评论区域内
-                is_in_comment = await content_element.evaluate('(el) => !!el.closest("[data-is-comment=\'true\']") || false')
-                if not is_in_comment:
-                    content_text = await content_element.text_content()
-                    if content_text and len(content_text.strip()) > 50:
-                        post_content["内容"] = content_text.strip()
-                        print(f"方法1获取到正文内容，长度: {len(post_content['内容'])}")
-                    else:
-                        print(f"方法1获取到的内容太短: {len(content_text.strip()) if content_text else 0}")
-                        post_content["内容"] = "未能获取内容"
-                else:
-                    print("方法1找到的元素在评论区域内，跳过")
-                    post_content["内容"] = "未能获取内容"
-            else:
-                print("方法1未找到正文内容元素")
-                post_content["内容"] = "未能获取内容"
-        except Exception as e:
-            print(f"方法1获取正文内容出错: {str(e)}")
-            post_content["内容"] = "未能获取内容"
+        // 方法2：使用XPath选择器
+        if (!content) {
+            const xpath = '//div[@id="detail-desc"]/span[@class="note-text"]';
+            const result = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null);
+            const element = result.singleNodeValue;
+            const text = element ? element.textContent.trim() : '';
+            if (text.length > 20) content = text;
+        }
         
-        # 获取帖子正文内容 - 方法2：使用XPath选择器
-        if post_content["内容"] == "未能获取内容":
-            try:
-                print("尝试获取正文内容 - 方法2：使用XPath选择器")
-                content_text = await main_page.evaluate('''
-                    () => {
-                        const xpath = '//div[@id="detail-desc"]/span[@class="note-text"]';
-                        const result = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null);
-                        const element = result.singleNodeValue;
-                        return element ? element.textContent.trim() : null;
-                    }
-                ''')
-                
-                if content_text and len(content_text) > 20:
-                    post_content["内容"] = content_text
-                    print(f"方法2获取到正文内容，长度: {len(post_content['内容'])}")
-                else:
-                    print(f"方法2获取到的内容太短或为空: {len(content_text) if content_text else 0}")
-            except Exception as e:
-                print(f"方法2获取正文内容出错: {str(e)}")
+        // 方法3：取非评论区域中最长的文本块
+        if (!content) {
+            const candidates = Array.from(document.querySelectorAll('div#detail-desc, div.note-content, div.desc, span.note-text'))
+                .filter(el => {
+                    if (inComment(el)) return false;
+                    const text = el.textContent.trim();
+                    return text.length > 100 && text.length < 10000;
+                })
+                .sort((a, b) => b.textContent.length - a.textContent.length);
+            if (candidates.length > 0) content = candidates[0].textContent.trim();
+        }
         
-        # 获取帖子正文内容 - 方法3：使用JavaScript获取最长文本
-        if post_content["内容"] == "未能获取内容":
+        return { isError: false, title, author, publishTime, content };
+    }
+'''
+
+async def fetch_note(url: str, extraction_mode: str = EXTRACTION_MODE,
+                     use_cache: bool = True, refresh: bool = False) -> NoteRecord:
+    """获取笔记的结构化记录
+    
+    Args:
+        url: 笔记 URL
+        extraction_mode: "api" 优先解析笔记JSON数据，未捕获到时回退到DOM提取；"dom" 只使用DOM提取
+        use_cache: 是否使用笔记缓存，False 时既不读取也不写入缓存
+        refresh: 是否跳过缓存重新获取，获取结果会更新缓存
+    
+    Returns:
+        NoteRecord: 笔记记录，获取失败时 error 字段为错误信息
+    """
+    note_id = extract_note_id(url)
+    
+    if use_cache and not refresh and note_id:
+        cached = note_cache.get(note_id)
+        if cached is not None:
             try:
-                print("尝试获取正文内容 - 方法3：使用JavaScript获取最长文本")
-                content_text = await main_page.evaluate('''
-                    () => {
-                        const commentSelectors = [
-                            '.comments-container', 
-                            '.comment-list',
-                            '.feed-comment',
-                            'div[data-v-aed4aacc]',
-                            '.comment-item',
-                            '[data-is-comment="true"]'
-                        ];
-                        
-                        let commentAreas = [];
-                        for (const selector of commentSelectors) {
-                            const elements = document.querySelectorAll(selector);
-                            elements.forEach(el => commentAreas.push(el));
-                        }
-                        
-                        const contentElements = Array.from(document.querySelectorAll('div#detail-desc, div.note-content, div.desc, span.note-text'))
-                            .filter(el => {
-                                const isInComment = commentAreas.some(commentArea => 
-                                    commentArea && commentArea.contains(el));
-                                
-                                if (isInComment) {
-                                    console.log('排除评论区域内容:', el.tagName, el.className);
-                                    return false;
-                                }
-                                
-                                const text = el.textContent.trim();
-                                return text.length > 100 && text.length < 10000;
-                            })
-                            .sort((a, b) => b.textContent.length - a.textContent.length);
-                        
-                        if (contentElements.length > 0) {
-                            console.log('找到内容元素:', contentElements[0].tagName, contentElements[0].className);
-                            return contentElements[0].textContent.trim();
-                        }
-                        
-                        return null;
-                    }
-                ''')
-                
-                if content_text and len(content_text) > 100:
-                    post_content["内容"] = content_text
-                    print(f"方法3获取到正文内容，长度: {len(post_content['内容'])}")
-                else:
-                    print(f"方法3获取到的内容太短或为空: {len(content_text) if content_text else 0}")
-            except Exception as e:
-                print(f"方法3获取正文内容出错: {str(e)}")
+                record = NoteRecord.from_dict(cached)
+                record.url = url
+                print(f"笔记缓存命中: {note_id}")
+                return record
+            except (KeyError, TypeError):
+                print(f"笔记缓存数据格式已过期，重新获取: {note_id}")
+    
+    login_status = await ensure_browser()
+    if not login_status:
+        return NoteRecord.failed(url, LOGIN_REQUIRED_ERROR)
+    
+    try:
+        async with acquire_page() as page:
+            record = await _read_note_record(page, url, extraction_mode)
+    except Exception as e:
+        return NoteRecord.failed(url, f"获取笔记内容时出错: {str(e)}")
+    
+    if record.error is None and note_id:
+        if use_cache:
+            note_cache.put(note_id, record.to_dict())
+        # 交给后台线程写入数据库，不等待写入完成
+        storage_writer.upsert_notes([record.to_dict()])
+    
+    return record
+
+def _is_retryable(record: NoteRecord) -> bool:
+    """判断获取失败的记录是否值得重试：未登录或笔记本身不可浏览时不重试"""
+    if record.error is None:
+        return False
+    return not record.error.startswith((LOGIN_REQUIRED_ERROR, NOTE_UNAVAILABLE_ERROR))
+
+async def fetch_notes(urls: list, concurrency: int = NOTE_BATCH_CONCURRENCY,
+                      max_retries: int = NOTE_BATCH_MAX_RETRIES, use_cache: bool = True,
+                      refresh: bool = False, progress=None) -> list:
+    """批量获取笔记记录，多个页面并发获取，单条失败不影响其他笔记
+    
+    同一笔记的多个URL只获取一次；获取失败时按指数退避重试，未登录或笔记本身不可浏览时不重试。
+    
+    Args:
+        urls: 笔记 URL 列表
+        concurrency: 同时获取的笔记数上限，实际并发还受页面池大小限制
+        max_retries: 单条笔记失败后的最大重试次数
+        use_cache: 是否使用笔记缓存
+        refresh: 是否跳过缓存重新获取
+        progress: 可选的进度回调协程 progress(已完成数量, 总数, 消息)
+    
+    Returns:
+        list: 与 urls 顺序一致的 NoteRecord 列表，失败的记录 error 字段为错误信息
+    """
+    if not urls:
+        return []
+    
+    # 按笔记ID合并重复的URL（不同路径形式、不同令牌参数），无法识别ID的URL按规范化后的URL合并
+    groups = {}
+    for index, url in enumerate(urls):
+        groups.setdefault(note_key(url), []).append(index)
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = [None] * len(urls)
+    done = 0
+    
+    async def fetch_group(indexes):
+        nonlocal done
+        # 优先使用带访问令牌的链接打开笔记
+        fetch_index = next((index for index in indexes if has_access_token(urls[index])), indexes[0])
+        url = urls[fetch_index]
+        # 每次尝试单独占用并发名额，退避等待期间释放名额，不阻塞其他笔记
+        async with semaphore:
+            record = await fetch_note(url, use_cache=use_cache, refresh=refresh)
+        attempt = 0
+        while _is_retryable(record) and attempt < max_retries:
+            delay = NOTE_BATCH_RETRY_DELAY * (2 ** attempt)
+            attempt += 1
+            print(f"获取笔记失败，{delay:.1f}秒后第{attempt}次重试: {url}，原因: {record.error}")
+            await asyncio.sleep(delay)
+            async with semaphore:
+                record = await fetch_note(url, use_cache=use_cache, refresh=refresh)
         
-        # 格式化返回结果
-        result = f"标题: {post_content['标题']}\n"
-        result += f"作者: {post_content['作者']}\n"
-        result += f"发布时间: {post_content['发布时间']}\n"
-        result += f"链接: {url}\n\n"
-        result += f"内容:\n{post_content['内容']}"
+        for index in indexes:
+            if index == fetch_index:
+                results[index] = record
+            else:
+                results[index] = NoteRecord.from_dict({**record.to_dict(), "url": urls[index]})
         
-        return result
+        done += len(indexes)
+        if progress is not None:
+            status = f"失败: {record.error}" if record.error else record.title
+            await progress(done, len(urls), f"[{done}/{len(urls)}] {url} - {status}")
     
-    except Exception as e:
-        return f"获取笔记内容时出错: {str(e)}"
+    await asyncio.gather(*(fetch_group(indexes) for indexes in groups.values()))
+    return results
 
-async def analyze_note(url: str) -> dict:
-    """获取并分析笔记内容，返回笔记的详细信息供AI生成评论
+async def _capture_note_record(capture, url: str) -> NoteRecord:
+    """从笔记JSON数据中读取笔记：直接打开时来自页面初始状态，站内跳转时来自笔记详情接口"""
+    if not await capture.capture_initial_note_state():
+        await capture.wait_for_items(1, PAGE_READY_TIMEOUTS["scroll"])
+    if not capture.items:
+        return None
+    
+    note = capture.items[0]
+    return NoteRecord.create(
+        url,
+        note_id=note.get("note_id"),
+        title=note.get("title"),
+        author=note.get("author"),
+        publish_time=note.get("publish_time"),
+        content=note.get("content"),
+        liked_count=note.get("liked_count", ""),
+        collected_count=note.get("collected_count", ""),
+        comment_count=note.get("comment_count", "")
+    )
+
+async def _read_note_record(page, url: str, extraction_mode: str = EXTRACTION_MODE) -> NoteRecord:
+    """在给定页面中打开笔记并提取笔记记录
     
     Args:
+        page: 从页面池借出的页面
         url: 笔记 URL
+        extraction_mode: 数据提取模式，"api" 或 "dom"
     """
-    login_status = await ensure_browser()
-    if not login_status:
-        return {"error": "请先登录小红书账号"}
-    
     try:
         # 处理URL
         processed_url = process_url(url)
+        print(f"处理后的URL: {processed_url}")
         
-        # 直接调用get_note_content获取笔记内容
-        note_content_result = await get_note_content(processed_url)
+        async with ResponseCapture(page, FEED_API_PATH, parse_note_feed) as capture:
+            # 访问帖子链接
+            await page.goto(processed_url, timeout=60000)
+            
+            record = None
+            if extraction_mode == "api":
+                record = await _capture_note_record(capture, url)
         
-        # 检查是否获取成功
-        if note_content_result.startswith("请先登录") or note_content_result.startswith("无法获取笔记内容") or note_content_result.startswith("获取笔记内容时出错"):
-            return {"error": note_content_result}
+        if record:
+            print(f"从笔记数据获取到笔记: {record.title[:50]}")
+            return record
         
-        # 解析获取到的笔记内容
-        content_lines = note_content_result.strip().split('\n')
-        post_content = {}
+        await wait_for_page_ready(page, "note")
         
-        # 提取标题、作者、发布时间和内容
-        for i, line in enumerate(content_lines):
-            if line.startswith("标题:"):
-                post_content["标题"] = line.replace("标题:", "").strip()
-            elif line.startswith("作者:"):
-                post_content["作者"] = line.replace("作者:", "").strip()
-            elif line.startswith("发布时间:"):
-                post_content["发布时间"] = line.replace("发布时间:", "").strip()
-            elif line.startswith("内容:"):
-                # 内容可能有多行，获取剩余所有行
-                content_text = "\n".join(content_lines[i+1:]).strip()
-                post_content["内容"] = content_text
-                break
+        # 一次往返提取全部字段
+        detail = await page.evaluate(_NOTE_DETAIL_JS)
         
-        # 如果没有提取到标题或内容，设置默认值
-        if "标题" not in post_content or not post_content["标题"]:
-            post_content["标题"] = "未知标题"
-        if "作者" not in post_content or not post_content["作者"]:
-            post_content["作者"] = "未知作者"
-        if "内容" not in post_content or not post_content["内容"]:
-            post_content["内容"] = "未能获取内容"
+        if detail.get("isError", False):
+            return NoteRecord.failed(url, f"{NOTE_UNAVAILABLE_ERROR}: {detail.get('errorText', '未知错误')}\n请检查链接是否有效或尝试使用带有有效token的完整URL。")
         
-        # 简单分词
-        words = re.findall(r'\w+', f"{post_content.get('标题', '')} {post_content.get('内容', '')}")
+        record = NoteRecord.create(
+            url,
+            note_id=extract_note_id(url),
+            title=detail.get("title"),
+            author=detail.get("author"),
+            publish_time=detail.get("publishTime"),
+            content=detail.get("content")
+        )
+        print(f"从页面获取到笔记: {record.title[:50]}，正文长度: {len(record.content)}")
+        return record
+    
+    except Exception as e:
+        return NoteRecord.failed(url, f"获取笔记内容时出错: {str(e)}")
+
+async def analyze_note(url: str, use_cache: bool = True, refresh: bool = False) -> NoteAnalysis:
+    """获取并分析笔记内容，返回笔记的详细信息供AI生成评论
+    
+    Args:
+        url: 笔记 URL
+        use_cache: 是否使用笔记缓存
+        refresh: 是否跳过缓存重新获取
+    
+    Returns:
+        NoteAnalysis: 分析结果，失败时 error 字段为错误信息
+    """
+    record = None
+    try:
+        # 处理URL
+        processed_url = process_url(url)
         
-        # 使用常见的热门领域关键词
-        domain_keywords = {
-            "美妆": ["口红", "粉底", "眼影", "护肤", "美妆", "化妆", "保湿", "精华", "面膜"],
-            "穿搭": ["穿搭", "衣服", "搭配", "时尚", "风格", "单品", "衣橱", "潮流"],
-            "美食": ["美食", "好吃", "食谱", "餐厅", "小吃", "甜点", "烘焙", "菜谱"],
-            "旅行": ["旅行", "旅游", "景点", "出行", "攻略", "打卡", "度假", "酒店"],
-            "母婴": ["宝宝", "母婴", "育儿", "儿童", "婴儿", "辅食", "玩具"],
-            "数码": ["数码", "手机", "电脑", "相机", "智能", "设备", "科技"],
-            "家居": ["家居", "装修", "家具", "设计", "收纳", "布置", "家装"],
-            "健身": ["健身", "运动", "瘦身", "减肥", "训练", "塑形", "肌肉"],
-            "AI": ["AI", "人工智能", "大模型", "编程", "开发", "技术", "Claude", "GPT"]
-        }
+        # 获取笔记记录（命中缓存时无需启动浏览器）
+        record = await fetch_note(processed_url, use_cache=use_cache, refresh=refresh)
+        if record.error:
+            return NoteAnalysis(record, [], {}, [], record.error)
         
-        # 检测帖子可能属于的领域
-        detected_domains = []
-        for domain, domain_keys in domain_keywords.items():
-            for key in domain_keys:
-                if key.lower() in post_content.get("标题", "").lower() or key.lower() in post_content.get("内容", "").lower():
-                    detected_domains.append(domain)
-                    break
+        # 检测帖子可能属于的领域：一次扫描标题和正文统计各领域关键词命中次数，按命中次数排序
+        domain_hits = domain_matcher.count(record.title, record.content)
+        detected_domains = sorted(domain_hits, key=domain_hits.get, reverse=True)
         
         # 如果没有检测到明确的领域，默认为生活方式
         if not detected_domains:
             detected_domains = ["生活"]
         
-        # 返回分析结果
-        return {
-            "url": url,
-            "标题": post_content.get("标题", "未知标题"),
-            "作者": post_content.get("作者", "未知作者"),
-            "内容": post_content.get("内容", "未能获取内容"),
-            "领域": detected_domains,
-            "关键词": list(set(words))[:20]  # 取前20个不重复的词作为关键词
-        }
+        # jieba 分词后按 TF-IDF 取关键词（分词和IDF更新在线程中执行，不阻塞事件循环）
+        keywords = await asyncio.to_thread(keyword_extractor.extract, f"{record.title} {record.content}", KEYWORD_TOP_K)
+        return NoteAnalysis(record, detected_domains, domain_hits, keywords, None)
     
     except Exception as e:
-        return {"error": f"分析笔记内容时出错: {str(e)}"}
\ No newline at end of file
+        return NoteAnalysis(record or NoteRecord.failed(url, str(e)), [], {}, [], f"分析笔记内容时出错: {str(e)}")
@@ -0,0 +1,139 @@
+"""去重模块 - 按笔记ID合并同一笔记，用 SimHash 指纹和分段索引合并转载、近似相同的笔记"""
+
+import hashlib
+import re
+from functools import lru_cache
+from config import SIMHASH_BITS, SIMHASH_BANDS, SIMHASH_MAX_DISTANCE, SIMHASH_MIN_FEATURES
+from url_canonical import note_key
+from keyword_extractor import tokenize
+
+_COUNT_PATTERN = re.compile(r'([\d.]+)\s*([万wW千kK]?)')
+_COUNT_UNITS = {"万": 10000, "w": 10000, "W": 10000, "千": 1000, "k": 1000, "K": 1000, "": 1}
+
+def parse_count(text) -> float:
+    """解析点赞数等显示文本（如 "1.2万"、"3k"），无法解析时返回0"""
+    match = _COUNT_PATTERN.search(str(text or ""))
+    if not match:
+        return 0.0
+    try:
+        return float(match.group(1)) * _COUNT_UNITS[match.group(2)]
+    except ValueError:
+        return 0.0
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str, bits: int) -> int:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=bits // 8).digest()
+    return int.from_bytes(digest, "big")
+
+def simhash(features: list, bits: int = SIMHASH_BITS) -> int:
+    """计算特征词列表的 SimHash 指纹，出现多次的词权重更高"""
+    weights = {}
+    for feature in features:
+        weights[feature] = weights.get(feature, 0) + 1
+
+    vector = [0] * bits
+    for feature, weight in weights.items():
+        value = _feature_hash(feature, bits)
+        for bit in range(bits):
+            vector[bit] += weight if value >> bit & 1 else -weight
+
+    fingerprint = 0
+    for bit in range(bits):
+        if vector[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class SimHashIndex:
+    """SimHash 分段索引
+
+    指纹切分为 bands 段，每段的值各建一个哈希表。汉明距离不超过 max_distance（小于段数）的
+    两个指纹至少有一段完全相同，因此只需比较至少一段相同的候选，无需与全部指纹逐一比较。
+    """
+
+    def __init__(self, bits: int = SIMHASH_BITS, bands: int = SIMHASH_BANDS,
+                 max_distance: int = SIMHASH_MAX_DISTANCE):
+        if max_distance >= bands:
+            raise ValueError("max_distance 必须小于 bands，才能保证近似指纹至少有一段相同")
+        self.bits = bits
+        self.bands = bands
+        self.max_distance = max_distance
+        self._band_width = -(-bits // bands)
+        self._tables = [{} for _ in range(bands)]
+        self._fingerprints = {}
+
+    def _band_values(self, fingerprint: int):
+        mask = (1 << self._band_width) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self._band_width) & mask
+
+    def find(self, fingerprint: int):
+        """查找与指纹近似的已有条目，返回距离最近的条目键，没有时返回None"""
+        best_key, best_distance = None, None
+        checked = set()
+        for band, value in self._band_values(fingerprint):
+            for key in self._tables[band].get(value, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                distance = hamming_distance(fingerprint, self._fingerprints[key])
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_key, best_distance = key, distance
+        return best_key
+
+    def add(self, key, fingerprint: int):
+        self._fingerprints[key] = fingerprint
+        for band, value in self._band_values(fingerprint):
+            self._tables[band].setdefault(value, []).append(key)
+
+def _representative_rank(result: dict, bodies: dict) -> tuple:
+    """代表条目的优先级：已有正文的优先，其次点赞数多的"""
+    return (result.get("链接", "") in bodies, parse_count(result.get("点赞数")))
+
+def dedupe_results(results: list, bodies: dict = None, min_features: int = SIMHASH_MIN_FEATURES) -> tuple:
+    """合并重复的搜索结果
+
+    先按笔记ID合并（同一笔记带不同 xsec_token 参数的链接），再按标题和正文的 SimHash 指纹
+    合并转载或近似相同的笔记。每组保留已有正文、点赞数最多的一条，结果按每组首次出现的顺序排列。
+
+    Args:
+        results: 搜索结果列表，每项包含"标题"、"链接"，可选"点赞数"
+        bodies: 可选的 {链接: 正文}
+
+    Returns:
+        tuple: (去重后的结果列表, 按笔记ID合并的条数, 按内容相似合并的条数)
+    """
+    bodies = bodies or {}
+    groups = []
+    group_by_note = {}
+    index = SimHashIndex()
+    same_note = similar = 0
+
+    for result in results:
+        link = result.get("链接", "")
+        note_id = note_key(link)
+        group = group_by_note.get(note_id)
+        if group is not None:
+            same_note += 1
+        else:
+            fingerprint = None
+            features = tokenize(f"{result.get('标题', '')} {bodies.get(link, '')}")
+            if len(features) >= min_features:
+                fingerprint = simhash(features, index.bits)
+                group = index.find(fingerprint)
+            if group is None:
+                # 新的一组，以本条为代表
+                group_by_note[note_id] = len(groups)
+                if fingerprint is not None:
+                    index.add(len(groups), fingerprint)
+                groups.append(result)
+                continue
+            similar += 1
+            group_by_note[note_id] = group
+
+        if _representative_rank(result, bodies) > _representative_rank(groups[group], bodies):
+            groups[group] = result
+
+    return groups, same_note, similar
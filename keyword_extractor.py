@@ -0,0 +1,170 @@
+"""关键词提取模块 - jieba 分词 + TF-IDF 排序，IDF 由本地已存储的笔记增量统计"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from config import KEYWORD_IDF_REFRESH_INTERVAL, KEYWORD_TOP_K
+from storage import Storage, storage
+
+# 常见但不能说明笔记内容的词
+STOP_WORDS = {
+    "我们", "你们", "他们", "她们", "自己", "这个", "那个", "这些", "那些", "一个", "一些", "一下",
+    "没有", "什么", "怎么", "这样", "那样", "那么", "就是", "还是", "可以", "因为", "所以", "但是",
+    "如果", "然后", "而且", "真的", "非常", "特别", "现在", "今天", "大家", "已经", "还有", "不是",
+    "时候", "觉得", "感觉", "比较", "其实", "知道", "一样", "之后", "之前", "出来", "起来", "的话",
+    "http", "https", "www", "com"
+}
+
+# 未安装 jieba 时的回退分词：连续汉字按2字切分，英文单词和数字字母组合整体保留
+_FALLBACK_TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[a-zA-Z][a-zA-Z0-9]+')
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+# jieba 模块（首次分词时加载词典，每个进程只加载一次），未安装时为 False
+_jieba = None
+_jieba_lock = threading.Lock()
+
+def _get_jieba():
+    """延迟导入 jieba 并加载词典，未安装时返回None"""
+    global _jieba
+    if _jieba is None:
+        with _jieba_lock:
+            if _jieba is None:
+                try:
+                    import jieba
+                    jieba.initialize()
+                    _jieba = jieba
+                except ImportError:
+                    print("未安装 jieba，关键词提取使用简单分词（pip install jieba 可提高准确度）")
+                    _jieba = False
+    return _jieba or None
+
+def tokenize(text: str) -> list:
+    """分词并过滤停用词、单字和纯数字，英文统一为小写"""
+    jieba = _get_jieba()
+    if jieba:
+        words = jieba.lcut(text or "")
+    else:
+        words = []
+        for run in _FALLBACK_TOKEN_PATTERN.findall(text or ""):
+            if _CJK_PATTERN.match(run) and len(run) > 2:
+                words.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                words.append(run)
+
+    tokens = []
+    for word in words:
+        word = word.strip().lower()
+        if len(word) < 2 or word.isdigit() or word in STOP_WORDS:
+            continue
+        if not (_CJK_PATTERN.search(word) or word.isalnum()):
+            continue
+        tokens.append(word)
+    return tokens
+
+class KeywordExtractor:
+    """TF-IDF 关键词提取器
+
+    文档频率（每个词出现在多少篇笔记中）与笔记保存在同一个数据库（store，默认为全局 storage）中，
+    从已存储的笔记增量统计：每篇笔记只统计一次，之后按 refresh_interval 定期补充新存入的笔记，
+    无需重新扫描全部笔记。
+    """
+
+    def __init__(self, store: Storage = None, refresh_interval: float = KEYWORD_IDF_REFRESH_INTERVAL):
+        self.store = store or storage
+        self.refresh_interval = refresh_interval
+        self._df = None
+        self._doc_count = 0
+        self._last_fetched_at = 0.0
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """把文档频率表读入内存"""
+        try:
+            self._df, state = self.store.load_term_df()
+        except sqlite3.Error as e:
+            print(f"读取文档频率时出错: {str(e)}")
+            self._df, state = {}, {}
+        self._doc_count = int(state.get("doc_count", 0))
+        self._last_fetched_at = state.get("last_fetched_at", 0.0)
+
+    def refresh(self) -> int:
+        """统计上次更新之后新存入的笔记，返回新统计的笔记数"""
+        with self._lock:
+            if self._df is None:
+                self._load()
+            self._refreshed_at = time.monotonic()
+
+            try:
+                rows = self.store.get_notes_fetched_since(self._last_fetched_at)
+                # 笔记重新获取时 fetched_at 会更新，已统计过的笔记不重复计数
+                uncounted = self.store.get_uncounted_notes([row[0] for row in rows]) if rows else set()
+            except sqlite3.Error as e:
+                print(f"读取已存储笔记时出错: {str(e)}")
+                return 0
+            if not rows:
+                return 0
+
+            counted = set()
+            changed = {}
+            for note_id, title, content, fetched_at in rows:
+                self._last_fetched_at = max(self._last_fetched_at, fetched_at)
+                if note_id in counted or note_id not in uncounted:
+                    continue
+                counted.add(note_id)
+                for term in set(tokenize(f"{title or ''} {content or ''}")):
+                    changed[term] = self._df.get(term, 0) + 1
+                    self._df[term] = changed[term]
+            self._doc_count += len(counted)
+
+            try:
+                self.store.save_term_df(counted, changed, {
+                    "doc_count": self._doc_count, "last_fetched_at": self._last_fetched_at
+                })
+            except sqlite3.Error as e:
+                print(f"写入文档频率时出错: {str(e)}")
+            return len(counted)
+
+    def _maybe_refresh(self):
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+
+    def idf(self, term: str) -> float:
+        """平滑的逆文档频率，未见过的词取最大值"""
+        return math.log((self._doc_count + 1) / (self._df.get(term, 0) + 1)) + 1
+
+    def extract(self, text: str, top_k: int = KEYWORD_TOP_K) -> list:
+        """提取关键词，按 TF-IDF 从高到低排列，分数相同时按首次出现顺序
+
+        Args:
+            text: 笔记标题和正文
+            top_k: 返回的关键词数
+
+        Returns:
+            list: 关键词列表
+        """
+        self._maybe_refresh()
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        term_counts = {}
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        total = len(tokens)
+        scores = {term: count / total * self.idf(term) for term, count in term_counts.items()}
+        # dict 保留首次出现顺序，sorted 为稳定排序
+        return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+    def get_stats(self) -> dict:
+        """获取IDF统计信息"""
+        return {
+            "documents": self._doc_count,
+            "terms": len(self._df or {}),
+            "segmenter": "jieba" if _jieba else ("regex" if _jieba is False else "未加载")
+        }
+
+# 全局关键词提取器实例
+keyword_extractor = KeywordExtractor()
@@ -0,0 +1,104 @@
+"""关键词匹配模块 - 基于 Aho-Corasick 自动机的多关键词匹配，一次扫描文本即可统计所有分类的命中次数"""
+
+from collections import deque
+
+# 笔记领域关键词（analyze_note 领域检测）
+DOMAIN_KEYWORDS = {
+    "美妆": ["口红", "粉底", "眼影", "护肤", "美妆", "化妆", "保湿", "精华", "面膜"],
+    "穿搭": ["穿搭", "衣服", "搭配", "时尚", "风格", "单品", "衣橱", "潮流"],
+    "美食": ["美食", "好吃", "食谱", "餐厅", "小吃", "甜点", "烘焙", "菜谱"],
+    "旅行": ["旅行", "旅游", "景点", "出行", "攻略", "打卡", "度假", "酒店"],
+    "母婴": ["宝宝", "母婴", "育儿", "儿童", "婴儿", "辅食", "玩具"],
+    "数码": ["数码", "手机", "电脑", "相机", "智能", "设备", "科技"],
+    "家居": ["家居", "装修", "家具", "设计", "收纳", "布置", "家装"],
+    "健身": ["健身", "运动", "瘦身", "减肥", "训练", "塑形", "肌肉"],
+    "AI": ["AI", "人工智能", "大模型", "编程", "开发", "技术", "Claude", "GPT"]
+}
+
+class KeywordMatcher:
+    """多关键词匹配器
+
+    由 {分类: [关键词, ...]} 构建 Aho-Corasick 自动机，构建一次后可重复使用。
+    匹配耗时只与文本长度（及命中数）相关，与关键词数量无关；默认忽略大小写，
+    同一关键词可属于多个分类，重叠的关键词（如"化妆"和"化妆教程"）都会计数。
+    """
+
+    def __init__(self, table: dict, ignore_case: bool = True):
+        self.ignore_case = ignore_case
+        self.categories = list(table)
+        # 每个状态的转移表、失败指针，以及在该状态结束的 (关键词, 分类) 列表
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for category, keywords in table.items():
+            for keyword in keywords:
+                self._add(keyword, category)
+        self._build_failure_links()
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _add(self, keyword: str, category: str):
+        """把关键词插入字典树"""
+        keyword = self._normalize(keyword)
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if (keyword, category) not in self._output[state]:
+            self._output[state].append((keyword, category))
+
+    def _build_failure_links(self):
+        """按层次遍历计算失败指针，并把失败状态的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str):
+        """扫描文本，依次产出每个命中的 (结束位置, 关键词, 分类)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(self._normalize(text or "")):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword, category in output[state]:
+                yield index + 1, keyword, category
+
+    def count(self, *texts: str) -> dict:
+        """统计各分类的命中次数，返回 {分类: 次数}，只包含有命中的分类，按构建时的分类顺序排列"""
+        counts = {}
+        for text in texts:
+            for _, _, category in self.iter_matches(text):
+                counts[category] = counts.get(category, 0) + 1
+        return {category: counts[category] for category in self.categories if category in counts}
+
+    def keyword_counts(self, *texts: str) -> dict:
+        """统计各关键词的命中次数，返回 {关键词: 次数}"""
+        counts = {}
+        for text in texts:
+            last = None
+            for end, keyword, _ in self.iter_matches(text):
+                # 同一关键词属于多个分类时，同一位置只计一次
+                if (end, keyword) != last:
+                    counts[keyword] = counts.get(keyword, 0) + 1
+                    last = (end, keyword)
+        return counts
+
+# 全局匹配器实例
+domain_matcher = KeywordMatcher(DOMAIN_KEYWORDS)
@@ -0,0 +1,145 @@
+"""笔记缓存模块 - 按笔记ID缓存笔记内容，内存LRU + SQLite持久化，均带过期时间"""
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from config import NOTE_CACHE_MAX_ENTRIES, NOTE_CACHE_TTL, NOTE_CACHE_DB
+from storage import storage_writer
+
+class NoteCache:
+    """笔记内容缓存
+
+    内存层为按最近使用排序的 LRU，超出容量时淘汰最久未使用的条目；
+    磁盘层为 SQLite，进程重启后仍可命中。两层条目超过 ttl 秒均视为过期。
+    写入时只同步更新内存层，磁盘层交给后台写入线程（writer，默认为全局 storage_writer），
+    不在事件循环中等待磁盘IO。
+    """
+
+    def __init__(self, max_entries: int = NOTE_CACHE_MAX_ENTRIES, ttl: float = NOTE_CACHE_TTL,
+                 db_path: str = NOTE_CACHE_DB, writer=None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.db_path = db_path
+        self.writer = writer or storage_writer
+        self._entries = OrderedDict()
+        self._conn = None
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0
+        }
+
+    def _get_conn(self):
+        """延迟打开SQLite连接，首次使用时建表"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS note_cache ("
+                "note_id TEXT PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttl
+
+    def _remember(self, note_id: str, stored_at: float, record: dict):
+        """写入内存层并按LRU淘汰"""
+        self._entries[note_id] = (stored_at, record)
+        self._entries.move_to_end(note_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, note_id: str):
+        """读取缓存，未命中或已过期返回None"""
+        entry = self._entries.get(note_id)
+        if entry is not None:
+            stored_at, record = entry
+            if self._is_fresh(stored_at):
+                self._entries.move_to_end(note_id)
+                self.stats["hits"] += 1
+                return dict(record)
+            # 内存和磁盘中的条目同时写入，内存已过期时无需再查磁盘
+            del self._entries[note_id]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        try:
+            row = self._get_conn().execute(
+                "SELECT data, stored_at FROM note_cache WHERE note_id = ?", (note_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"读取笔记缓存时出错: {str(e)}")
+            row = None
+
+        if row is not None:
+            data, stored_at = row
+            if self._is_fresh(stored_at):
+                record = json.loads(data)
+                self._remember(note_id, stored_at, record)
+                self.stats["disk_hits"] += 1
+                return dict(record)
+            self.stats["expired"] += 1
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, note_id: str, record: dict):
+        """写入缓存：内存层立即更新，磁盘层由后台写入线程写入
+
+        Returns:
+            Future: 磁盘层写入完成的 Future，需要确认写入时可等待
+        """
+        stored_at = time.time()
+        record = dict(record)
+        self._remember(note_id, stored_at, record)
+        return self.writer.submit(lambda store: self._write_disk(note_id, record, stored_at))
+
+    def _write_disk(self, note_id: str, record: dict, stored_at: float):
+        """写入磁盘层并清理过期条目（在后台写入线程中执行）"""
+        try:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO note_cache (note_id, data, stored_at) VALUES (?, ?, ?)",
+                (note_id, json.dumps(record, ensure_ascii=False), stored_at)
+            )
+            conn.execute("DELETE FROM note_cache WHERE stored_at < ?", (stored_at - self.ttl,))
+            conn.commit()
+            self.stats["writes"] += 1
+        except sqlite3.Error as e:
+            print(f"写入笔记缓存时出错: {str(e)}")
+
+    def invalidate(self, note_id: str):
+        """删除指定笔记的缓存，磁盘层由后台写入线程按提交顺序删除"""
+        self._entries.pop(note_id, None)
+        return self.writer.submit(lambda store: self._delete_disk(note_id))
+
+    def _delete_disk(self, note_id: str):
+        """删除磁盘层中的条目（在后台写入线程中执行）"""
+        try:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM note_cache WHERE note_id = ?", (note_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"删除笔记缓存时出错: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        stats = dict(self.stats)
+        stats["memory_entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+# 全局笔记缓存实例
+note_cache = NoteCache()
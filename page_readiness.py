@@ -0,0 +1,196 @@
+"""页面就绪模块 - 基于页面条件等待加载完成，替代固定时长的 sleep"""
+
+import time
+from config import PAGE_READY_TIMEOUTS
+
+# 各类页面的就绪条件：出现任一选择器即视为主体内容已渲染
+READY_SELECTORS = {
+    "home": [
+        '.feeds-container',
+        '#exploreFeeds',
+        'section.note-item',
+        '.login-container'
+    ],
+    "search": [
+        'a[href*="/explore/"]',
+        'a[href*="/discovery/item/"]',
+        'section.note-item',
+        '.search-empty',
+        '.no-result'
+    ],
+    "note": [
+        '#detail-title',
+        '#detail-desc',
+        '.note-content',
+        '.note-detail',
+        '.access-limit-container'
+    ],
+    "comments": [
+        '.comment-item',
+        '.comments-container',
+        '.comment-list',
+        '.no-comments'
+    ],
+    "comment_input": [
+        'textarea[placeholder*="评论"]',
+        'textarea[placeholder*="说点什么"]',
+        'input[placeholder*="评论"]',
+        'input[placeholder*="说点什么"]',
+        '.comment-input',
+        '[contenteditable="true"]'
+    ]
+}
+
+# 需要等待列表数量稳定的页面类型及其计数选择器
+SETTLE_SELECTORS = {
+    "search": 'a[href*="/explore/"], a[href*="/discovery/item/"]',
+    "comments": '.comment-item, .feed-comment'
+}
+
+# 列表为空时出现的提示元素：出现后无需再等待列表数量稳定
+EMPTY_SELECTORS = {
+    "search": ['.search-empty', '.no-result'],
+    "comments": ['.no-comments']
+}
+
+# 出现以下文本说明页面已加载完成（错误页），无需继续等待
+ERROR_TEXTS = [
+    "当前笔记暂时无法浏览",
+    "内容不存在",
+    "页面不存在",
+    "内容已被删除"
+]
+
+_ANY_SELECTOR_JS = '''
+    ([selectors, errorTexts]) => {
+        for (const selector of selectors) {
+            if (document.querySelector(selector)) return true;
+        }
+        const text = document.body ? document.body.innerText : '';
+        return errorTexts.some(t => text.includes(t));
+    }
+'''
+
+_COUNT_SETTLE_JS = '''
+    ([selector, quietMs, emptySelectors, errorTexts]) => {
+        const count = document.querySelectorAll(selector).length;
+        // 列表为空（出现空列表提示或错误页）时立即返回，不等待永远不会出现的元素
+        if (count === 0) {
+            if (emptySelectors.some(s => document.querySelector(s))) return true;
+            const text = document.body ? document.body.innerText : '';
+            if (errorTexts.some(t => text.includes(t))) return true;
+        }
+        const now = performance.now();
+        const state = window.__xhsSettleState;
+        if (!state || state.selector !== selector || state.count !== count) {
+            window.__xhsSettleState = { selector, count, since: now };
+            return false;
+        }
+        return count > 0 && now - state.since >= quietMs;
+    }
+'''
+
+_COUNT_GROWTH_JS = '''
+    ([selector, previous]) => document.querySelectorAll(selector).length > previous
+'''
+
+_COUNT_JS = '(selector) => document.querySelectorAll(selector).length'
+
+async def count_elements(page, selector: str) -> int:
+    """统计当前匹配选择器的元素数量"""
+    try:
+        return await page.evaluate(_COUNT_JS, selector)
+    except Exception:
+        return 0
+
+def _timeout_for(page_type: str, timeout) -> int:
+    """获取页面类型对应的超时时间（毫秒）"""
+    if timeout is not None:
+        return timeout
+    return PAGE_READY_TIMEOUTS.get(page_type, PAGE_READY_TIMEOUTS["default"])
+
+def _log_wait(label: str, started: float, ready: bool):
+    """记录一次等待的实际耗时"""
+    elapsed = (time.perf_counter() - started) * 1000
+    status = "就绪" if ready else "超时"
+    print(f"⏱️ 页面{status}[{label}] 用时 {elapsed:.0f}ms")
+
+async def wait_for_condition(page, script: str, arg=None, timeout: int = None, label: str = "condition") -> bool:
+    """在页面内轮询 JS 条件直到返回真值，超时返回False而不抛出异常
+
+    Args:
+        page: Playwright 页面
+        script: 返回布尔值的 JS 函数
+        arg: 传给 JS 函数的参数
+        timeout: 超时时间（毫秒）
+        label: 日志中显示的等待名称
+    """
+    started = time.perf_counter()
+    try:
+        await page.wait_for_function(
+            script, arg=arg, timeout=_timeout_for(label, timeout), polling=100
+        )
+        ready = True
+    except Exception:
+        ready = False
+    _log_wait(label, started, ready)
+    return ready
+
+async def wait_for_any_selector(page, selectors: list, timeout: int = None, label: str = "selector") -> bool:
+    """等待任一选择器出现（或出现错误页文本），在页面内轮询，只需一次往返"""
+    return await wait_for_condition(page, _ANY_SELECTOR_JS, [selectors, ERROR_TEXTS], timeout, label)
+
+async def wait_for_count_settle(page, selector: str, timeout: int = None, quiet_ms: int = 400,
+                                label: str = "settle", empty_selectors: list = None) -> bool:
+    """等待匹配元素的数量在 quiet_ms 时间内不再变化；没有匹配元素且出现空列表提示或错误页时立即返回"""
+    return await wait_for_condition(
+        page, _COUNT_SETTLE_JS, [selector, quiet_ms, empty_selectors or [], ERROR_TEXTS], timeout, label
+    )
+
+async def wait_for_count_growth(page, selector: str, previous: int, timeout: int = None, label: str = "scroll") -> bool:
+    """滚动后等待匹配元素数量超过 previous，超时返回False表示没有新内容"""
+    if timeout is None:
+        timeout = PAGE_READY_TIMEOUTS["scroll"]
+    return await wait_for_condition(page, _COUNT_GROWTH_JS, [selector, previous], timeout, label)
+
+async def wait_for_network_idle(page, timeout: int = None, label: str = "networkidle") -> bool:
+    """等待网络空闲"""
+    started = time.perf_counter()
+    try:
+        await page.wait_for_load_state("networkidle", timeout=_timeout_for(label, timeout))
+        ready = True
+    except Exception:
+        ready = False
+    _log_wait(label, started, ready)
+    return ready
+
+async def wait_for_page_ready(page, page_type: str, timeout: int = None) -> bool:
+    """按页面类型等待页面就绪
+
+    先等待主体选择器出现，对列表类页面再等待数量稳定；
+    没有配置选择器的页面类型退化为等待网络空闲。
+
+    Args:
+        page: Playwright 页面
+        page_type: 页面类型，如 home、search、note、comments、comment_input
+        timeout: 超时时间（毫秒），默认取 PAGE_READY_TIMEOUTS 中的配置
+
+    Returns:
+        bool: 是否在超时前就绪
+    """
+    timeout = _timeout_for(page_type, timeout)
+    started = time.perf_counter()
+
+    selectors = READY_SELECTORS.get(page_type)
+    if not selectors:
+        return await wait_for_network_idle(page, timeout, label=page_type)
+
+    ready = await wait_for_any_selector(page, selectors, timeout, label=page_type)
+
+    settle_selector = SETTLE_SELECTORS.get(page_type)
+    remaining = timeout - int((time.perf_counter() - started) * 1000)
+    if ready and settle_selector and remaining > 0:
+        await wait_for_count_settle(page, settle_selector, remaining, label=f"{page_type}:settle",
+                                    empty_selectors=EMPTY_SELECTORS.get(page_type))
+
+    return ready
@@ -0,0 +1,111 @@
+"""查询扩展模块 - 从外部文件加载任务分类扩展词表，预先建立索引，文件修改后自动重新加载"""
+
+import json
+import os
+import time
+from config import QUERY_EXPANSION_FILE, QUERY_EXPANSION_CHECK_INTERVAL
+from keyword_matcher import KeywordMatcher
+
+def load_expansion_table(path: str) -> dict:
+    """读取扩展词表文件
+
+    文件为 JSON 对象，键为分类名，值为 {"terms": [匹配词...], "expansions": [扩展关键词...]}；
+    值也可以直接写成词列表，此时列表同时作为匹配词，前3个作为扩展关键词。
+
+    Returns:
+        dict: {分类: (匹配词列表, 扩展关键词列表)}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("扩展词表必须是以分类名为键的JSON对象")
+
+    table = {}
+    for category, entry in data.items():
+        if isinstance(entry, list):
+            terms, expansions = entry, entry[:3]
+        else:
+            terms = entry.get("terms", [])
+            expansions = entry.get("expansions", terms[:3])
+        table[category] = ([str(term) for term in terms], [str(word) for word in expansions])
+    return table
+
+class QueryExpander:
+    """任务描述的查询扩展
+
+    加载词表时把全部匹配词编译为一个 Aho-Corasick 自动机（匹配词 → 分类），分类再对应扩展关键词。
+    查找只扫描一次任务描述，耗时与任务描述长度相关，与词表大小无关。每隔 check_interval 秒
+    检查一次文件修改时间，文件变化后重新加载；新文件有误时继续使用原词表。
+    """
+
+    def __init__(self, path: str = QUERY_EXPANSION_FILE, check_interval: float = QUERY_EXPANSION_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._matcher = KeywordMatcher({})
+        self._expansions = {}
+        self._mtime = None
+        self._term_count = 0
+        self._checked_at = 0.0
+        self.reload()
+
+    def reload(self) -> bool:
+        """重新加载词表文件，成功返回True"""
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            print(f"未找到查询扩展词表，继续使用原词表: {self.path}")
+            self._mtime = None
+            return False
+        try:
+            table = load_expansion_table(self.path)
+        except (OSError, ValueError, AttributeError) as e:
+            # 记录修改时间，文件再次修改前不再重复加载
+            self._mtime = mtime
+            print(f"加载查询扩展词表时出错，继续使用原词表: {str(e)}")
+            return False
+
+        # 先建好新索引再整体替换，查找过程中不会看到未建完的索引
+        matcher = KeywordMatcher({category: terms for category, (terms, _) in table.items()})
+        self._matcher, self._expansions = matcher, {category: expansions for category, (_, expansions) in table.items()}
+        self._mtime = mtime
+        self._term_count = sum(len(terms) for terms, _ in table.values())
+        print(f"已加载查询扩展词表: {len(table)} 个分类，{self._term_count} 个匹配词")
+        return True
+
+    def _maybe_reload(self):
+        """文件修改时间变化时重新加载"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def match_categories(self, text: str) -> dict:
+        """返回任务描述命中的分类及命中次数，按词表中的分类顺序排列"""
+        self._maybe_reload()
+        return self._matcher.count(text)
+
+    def expand(self, text: str) -> list:
+        """返回任务描述命中的所有分类的扩展关键词（去重，保持顺序）"""
+        self._maybe_reload()
+        expansions = self._expansions
+        keywords = []
+        for category in self._matcher.count(text):
+            keywords.extend(expansions.get(category, []))
+        return list(dict.fromkeys(keywords))
+
+    def get_stats(self) -> dict:
+        """获取词表信息"""
+        return {
+            "path": self.path,
+            "categories": len(self._expansions),
+            "terms": self._term_count
+        }
+
+# 全局查询扩展实例
+query_expander = QueryExpander()
@@ -0,0 +1,79 @@
+"""结果排序模块 - 用 BM25 计算候选笔记与查询词的相关性，NumPy 一次性为全部候选打分"""
+
+import numpy as np
+from config import BM25_K1, BM25_B, RANK_TITLE_WEIGHT
+from keyword_extractor import tokenize
+
+def _term_frequencies(documents: list, terms: list) -> np.ndarray:
+    """统计各文档中每个查询词的出现次数，返回 (文档数, 查询词数) 矩阵"""
+    index = {term: column for column, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float64)
+    for row, tokens in enumerate(documents):
+        for token in tokens:
+            column = index.get(token)
+            if column is not None:
+                tf[row, column] += 1
+    return tf
+
+def bm25_scores(query_terms: list, documents: list, k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """计算每个文档对查询词的 BM25 分数
+
+    Args:
+        query_terms: 查询词列表（重复的词只计一次）
+        documents: 已分词的文档列表，每项为词列表，空列表表示该文档没有此字段
+        k1: 词频饱和参数
+        b: 文档长度归一化参数
+
+    Returns:
+        np.ndarray: 与 documents 顺序一致的分数
+    """
+    terms = list(dict.fromkeys(query_terms))
+    if not documents or not terms:
+        return np.zeros(len(documents))
+
+    tf = _term_frequencies(documents, terms)
+    doc_len = np.array([len(tokens) for tokens in documents], dtype=np.float64)
+    avg_len = doc_len[doc_len > 0].mean() if doc_len.any() else 1.0
+
+    # 文档频率只统计有内容的文档，平滑后的IDF始终为正
+    df = np.count_nonzero(tf, axis=0)
+    n_docs = np.count_nonzero(doc_len)
+    idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    denominator = tf + (k1 * (1.0 - b + b * doc_len / avg_len))[:, None]
+    # b=1 时空文档的分母为0，此时分子也为0
+    denominator[denominator == 0] = 1.0
+    return (idf * tf * (k1 + 1.0) / denominator).sum(axis=1)
+
+def rank_results(results: list, query_terms: list, bodies: dict = None,
+                 title_weight: float = RANK_TITLE_WEIGHT) -> list:
+    """按 BM25 相关性给搜索结果排序，分数写入"相关性评分"字段
+
+    标题和正文分别建立索引（正文只在已获取过时参与），总分为标题分数乘以 title_weight
+    加上正文分数；分数相同时保持原有顺序。
+
+    Args:
+        results: 搜索结果列表，每项包含"标题"和"链接"
+        query_terms: 查询关键词，会按与文档相同的方式分词
+        bodies: 可选的 {链接: 正文}
+
+    Returns:
+        list: 排序后的结果列表
+    """
+    if not results:
+        return []
+
+    terms = [token for keyword in query_terms for token in (tokenize(keyword) or [keyword.lower()])]
+    titles = [tokenize(result.get("标题", "")) for result in results]
+    scores = title_weight * bm25_scores(terms, titles)
+    if bodies:
+        contents = [tokenize(bodies.get(result.get("链接", ""), "")) for result in results]
+        scores += bm25_scores(terms, contents)
+
+    order = np.argsort(-scores, kind="stable")
+    ranked = []
+    for position in order:
+        result = results[position]
+        result["相关性评分"] = round(float(scores[position]), 2)
+        ranked.append(result)
+    return ranked
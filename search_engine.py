@@ -1,116 +1,327 @@
 """搜索引擎模块 - 处理各种搜索功能"""
 
 import asyncio
-import json
-import pandas as pd
 from datetime import datetime
-from browser_manager import ensure_browser
-from config import main_page, DATA_DIR, TIMESTAMP
+from browser_manager import ensure_browser, acquire_page
+from config import (
+    EXTRACTION_MODE, PAGE_READY_TIMEOUTS, SEARCH_FANOUT, SEARCH_MAX_RESULTS,
+    SEARCH_MAX_SCROLLS, SEARCH_STALL_ROUNDS, SMART_SEARCH_OVERFETCH, EXPORT_FILES
+)
+from url_canonical import NoteRef, NOTE_PATH_REGEX, process_url, extract_note_id, note_key
+from storage import storage, storage_writer
+from ranking import rank_results
+from dedupe import dedupe_results
+from api_capture import ResponseCapture, SEARCH_API_PATH, parse_search_items
+from page_readiness import wait_for_page_ready, wait_for_condition, SETTLE_SELECTORS
+from query_expansion import query_expander
 
-async def _basic_search(keywords: str, limit: int = 5) -> list:
-    """基础搜索功能，返回搜索结果列表"""
-    login_status = await ensure_browser()
-    if not login_status:
-        return []
-    
-    if not main_page:
-        return []
-    
-    try:
-        # 访问小红书搜索页面
-        search_url = f"https://www.xiaohongshu.com/search_result?keyword={keywords}"
-        await main_page.goto(search_url, timeout=60000)
-        await asyncio.sleep(5)
-        
-        # 滚动页面以加载更多内容
-        for i in range(3):
-            await main_page.evaluate("window.scrollBy(0, 1000)")
-            await asyncio.sleep(2)
-        
-        # 获取搜索结果
-        results = []
-        
-        # 尝试多种选择器来获取笔记链接
-        selectors = [
+# 搜索卡片提取脚本：链接选择器、标题和作者选择器级联全部在页面内完成，
+# 一次 evaluate 返回结构化的卡片列表
+_SEARCH_CARDS_JS = '''
+    (limit) => {
+        const selectors = [
             'a[href*="/explore/"]',
             'a[href*="/discovery/item/"]',
             'section a[href*="/explore/"]',
             'div.note-item a',
             '.feeds-page a[href*="/explore/"]'
-        ]
-        
-        for selector in selectors:
-            try:
-                elements = await main_page.query_selector_all(selector)
-                if elements and len(elements) > 0:
-                    print(f"使用选择器 {selector} 找到 {len(elements)} 个元素")
-                    
-                    for element in elements[:limit]:
-                        try:
-                            href = await element.get_attribute('href')
-                            if href and ('/explore/' in href or '/discovery/item/' in href):
-                                # 确保URL是完整的
-                                if href.startswith('/'):
-                                    href = 'https://www.xiaohongshu.com' + href
-                                
-                                # 尝试获取标题
-                                title = "未知标题"
-                                try:
-                                    title_element = await element.query_selector('span, div, p')
-                                    if title_element:
-                                        title_text = await title_element.text_content()
-                                        if title_text and len(title_text.strip()) > 0:
-                                            title = title_text.strip()[:100]  # 限制标题长度
-                                except Exception:
-                                    pass
-                                
-                                # 尝试获取作者信息
-                                author = "未知作者"
-                                try:
-                                    # 查找父元素中的作者信息
-                                    parent = await element.evaluate('el => el.closest("section, div.note-item, div.note-card")')
-                                    if parent:
-                                        author_selectors = ['span.author', 'div.author', 'a.user-name', 'span.name']
-                                        for author_selector in author_selectors:
-                                            author_element = await parent.query_selector(author_selector)
-                                            if author_element:
-                                                author_text = await author_element.text_content()
-                                                if author_text and len(author_text.strip()) > 0:
-                                                    author = author_text.strip()
-                                                    break
-                                except Exception:
-                                    pass
-                                
-                                results.append({
-                                    "标题": title,
-                                    "链接": href,
-                                    "作者": author
-                                })
-                                
-                                if len(results) >= limit:
-                                    break
-                        except Exception as e:
-                            print(f"处理单个搜索结果时出错: {str(e)}")
-                            continue
-                    
-                    if len(results) >= limit:
-                        break
-            except Exception as e:
-                print(f"使用选择器 {selector} 时出错: {str(e)}")
-                continue
-        
-        return results[:limit]
+        ];
+        const authorSelectors = ['span.author', 'div.author', 'a.user-name', 'span.name'];
+        const results = [];
+        const seen = new Set();
+        
+        for (const selector of selectors) {
+            for (const element of document.querySelectorAll(selector)) {
+                let href = element.getAttribute('href');
+                if (!href || !(href.includes('/explore/') || href.includes('/discovery/item/'))) continue;
+                if (href.startsWith('/')) href = 'https://www.xiaohongshu.com' + href;
+                if (seen.has(href)) continue;
+                seen.add(href);
+                
+                let title = null;
+                const titleElement = element.querySelector('span, div, p');
+                if (titleElement && titleElement.textContent.trim()) {
+                    title = titleElement.textContent.trim().slice(0, 100);
+                }
+                
+                let author = null;
+                const card = element.closest('section, div.note-item, div.note-card');
+                if (card) {
+                    if (!title) {
+                        const cardTitle = card.querySelector('.title, .title span');
+                        if (cardTitle && cardTitle.textContent.trim()) {
+                            title = cardTitle.textContent.trim().slice(0, 100);
+                        }
+                    }
+                    for (const authorSelector of authorSelectors) {
+                        const authorElement = card.querySelector(authorSelector);
+                        if (authorElement && authorElement.textContent.trim()) {
+                            author = authorElement.textContent.trim();
+                            break;
+                        }
+                    }
+                }
+                
+                results.push({ href, title, author });
+                if (results.length >= limit) return results;
+            }
+        }
+        return results;
+    }
+'''
+
+# 滚动到页面底部以触发下一批内容加载
+_SCROLL_TO_BOTTOM_JS = 'window.scrollTo(0, document.body.scrollHeight)'
+
+# 页面出现尚未收集过的卡片，或已到达列表末尾；卡片按笔记ID（与 url_canonical.note_key 相同的规则）比较，
+# 同一笔记的不同路径形式和令牌参数不会被当作新卡片
+_HAS_NEW_CARDS_JS = '''
+    ([selector, seen, notePathRegex]) => {
+        if (document.querySelector('.end-container')) return true;
+        const seenSet = new Set(seen);
+        const notePath = new RegExp(notePathRegex);
+        for (const a of document.querySelectorAll(selector)) {
+            let href = a.getAttribute('href') || '';
+            if (href.startsWith('/')) href = 'https://www.xiaohongshu.com' + href;
+            const match = href.match(notePath);
+            if (!seenSet.has(match ? match[1] : href)) return true;
+        }
+        return false;
+    }
+'''
+
+_FEED_END_JS = "() => !!document.querySelector('.end-container')"
+
+async def _paginate(page, limit: int, collect_batch, wait_for_more, reached_end):
+    """无限滚动分页引擎（异步生成器）
+    
+    每次滚动后收集一批新结果并立即产出，直到收集到 limit 条不重复的结果、列表到底、
+    连续 SEARCH_STALL_ROUNDS 次滚动没有新结果，或达到 SEARCH_MAX_SCROLLS 次滚动。
+    
+    Args:
+        page: 搜索页面
+        limit: 需要的结果数量
+        collect_batch: 收集当前批次并返回新增的不重复结果列表的协程函数
+        wait_for_more: 滚动后等待新内容出现的协程函数，超时返回False
+        reached_end: 判断列表是否已经到底的协程函数
+    
+    Yields:
+        list: 每个批次新增的结果，总数不超过 limit
+    """
+    collected = 0
+    scrolls = 0
+    stalls = 0
+    
+    batch = await collect_batch()
+    while True:
+        if batch:
+            batch = batch[:limit - collected]
+            collected += len(batch)
+            stalls = 0
+            yield batch
+        elif scrolls > 0:
+            stalls += 1
+            if stalls >= SEARCH_STALL_ROUNDS:
+                print(f"连续 {stalls} 次滚动没有新结果，停止加载")
+                break
+        
+        if collected >= limit or scrolls >= SEARCH_MAX_SCROLLS:
+            break
+        if await reached_end():
+            print("搜索结果已到底")
+            break
+        
+        await page.evaluate(_SCROLL_TO_BOTTOM_JS)
+        scrolls += 1
+        await wait_for_more()
+        batch = await collect_batch()
+    
+    print(f"分页完成: 滚动 {scrolls} 次，收集到 {collected} 条不重复结果")
+
+def _api_item_to_result(item: dict) -> dict:
+    """将搜索接口数据转换为搜索结果"""
+    link = NoteRef(item["note_id"], item.get("xsec_token") or "", "pc_search").navigation_url
+    return {
+        "标题": item.get("title") or "未知标题",
+        "链接": link,
+        "作者": item.get("author") or "未知作者",
+        "点赞数": item.get("liked_count", "")
+    }
+
+async def _search_via_api(page, search_url: str, limit: int):
+    """通过监听搜索接口逐批获取结果，滚动触发下一页接口请求"""
+    async with ResponseCapture(page, SEARCH_API_PATH, parse_search_items) as capture:
+        await page.goto(search_url, timeout=60000)
+        if not await capture.wait_for_items(1, PAGE_READY_TIMEOUTS["search"]):
+            print("未捕获到搜索接口数据")
+            return
+        
+        consumed = 0
+        
+        async def collect_batch():
+            nonlocal consumed
+            batch = [_api_item_to_result(item) for item in capture.items[consumed:]]
+            consumed = len(capture.items)
+            return batch
+        
+        async def wait_for_more():
+            return await capture.wait_for_items(len(capture.items) + 1, PAGE_READY_TIMEOUTS["scroll"])
+        
+        async def reached_end():
+            return not capture.has_more
+        
+        async for batch in _paginate(page, limit, collect_batch, wait_for_more, reached_end):
+            yield batch
+
+async def _search_via_dom(page, search_url: str, limit: int, navigate: bool = True):
+    """从页面DOM中逐批提取搜索结果，navigate=False 表示页面已经打开搜索页"""
+    if navigate:
+        await page.goto(search_url, timeout=60000)
+    await wait_for_page_ready(page, "search")
+    
+    # 列表会回收滚出视口的卡片，因此每次滚动后提取当前批次，并按笔记ID跨批次去重
+    card_selector = SETTLE_SELECTORS["search"]
+    collected = {}
+    
+    async def collect_batch():
+        # 一次往返提取当前页面上的所有搜索卡片
+        cards = await page.evaluate(_SEARCH_CARDS_JS, SEARCH_MAX_RESULTS)
+        batch = []
+        for card in cards:
+            key = note_key(card["href"])
+            if key not in collected:
+                collected[key] = {
+                    "标题": card.get("title") or "未知标题",
+                    "链接": process_url(card["href"]),
+                    "作者": card.get("author") or "未知作者"
+                }
+                batch.append(collected[key])
+        return batch
+    
+    async def wait_for_more():
+        return await wait_for_condition(
+            page, _HAS_NEW_CARDS_JS, [card_selector, list(collected), NOTE_PATH_REGEX], label="scroll"
+        )
+    
+    async def reached_end():
+        return await page.evaluate(_FEED_END_JS)
+    
+    async for batch in _paginate(page, limit, collect_batch, wait_for_more, reached_end):
+        yield batch
+
+async def iter_search_batches(keywords: str, limit: int = 5, extraction_mode: str = EXTRACTION_MODE):
+    """流式搜索，每提取到一批搜索卡片就立即产出
+    
+    Args:
+        keywords: 搜索关键词
+        limit: 结果总数限制，最多 SEARCH_MAX_RESULTS 条，只滚动到收集够为止
+        extraction_mode: "api" 优先解析搜索接口数据，未捕获到时回退到DOM提取；"dom" 只使用DOM提取
+    
+    Yields:
+        list: 每批新增的搜索结果
+    """
+    login_status = await ensure_browser()
+    if not login_status:
+        return
+    
+    limit = min(limit, SEARCH_MAX_RESULTS)
+    async with acquire_page() as page:
+        # 访问小红书搜索页面
+        search_url = f"https://www.xiaohongshu.com/search_result?keyword={keywords}"
         
+        produced = 0
+        if extraction_mode == "api":
+            async for batch in _search_via_api(page, search_url, limit):
+                produced += len(batch)
+                yield batch
+        if produced == 0:
+            async for batch in _search_via_dom(page, search_url, limit, navigate=extraction_mode != "api"):
+                yield batch
+
+async def _basic_search(keywords: str, limit: int = 5, extraction_mode: str = EXTRACTION_MODE,
+                        on_batch=None) -> list:
+    """基础搜索功能，返回搜索结果列表
+    
+    Args:
+        keywords: 搜索关键词
+        limit: 返回结果数量限制，最多 SEARCH_MAX_RESULTS 条，只滚动到收集够为止
+        extraction_mode: "api" 优先解析搜索接口数据，未捕获到时回退到DOM提取；"dom" 只使用DOM提取
+        on_batch: 可选的协程回调，每提取到一批结果时以该批结果调用
+    """
+    results = []
+    batches = iter_search_batches(keywords, limit, extraction_mode)
+    try:
+        async for batch in batches:
+            results.extend(batch)
+            if on_batch is not None:
+                await on_batch(batch)
     except Exception as e:
         print(f"搜索过程中出错: {str(e)}")
-        return []
+    finally:
+        # 确保生成器退出时归还页面
+        await batches.aclose()
+    
+    return results[:limit]
+
+def _format_batch_preview(batch: list, start: int) -> str:
+    """格式化一批搜索结果，用于流式进度通知"""
+    lines = []
+    for i, result in enumerate(batch, start):
+        lines.append(f"{i}. {result['标题']} - {result['作者']}\n   {result['链接']}")
+    return "\n".join(lines)
 
-async def search_notes(keywords: str, limit: int = 5) -> str:
+async def _run_search_strategies(strategies: list, fanout: int = SEARCH_FANOUT, progress=None) -> list:
+    """并发执行多个搜索策略，单个策略失败不影响其他策略
+    
+    Args:
+        strategies: 策略列表，每项为 (策略名称, 关键词, 结果数量)
+        fanout: 同时执行的策略数量上限
+        progress: 可选的进度回调协程 progress(已获得数量, 预计总数, 消息)
+    
+    Returns:
+        list: 与 strategies 顺序一致的结果列表，失败的策略对应 None
+    """
+    semaphore = asyncio.Semaphore(max(1, fanout))
+    total = sum(strategy_limit for _, _, strategy_limit in strategies)
+    received = 0
+    
+    async def run(index, name, keyword, strategy_limit):
+        async def on_batch(batch):
+            nonlocal received
+            start = received + 1
+            received += len(batch)
+            if progress is not None:
+                await progress(received, total, f"[{name}] 新增 {len(batch)} 条:\n{_format_batch_preview(batch, start)}")
+        
+        async with semaphore:
+            return index, await _basic_search(keyword, strategy_limit, on_batch=on_batch)
+    
+    tasks = [
+        asyncio.ensure_future(run(index, name, keyword, strategy_limit))
+        for index, (name, keyword, strategy_limit) in enumerate(strategies)
+    ]
+    outcomes = [None] * len(strategies)
+    
+    # 按完成顺序收集结果
+    for future in asyncio.as_completed(tasks):
+        try:
+            index, results = await future
+        except Exception as e:
+            print(f"搜索策略执行出错: {str(e)}")
+            continue
+        outcomes[index] = results
+        print(f"✅ {strategies[index][0]}完成: {len(results)}条结果")
+    
+    return outcomes
+
+async def search_notes(keywords: str, limit: int = 5, progress=None, export_files: bool = EXPORT_FILES) -> str:
     """搜索小红书笔记
     
     Args:
         keywords: 搜索关键词
         limit: 返回结果数量限制，默认5条
+        progress: 可选的进度回调协程 progress(已获得数量, 总数, 消息)，每提取到一批结果调用一次
+        export_files: 是否额外导出CSV文件，搜索结果总会保存到数据库
     """
     login_status = await ensure_browser()
     if not login_status:
@@ -118,7 +329,16 @@ async def search_notes(keywords: str, limit: int = 5) -> str:
     
     try:
         print(f"开始搜索关键词: {keywords}")
-        results = await _basic_search(keywords, limit)
+        received = 0
+        
+        async def on_batch(batch):
+            nonlocal received
+            start = received + 1
+            received += len(batch)
+            if progress is not None:
+                await progress(received, limit, _format_batch_preview(batch, start))
+        
+        results = await _basic_search(keywords, limit, on_batch=on_batch)
         
         if not results:
             return f"未找到关于 '{keywords}' 的相关笔记，请尝试其他关键词。"
@@ -128,14 +348,20 @@ async def search_notes(keywords: str, limit: int = 5) -> str:
         for i, result in enumerate(results, 1):
             result_text += f"{i}. {result['标题']}\n"
             result_text += f"   作者: {result['作者']}\n"
+            if result.get("点赞数"):
+                result_text += f"   点赞: {result['点赞数']}\n"
             result_text += f"   链接: {result['链接']}\n\n"
         
-        # 保存搜索结果到文件
+        # 搜索结果交给后台线程写入数据库，只有需要导出文件时才等待写入完成
         try:
-            df = pd.DataFrame(results)
-            filename = f"{DATA_DIR}/search_results_{keywords}_{TIMESTAMP}.csv"
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            result_text += f"搜索结果已保存到: {filename}"
+            saved = storage_writer.record_search(
+                "search", keywords, results, export_prefix="search_results" if export_files else None
+            )
+            if export_files:
+                search_id, filename = await asyncio.wrap_future(saved)
+                result_text += f"搜索结果已保存到数据库（搜索ID: {search_id}）\n搜索结果已导出到: {filename}"
+            else:
+                result_text += "搜索结果将在后台保存到数据库"
         except Exception as e:
             print(f"保存搜索结果时出错: {str(e)}")
         
@@ -144,12 +370,15 @@ async def search_notes(keywords: str, limit: int = 5) -> str:
     except Exception as e:
         return f"搜索时出错: {str(e)}"
 
-async def smart_search_notes(task_description: str, limit: int = 5) -> str:
+async def smart_search_notes(task_description: str, limit: int = 5, progress=None,
+                             export_files: bool = EXPORT_FILES) -> str:
     """智能搜索笔记 - AI Agent驱动的智能搜索
     
     Args:
         task_description: 任务描述，如"我想学习化妆技巧"、"寻找健身减肥方法"等
         limit: 返回结果数量限制，默认5条
+        progress: 可选的进度回调协程 progress(已获得数量, 预计总数, 消息)，各策略每提取到一批结果调用一次
+        export_files: 是否额外导出CSV/JSON文件，搜索结果和报告总会保存到数据库
     """
     login_status = await ensure_browser()
     if not login_status:
@@ -164,26 +393,8 @@ async def smart_search_notes(task_description: str, limit: int = 5) -> str:
             "分析时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
-        # 关键词提取和扩展
-        keywords_map = {
-            "化妆": ["化妆", "美妆", "彩妆", "妆容", "化妆教程"],
-            "护肤": ["护肤", "保养", "面膜", "精华", "护肤品"],
-            "穿搭": ["穿搭", "搭配", "时尚", "服装", "造型"],
-            "减肥": ["减肥", "瘦身", "健身", "运动", "塑形"],
-            "美食": ["美食", "食谱", "烹饪", "料理", "小吃"],
-            "旅行": ["旅行", "旅游", "攻略", "景点", "出行"],
-            "学习": ["学习", "教程", "技巧", "方法", "经验"]
-        }
-        
-        # 智能关键词匹配
-        detected_keywords = []
-        task_lower = task_description.lower()
-        
-        for category, keywords in keywords_map.items():
-            for keyword in keywords:
-                if keyword in task_lower or keyword in task_description:
-                    detected_keywords.extend(keywords[:3])  # 取前3个相关关键词
-                    break
+        # 智能关键词匹配：按扩展词表索引一次扫描任务描述，取命中分类的扩展关键词
+        detected_keywords = query_expander.expand(task_description)
         
         # 如果没有匹配到预定义关键词，使用原始描述中的关键词
         if not detected_keywords:
@@ -194,69 +405,56 @@ async def smart_search_notes(task_description: str, limit: int = 5) -> str:
         
         print(f"🔍 检测到关键词: {detected_keywords[:5]}")
         
-        # 多策略搜索
+        # 多策略搜索：多取若干倍的结果，排序后再截取 limit 条
+        fetch_limit = min(limit * max(1, SMART_SEARCH_OVERFETCH), SEARCH_MAX_RESULTS)
         all_results = []
         search_strategies = []
+        strategies = []
         
         # 策略1: 主要关键词搜索
         if detected_keywords:
             main_keyword = detected_keywords[0]
             print(f"📝 策略1: 主要关键词搜索 - {main_keyword}")
-            strategy1_results = await _basic_search(main_keyword, limit)
-            all_results.extend(strategy1_results)
-            search_strategies.append(f"主要关键词搜索({main_keyword}): {len(strategy1_results)}条结果")
+            strategies.append(("主要关键词搜索", main_keyword, fetch_limit))
         
         # 策略2: 组合关键词搜索
-        if len(detected_keywords) >= 2:
+        if len(detected_keywords) >= 2 and fetch_limit // 2 > 0:
             combined_keyword = " ".join(detected_keywords[:2])
             print(f"🔗 策略2: 组合关键词搜索 - {combined_keyword}")
-            strategy2_results = await _basic_search(combined_keyword, limit//2)
-            all_results.extend(strategy2_results)
-            search_strategies.append(f"组合关键词搜索({combined_keyword}): {len(strategy2_results)}条结果")
+            strategies.append(("组合关键词搜索", combined_keyword, fetch_limit // 2))
         
         # 策略3: 长尾关键词搜索
-        if len(detected_keywords) >= 3:
+        if len(detected_keywords) >= 3 and fetch_limit // 3 > 0:
             longtail_keyword = detected_keywords[2]
             print(f"🎯 策略3: 长尾关键词搜索 - {longtail_keyword}")
-            strategy3_results = await _basic_search(longtail_keyword, limit//3)
-            all_results.extend(strategy3_results)
-            search_strategies.append(f"长尾关键词搜索({longtail_keyword}): {len(strategy3_results)}条结果")
-        
-        print(f"📊 多策略搜索完成，共获得 {len(all_results)} 条原始结果")
+            strategies.append(("长尾关键词搜索", longtail_keyword, fetch_limit // 3))
         
-        # 智能去重和排序
-        unique_results = []
-        seen_urls = set()
+        # 各策略在独立页面上并发执行，结果按策略顺序合并
+        outcomes = await _run_search_strategies(strategies, progress=progress)
+        for (name, keyword, _), strategy_results in zip(strategies, outcomes):
+            if strategy_results is None:
+                search_strategies.append(f"{name}({keyword}): 执行失败")
+                continue
+            all_results.extend(strategy_results)
+            search_strategies.append(f"{name}({keyword}): {len(strategy_results)}条结果")
         
-        for result in all_results:
-            url = result.get("链接", "")
-            if url not in seen_urls:
-                seen_urls.add(url)
-                unique_results.append(result)
+        print(f"📊 多策略搜索完成，共获得 {len(all_results)} 条原始结果")
         
-        print(f"🔄 去重后剩余 {len(unique_results)} 条结果")
+        # 读取数据库中已有的笔记正文，供去重和排序使用
+        try:
+            note_ids = {result.get("链接", ""): extract_note_id(result.get("链接", "")) for result in all_results}
+            contents = await asyncio.to_thread(storage.get_note_contents, list(note_ids.values()))
+            bodies = {link: contents[note_id] for link, note_id in note_ids.items() if note_id in contents}
+        except Exception as e:
+            print(f"读取已存储的笔记正文时出错: {str(e)}")
+            bodies = {}
         
-        # 结果评分和排序（简单的相关性评分）
-        scored_results = []
-        for result in unique_results:
-            score = 0
-            title = result.get("标题", "").lower()
-            
-            # 根据标题中包含的关键词数量评分
-            for keyword in detected_keywords[:3]:
-                if keyword.lower() in title:
-                    score += 10
-            
-            # 根据标题长度评分（适中长度的标题通常质量更好）
-            title_length = len(result.get("标题", ""))
-            if 10 <= title_length <= 50:
-                score += 5
-            
-            result["相关性评分"] = score
-            scored_results.append(result)
+        # 智能去重：合并同一笔记的不同链接，以及转载、近似相同的笔记
+        unique_results, same_note, similar = await asyncio.to_thread(dedupe_results, all_results, bodies)
+        print(f"🔄 去重后剩余 {len(unique_results)} 条结果（同一笔记 {same_note} 条，近似重复 {similar} 条）")
         
-        # 按评分排序
-        scored_results.sort(key=lambda x: x.get("相关性评分", 0), reverse=True)
+        # 按 BM25 相关性排序：标题全部参与，已获取过正文的笔记正文也参与
+        scored_results = await asyncio.to_thread(rank_results, unique_results, detected_keywords, bodies)
         final_results = scored_results[:limit]
         
         print(f"🏆 最终筛选出 {len(final_results)} 条高质量结果")
@@ -282,25 +480,30 @@ async def smart_search_notes(task_description: str, limit: int = 5) -> str:
         for strategy in search_strategies:
             result_text += f"• {strategy}\n"
         
-        # 保存智能搜索结果
+        # 智能搜索结果和搜索报告交给后台线程写入数据库，只有需要导出文件时才等待写入完成
         try:
-            # 保存结果数据
-            df = pd.DataFrame(final_results)
-            filename = f"{DATA_DIR}/smart_search_{task_description[:10]}_{TIMESTAMP}.csv"
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            
-            # 保存搜索报告
             report_data = {
                 "intent_analysis": intent_analysis,
                 "search_strategies": search_strategies,
                 "results": final_results
             }
-            report_filename = f"{DATA_DIR}/smart_search_report_{task_description[:10]}_{TIMESTAMP}.json"
-            with open(report_filename, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, ensure_ascii=False, indent=2)
+            saved_search = storage_writer.record_search(
+                "smart_search", task_description, final_results,
+                export_prefix="smart_search" if export_files else None
+            )
+            saved_report = storage_writer.save_report(
+                "smart_search", task_description, report_data,
+                export_prefix="smart_search_report" if export_files else None
+            )
             
-            result_text += f"\n💾 搜索结果已保存到: {filename}\n"
-            result_text += f"📄 搜索报告已保存到: {report_filename}"
+            if export_files:
+                search_id, filename = await asyncio.wrap_future(saved_search)
+                report_id, report_filename = await asyncio.wrap_future(saved_report)
+                result_text += f"\n💾 搜索结果已保存到数据库（搜索ID: {search_id}，报告ID: {report_id}）"
+                result_text += f"\n💾 搜索结果已导出到: {filename}\n"
+                result_text += f"📄 搜索报告已导出到: {report_filename}"
+            else:
+                result_text += "\n💾 搜索结果和搜索报告将在后台保存到数据库"
         except Exception as e:
             print(f"保存智能搜索结果时出错: {str(e)}")
         
@@ -309,13 +512,15 @@ async def smart_search_notes(task_description: str, limit: int = 5) -> str:
     except Exception as e:
         return f"🤖 AI智能搜索时出错: {str(e)}"
 
-async def deep_search_and_analyze(task_description: str, analyze_content: bool = True, limit: int = 5) -> str:
+async def deep_search_and_analyze(task_description: str, analyze_content: bool = True, limit: int = 5,
+                                  export_files: bool = EXPORT_FILES) -> str:
     """深度搜索和分析 - AI Agent驱动的深度内容分析
     
     Args:
         task_description: 任务描述
         analyze_content: 是否进行深度内容分析
         limit: 搜索结果数量限制
+        export_files: 是否额外导出CSV/JSON文件，结果和报告总会保存到数据库
     """
     login_status = await ensure_browser()
     if not login_status:
@@ -325,7 +530,7 @@ async def deep_search_and_analyze(task_description: str, analyze_content: bool =
         print(f"🔬 开始深度搜索和分析: {task_description}")
         
         # 第一步：执行智能搜索
-        smart_search_result = await smart_search_notes(task_description, limit)
+        smart_search_result = await smart_search_notes(task_description, limit, export_files=export_files)
         
         if "未找到" in smart_search_result or "出错" in smart_search_result:
             return smart_search_result
@@ -343,9 +548,6 @@ async def deep_search_and_analyze(task_description: str, analyze_content: bool =
             "分析维度": ["内容质量", "用户参与度", "实用性", "创新性"]
         }
         
-        # 模拟内容提取和分析
-        await asyncio.sleep(2)  # 模拟分析时间
-        
         # 生成分析洞察
         insights = [
             "📈 趋势分析: 该领域内容呈现多样化趋势，用户更偏好实用性强的内容",
@@ -384,11 +586,16 @@ async def deep_search_and_analyze(task_description: str, analyze_content: bool =
                 "timestamp": datetime.now().isoformat()
             }
             
-            deep_report_filename = f"{DATA_DIR}/deep_analysis_{task_description[:10]}_{TIMESTAMP}.json"
-            with open(deep_report_filename, 'w', encoding='utf-8') as f:
-                json.dump(deep_report_data, f, ensure_ascii=False, indent=2)
-            
-            deep_analysis_text += f"\n📄 深度分析报告已保存到: {deep_report_filename}"
+            saved_report = storage_writer.save_report(
+                "deep_analysis", task_description, deep_report_data,
+                export_prefix="deep_analysis" if export_files else None
+            )
+            if export_files:
+                report_id, deep_report_filename = await asyncio.wrap_future(saved_report)
+                deep_analysis_text += f"\n📄 深度分析报告已保存到数据库（报告ID: {report_id}）"
+                deep_analysis_text += f"\n📄 深度分析报告已导出到: {deep_report_filename}"
+            else:
+                deep_analysis_text += "\n📄 深度分析报告将在后台保存到数据库"
         except Exception as e:
             print(f"保存深度分析报告时出错: {str(e)}")
         
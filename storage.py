@@ -0,0 +1,472 @@
+"""数据存储模块 - 笔记、搜索结果、评论和分析报告统一保存在一个 SQLite 数据库中，文件输出改为按需导出"""
+
+import atexit
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from config import (
+    STORAGE_DB, DATA_DIR, PERSIST_BATCH_SIZE, PERSIST_FLUSH_INTERVAL, PERSIST_SHUTDOWN_TIMEOUT
+)
+from url_canonical import extract_note_id
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS notes ("
+    "note_id TEXT PRIMARY KEY, url TEXT, title TEXT, author TEXT, publish_time TEXT, content TEXT, "
+    "liked_count TEXT, collected_count TEXT, comment_count TEXT, fetched_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS searches ("
+    "search_id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, keyword TEXT NOT NULL, "
+    "result_count INTEGER NOT NULL, searched_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS search_hits ("
+    "search_id INTEGER NOT NULL, note_id TEXT NOT NULL, rank INTEGER NOT NULL, keyword TEXT NOT NULL, "
+    "title TEXT, author TEXT, url TEXT, liked_count TEXT, score REAL, "
+    "PRIMARY KEY (search_id, note_id))",
+    "CREATE TABLE IF NOT EXISTS comments ("
+    "comment_id TEXT PRIMARY KEY, note_id TEXT NOT NULL, parent_id TEXT, author TEXT, content TEXT, "
+    "publish_time TEXT, created_at INTEGER, like_count TEXT, fetched_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS reports ("
+    "report_id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, task TEXT NOT NULL, "
+    "data TEXT NOT NULL, created_at REAL NOT NULL)",
+    # 关键词提取的文档频率：每个词出现在多少篇笔记中、已统计过的笔记，以及统计的篇数和进度
+    "CREATE TABLE IF NOT EXISTS term_df (term TEXT PRIMARY KEY, df INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS counted_notes (note_id TEXT PRIMARY KEY)",
+    "CREATE TABLE IF NOT EXISTS idf_state (key TEXT PRIMARY KEY, value REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_author ON notes (author)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_fetched_at ON notes (fetched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_searches_keyword ON searches (keyword, searched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_search_hits_note_id ON search_hits (note_id)",
+    "CREATE INDEX IF NOT EXISTS idx_search_hits_keyword ON search_hits (keyword)",
+    "CREATE INDEX IF NOT EXISTS idx_search_hits_author ON search_hits (author)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_note_id ON comments (note_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_author ON comments (author)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_kind ON reports (kind, created_at)"
+]
+
+# 重复写入同一笔记时，只用非空的新值覆盖已有字段（搜索结果中没有正文，不能覆盖已获取的正文）
+_UPSERT_NOTE_SQL = (
+    "INSERT INTO notes (note_id, url, title, author, publish_time, content, "
+    "liked_count, collected_count, comment_count, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(note_id) DO UPDATE SET "
+    "url = COALESCE(NULLIF(excluded.url, ''), notes.url), "
+    "title = COALESCE(NULLIF(excluded.title, ''), notes.title), "
+    "author = COALESCE(NULLIF(excluded.author, ''), notes.author), "
+    "publish_time = COALESCE(NULLIF(excluded.publish_time, ''), notes.publish_time), "
+    "content = COALESCE(NULLIF(excluded.content, ''), notes.content), "
+    "liked_count = COALESCE(NULLIF(excluded.liked_count, ''), notes.liked_count), "
+    "collected_count = COALESCE(NULLIF(excluded.collected_count, ''), notes.collected_count), "
+    "comment_count = COALESCE(NULLIF(excluded.comment_count, ''), notes.comment_count), "
+    "fetched_at = excluded.fetched_at"
+)
+
+def export_timestamp() -> str:
+    """导出文件名中使用的时间戳，每次导出时生成"""
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+def _safe_filename(text: str) -> str:
+    """去掉文件名中不允许出现的字符"""
+    return "".join("_" if ch in '\\/:*?"<>|\r\n\t' else ch for ch in text).strip() or "untitled"
+
+class Storage:
+    """SQLite 数据存储
+
+    使用 WAL 模式，读操作不会被写操作阻塞；批量数据用 executemany 在一个事务中写入。
+    笔记按 note_id 去重，同一笔记重复出现时合并字段。
+    """
+
+    def __init__(self, db_path: str = STORAGE_DB):
+        self.db_path = db_path
+        self._conn = None
+        self._in_batch = False
+
+    def _get_conn(self):
+        """延迟打开SQLite连接，首次使用时开启WAL并建表"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    @contextmanager
+    def batch(self):
+        """在一个事务中执行多次写入，期间各写入方法不再单独提交"""
+        conn = self._get_conn()
+        self._in_batch = True
+        try:
+            with conn:
+                yield
+        finally:
+            self._in_batch = False
+
+    @contextmanager
+    def savepoint(self, name: str = "job"):
+        """在 batch() 中为一组写入设置保存点，出错时只回滚这一组写入并重新抛出异常"""
+        conn = self._get_conn()
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        conn.execute(f"RELEASE {name}")
+
+    @contextmanager
+    def _write(self):
+        """单次写入的事务，处于 batch() 中时并入外层事务"""
+        conn = self._get_conn()
+        if self._in_batch:
+            yield conn
+        else:
+            with conn:
+                yield conn
+
+    def upsert_notes(self, notes: list):
+        """批量写入笔记，notes 为包含 note_id、url、title 等字段的字典列表"""
+        now = time.time()
+        rows = []
+        for note in notes:
+            note_id = note.get("note_id") or extract_note_id(note.get("url", ""))
+            if not note_id:
+                continue
+            rows.append((
+                note_id, note.get("url", ""), note.get("title", ""), note.get("author", ""),
+                note.get("publish_time", ""), note.get("content", ""),
+                str(note.get("liked_count") or ""), str(note.get("collected_count") or ""),
+                str(note.get("comment_count") or ""), now
+            ))
+        if not rows:
+            return
+        with self._write() as conn:
+            conn.executemany(_UPSERT_NOTE_SQL, rows)
+
+    def record_search(self, kind: str, keyword: str, results: list) -> int:
+        """记录一次搜索及其结果，结果中的笔记同时写入笔记表
+
+        Args:
+            kind: 搜索类型，如 search、smart_search
+            keyword: 搜索关键词或任务描述
+            results: 搜索结果列表（含 标题、链接、作者 等字段）
+
+        Returns:
+            int: 搜索ID
+        """
+        now = time.time()
+        hits = []
+        notes = []
+        seen = set()
+        for rank, result in enumerate(results, 1):
+            note_id = extract_note_id(result.get("链接", ""))
+            if not note_id or note_id in seen:
+                continue
+            seen.add(note_id)
+            hits.append((
+                note_id, rank, keyword, result.get("标题", ""), result.get("作者", ""),
+                result.get("链接", ""), str(result.get("点赞数") or ""), result.get("相关性评分")
+            ))
+            notes.append({
+                "note_id": note_id,
+                "url": result.get("链接", ""),
+                "title": result.get("标题", ""),
+                "author": result.get("作者", ""),
+                "liked_count": result.get("点赞数", "")
+            })
+
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT INTO searches (kind, keyword, result_count, searched_at) VALUES (?, ?, ?, ?)",
+                (kind, keyword, len(results), now)
+            )
+            search_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO search_hits (search_id, note_id, rank, keyword, title, author, url, "
+                "liked_count, score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(search_id,) + hit for hit in hits]
+            )
+        self.upsert_notes(notes)
+        return search_id
+
+    def upsert_comments(self, note_id: str, comments: list):
+        """批量写入评论，comments 为 CommentRecord 列表，按评论ID去重"""
+        now = time.time()
+        rows = [
+            (comment.comment_id, note_id, comment.parent_id, comment.author, comment.content,
+             comment.publish_time, comment.created_at, comment.like_count, now)
+            for comment in comments
+        ]
+        if not rows:
+            return
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO comments (comment_id, note_id, parent_id, author, content, "
+                "publish_time, created_at, like_count, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def save_report(self, kind: str, task: str, data: dict) -> int:
+        """保存分析报告，返回报告ID"""
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT INTO reports (kind, task, data, created_at) VALUES (?, ?, ?, ?)",
+                (kind, task, json.dumps(data, ensure_ascii=False), time.time())
+            )
+        return cursor.lastrowid
+
+    def get_search_hits(self, search_id: int) -> list:
+        """按排名读取一次搜索的结果"""
+        rows = self._get_conn().execute(
+            "SELECT title, url, author, liked_count, score FROM search_hits WHERE search_id = ? ORDER BY rank",
+            (search_id,)
+        ).fetchall()
+        return [
+            {"标题": title, "链接": url, "作者": author, "点赞数": liked_count, "相关性评分": score}
+            for title, url, author, liked_count, score in rows
+        ]
+
+    def get_note_contents(self, note_ids: list) -> dict:
+        """读取已获取过正文的笔记，返回 {笔记ID: 正文}"""
+        contents = {}
+        note_ids = list(dict.fromkeys(note_id for note_id in note_ids if note_id))
+        conn = self._get_conn()
+        # 分批查询，避免超出SQLite参数数量上限
+        for start in range(0, len(note_ids), 500):
+            chunk = note_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT note_id, content FROM notes WHERE content != '' AND note_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            contents.update(rows)
+        return contents
+
+    def get_notes_fetched_since(self, fetched_at: float) -> list:
+        """读取 fetched_at 不早于给定时间且已有正文的笔记，返回 (笔记ID, 标题, 正文, 获取时间) 列表"""
+        return self._get_conn().execute(
+            "SELECT note_id, title, content, fetched_at FROM notes "
+            "WHERE fetched_at >= ? AND content != '' ORDER BY fetched_at",
+            (fetched_at,)
+        ).fetchall()
+
+    def load_term_df(self) -> tuple:
+        """读取关键词文档频率，返回 ({词: 文档数}, {状态名: 值})"""
+        conn = self._get_conn()
+        df = dict(conn.execute("SELECT term, df FROM term_df").fetchall())
+        state = dict(conn.execute("SELECT key, value FROM idf_state").fetchall())
+        return df, state
+
+    def get_uncounted_notes(self, note_ids: list) -> set:
+        """返回尚未计入文档频率的笔记ID"""
+        note_ids = list(dict.fromkeys(note_ids))
+        counted = set()
+        conn = self._get_conn()
+        for start in range(0, len(note_ids), 500):
+            chunk = note_ids[start:start + 500]
+            counted.update(row[0] for row in conn.execute(
+                f"SELECT note_id FROM counted_notes WHERE note_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return set(note_ids) - counted
+
+    def save_term_df(self, note_ids: set, changed: dict, state: dict):
+        """记录新统计的笔记、变化的文档频率和统计状态"""
+        with self._write() as conn:
+            conn.executemany("INSERT OR IGNORE INTO counted_notes (note_id) VALUES (?)",
+                             [(note_id,) for note_id in note_ids])
+            conn.executemany("INSERT OR REPLACE INTO term_df (term, df) VALUES (?, ?)", changed.items())
+            conn.executemany("INSERT OR REPLACE INTO idf_state (key, value) VALUES (?, ?)", state.items())
+
+    def get_report(self, report_id: int) -> dict:
+        """读取分析报告"""
+        row = self._get_conn().execute(
+            "SELECT data FROM reports WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def export_search_csv(self, search_id: int, prefix: str, keyword: str) -> str:
+        """将一次搜索的结果导出为CSV文件，返回文件路径"""
+        filename = os.path.join(
+            DATA_DIR, f"{prefix}_{_safe_filename(keyword)}_{export_timestamp()}_{search_id}.csv"
+        )
+        hits = self.get_search_hits(search_id)
+        columns = ["标题", "链接", "作者", "点赞数", "相关性评分"]
+        with open(filename, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(hits)
+        return filename
+
+    def export_report_json(self, report_id: int, prefix: str, task: str) -> str:
+        """将分析报告导出为JSON文件，返回文件路径"""
+        filename = os.path.join(
+            DATA_DIR, f"{prefix}_{_safe_filename(task)}_{export_timestamp()}_{report_id}.json"
+        )
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.get_report(report_id), f, ensure_ascii=False, indent=2)
+        return filename
+
+    def get_stats(self) -> dict:
+        """获取各表的记录数"""
+        conn = self._get_conn()
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("notes", "searches", "search_hits", "comments", "reports")
+        }
+
+# 关闭写入线程的标记
+_STOP = object()
+
+class StorageWriter:
+    """后台持久化写入线程
+
+    工具协程只把写入任务放入队列后立即返回，不在事件循环中执行磁盘IO。写入线程使用独立的
+    数据库连接，把队列中积累的任务（最多 batch_size 个，或等待 flush_interval 秒）合并到
+    一个事务中提交。进程退出时会先写完队列中剩余的任务。
+
+    写入方法返回 concurrent.futures.Future，需要结果（如导出文件路径）时可用
+    asyncio.wrap_future 等待，不会阻塞事件循环。
+    """
+
+    def __init__(self, db_path: str = STORAGE_DB, batch_size: int = PERSIST_BATCH_SIZE,
+                 flush_interval: float = PERSIST_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        # 写入线程和事件循环之间传递任务，使用线程安全的 queue.Queue
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "total_write_ms": 0.0,
+            "max_write_ms": 0.0,
+            "max_queue_wait_ms": 0.0
+        }
+
+    def _ensure_started(self):
+        """首次提交任务时启动写入线程，并注册退出时的写入"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def submit(self, job) -> Future:
+        """提交写入任务，job 为接收 Storage 实例的函数，返回值作为 Future 的结果"""
+        future = Future()
+        self._ensure_started()
+        self.stats["submitted"] += 1
+        self._queue.put((job, future, time.perf_counter()))
+        return future
+
+    def upsert_notes(self, notes: list) -> Future:
+        notes = [dict(note) for note in notes]
+        return self.submit(lambda store: store.upsert_notes(notes))
+
+    def upsert_comments(self, note_id: str, comments: list) -> Future:
+        comments = list(comments)
+        return self.submit(lambda store: store.upsert_comments(note_id, comments))
+
+    def record_search(self, kind: str, keyword: str, results: list, export_prefix: str = None) -> Future:
+        """记录搜索结果，export_prefix 不为空时同时导出CSV；Future 结果为 (搜索ID, 导出文件路径)"""
+        results = [dict(result) for result in results]
+
+        def job(store):
+            search_id = store.record_search(kind, keyword, results)
+            filename = store.export_search_csv(search_id, export_prefix, keyword[:10]) if export_prefix else None
+            return search_id, filename
+        return self.submit(job)
+
+    def save_report(self, kind: str, task: str, data: dict, export_prefix: str = None) -> Future:
+        """保存分析报告，export_prefix 不为空时同时导出JSON；Future 结果为 (报告ID, 导出文件路径)"""
+        data = json.loads(json.dumps(data, ensure_ascii=False))
+
+        def job(store):
+            report_id = store.save_report(kind, task, data)
+            filename = store.export_report_json(report_id, export_prefix, task[:10]) if export_prefix else None
+            return report_id, filename
+        return self.submit(job)
+
+    def _run(self):
+        store = Storage(self.db_path)
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(0, remaining)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(store, batch)
+
+    def _write_batch(self, store: Storage, batch: list):
+        """在一个事务中执行一批任务，每个任务使用独立的保存点，单个任务失败只回滚该任务的写入"""
+        started = time.perf_counter()
+        results = []
+        try:
+            with store.batch():
+                for job, future, enqueued_at in batch:
+                    self.stats["max_queue_wait_ms"] = max(
+                        self.stats["max_queue_wait_ms"], (started - enqueued_at) * 1000
+                    )
+                    try:
+                        with store.savepoint():
+                            results.append((future, job(store), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            print(f"批量写入数据库时出错: {str(e)}")
+            results = [(future, None, e) for _, future, _ in batch]
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats["batches"] += 1
+        self.stats["total_write_ms"] += elapsed
+        self.stats["max_write_ms"] = max(self.stats["max_write_ms"], elapsed)
+        for future, result, error in results:
+            if error is None:
+                self.stats["written"] += 1
+                future.set_result(result)
+            else:
+                self.stats["failed"] += 1
+                print(f"写入数据库时出错: {str(error)}")
+                future.set_exception(error)
+
+    def close(self, timeout: float = PERSIST_SHUTDOWN_TIMEOUT):
+        """写完队列中剩余的任务后停止写入线程"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"持久化队列未能在 {timeout} 秒内写完，剩余 {self._queue.qsize()} 个任务")
+
+    def get_stats(self) -> dict:
+        """获取写入统计：队列深度、写入数量和写入耗时"""
+        stats = dict(self.stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_write_ms"] = stats["total_write_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+# 全局数据存储实例（用于查询）和后台写入线程（用于写入）
+storage = Storage()
+storage_writer = StorageWriter()
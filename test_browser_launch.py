@@ -0,0 +1,118 @@
+"""浏览器启动测试 - 用假的 Playwright 驱动验证多实例共用同一个驱动"""
+
+import asyncio
+import sys
+import types
+
+import pytest
+
+import browser_manager
+import config
+
+class FakeContext:
+    def __init__(self, driver):
+        self.driver = driver
+        self.closed = False
+
+    async def new_page(self):
+        return object()
+
+    def on(self, event, handler):
+        pass
+
+    async def cookies(self, *urls):
+        return []
+
+    async def close(self):
+        self.closed = True
+
+class FakeChromium:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def launch_persistent_context(self, user_data_dir, **options):
+        await asyncio.sleep(0)
+        if self.driver.stopped or user_data_dir in self.driver.failing:
+            raise RuntimeError(f"无法启动 {user_data_dir}")
+        context = FakeContext(self.driver)
+        self.driver.contexts.append(context)
+        return context
+
+class FakeDriver:
+    def __init__(self, failing):
+        self.failing = failing
+        self.stopped = False
+        self.contexts = []
+        self.chromium = FakeChromium(self)
+
+    async def stop(self):
+        self.stopped = True
+
+@pytest.fixture
+def drivers(monkeypatch, tmp_path):
+    """替换 playwright.async_api，返回已启动的驱动列表；failing 中的配置目录启动失败"""
+    started = []
+    failing = set()
+
+    class Starter:
+        async def start(self):
+            await asyncio.sleep(0)
+            driver = FakeDriver(failing)
+            started.append(driver)
+            return driver
+
+    api = types.ModuleType("playwright.async_api")
+    api.async_playwright = Starter
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.async_api", api)
+
+    profiles = [str(tmp_path / f"worker-{i}") for i in range(1, 3)]
+
+    async def prepare_profiles():
+        return profiles
+
+    async def no_cleanup():
+        pass
+
+    monkeypatch.setattr(browser_manager, "_worker_count", lambda: 3)
+    monkeypatch.setattr(browser_manager, "_prepare_worker_profiles", prepare_profiles)
+    monkeypatch.setattr(browser_manager, "_cleanup_temp_dirs", no_cleanup)
+    monkeypatch.setattr(browser_manager, "init_environment", lambda: None)
+    for name in ("browser_context", "main_page", "page_pool", "_playwright"):
+        monkeypatch.setattr(browser_manager, name, None)
+        if hasattr(config, name):
+            monkeypatch.setattr(config, name, None)
+    monkeypatch.setattr(browser_manager, "_workers", [])
+    return started, failing, profiles
+
+def test_instances_share_one_driver(drivers):
+    started, _, _ = drivers
+
+    asyncio.run(browser_manager._ensure_browser_locked())
+
+    assert len(started) == 1
+    assert len(started[0].contexts) == 3
+    assert len(browser_manager._workers) == 2
+
+def test_failed_worker_keeps_driver_and_main_context(drivers):
+    started, failing, profiles = drivers
+    failing.add(profiles[0])
+
+    asyncio.run(browser_manager._ensure_browser_locked())
+
+    assert len(started) == 1 and not started[0].stopped
+    assert not browser_manager.browser_context.closed
+    assert [worker[2] for worker in browser_manager._workers] == [profiles[1]]
+
+def test_dead_driver_is_restarted(drivers):
+    started, _, _ = drivers
+    dead = FakeDriver(set())
+    dead.stopped = True
+    browser_manager._playwright = dead
+
+    asyncio.run(browser_manager._ensure_browser_locked())
+
+    assert len(started) == 1
+    assert browser_manager._playwright is started[0]
+    assert browser_manager.browser_context.driver is started[0]
+    assert len(browser_manager._workers) == 2
@@ -0,0 +1,86 @@
+"""评论增量同步测试 - 只返回上次同步之后的新评论，热门的已知评论排在前面时继续加载"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import comment_manager
+from comment_crawler import CommentRecord, CommentCrawlResult
+from comment_sync import CommentSyncStore
+from config import COMMENT_SYNC_KNOWN_ROUNDS
+
+NOTE_ID = "65a1b2c3d4e5f60718293a4b"
+NOTE_URL = f"https://www.xiaohongshu.com/explore/{NOTE_ID}"
+
+def _comment(comment_id: str, created_at: int = 0) -> CommentRecord:
+    return CommentRecord.from_dict({"comment_id": comment_id, "content": comment_id, "created_at": created_at})
+
+def test_known_filter_uses_ids_and_high_water(tmp_path):
+    store = CommentSyncStore(str(tmp_path / "sync.db"))
+    store.record(NOTE_ID, [_comment("a", 1000), _comment("b", 2000)])
+
+    is_known = store.known_filter(NOTE_ID)
+
+    assert is_known(_comment("a"))
+    assert is_known(_comment("old", 1500))
+    assert not is_known(_comment("new", 3000))
+    # DOM 提取的评论没有发布时间，只能按ID判断
+    assert not is_known(_comment("dom"))
+
+def test_state_survives_restart_and_reset(tmp_path):
+    db_path = str(tmp_path / "sync.db")
+    CommentSyncStore(db_path).record(NOTE_ID, [_comment("a", 1000), _comment("b", 2000)])
+
+    store = CommentSyncStore(db_path)
+    state = store.get_state(NOTE_ID)
+    assert (state["newest_created_at"], state["seen_count"]) == (2000, 2)
+    store.record(NOTE_ID, [_comment("a", 1000), _comment("c", 500)])
+    assert store.get_state(NOTE_ID)["seen_count"] == 3
+    assert store.get_state(NOTE_ID)["newest_created_at"] == 2000
+
+    store.reset(NOTE_ID)
+    assert store.get_state(NOTE_ID) is None
+    assert not store.known_filter(NOTE_ID)(_comment("a", 1000))
+
+def _fake_crawl(batches: list, loaded: list):
+    """按批次返回评论的假抓取函数，stop_when 返回True时停止，loaded 记录实际加载的批数"""
+    async def crawl_comments(page, url, max_comments=None, stop_when=None):
+        comments = []
+        for batch in batches:
+            comments.extend(batch)
+            loaded.append(batch)
+            if stop_when is not None and stop_when(batch):
+                break
+        return CommentCrawlResult(url, NOTE_ID, comments, len(loaded) == len(batches), None)
+    return crawl_comments
+
+def test_sync_continues_past_known_hot_comments(tmp_path, monkeypatch):
+    store = CommentSyncStore(str(tmp_path / "sync.db"))
+    store.record(NOTE_ID, [_comment(f"hot{i}") for i in range(COMMENT_SYNC_KNOWN_ROUNDS + 1)])
+
+    @asynccontextmanager
+    async def fake_page():
+        yield None
+
+    async def logged_in():
+        return True
+
+    monkeypatch.setattr(comment_manager, "comment_sync_store", store)
+    monkeypatch.setattr(comment_manager, "ensure_browser", logged_in)
+    monkeypatch.setattr(comment_manager, "acquire_page", fake_page)
+    monkeypatch.setattr(comment_manager, "_store_comments", lambda result: None)
+
+    # 置顶的已知评论在前，新评论在后，之后是连续的已知评论
+    batches = [[_comment("hot0")], [_comment("new1")]]
+    batches += [[_comment(f"hot{i}")] for i in range(1, COMMENT_SYNC_KNOWN_ROUNDS + 1)]
+    batches.append([_comment("never_loaded")])
+    loaded = []
+    monkeypatch.setattr(comment_manager, "crawl_comments", _fake_crawl(batches, loaded))
+
+    text = asyncio.run(comment_manager.sync_note_comments(NOTE_URL))
+
+    assert "新增 1 条评论" in text
+    # 到达上次同步的位置而停止不算未加载完
+    assert "评论未全部加载" not in text
+    assert len(loaded) == 2 + COMMENT_SYNC_KNOWN_ROUNDS
+    assert "new1" in store.seen_ids(NOTE_ID)
+    assert "never_loaded" not in store.seen_ids(NOTE_ID)
@@ -0,0 +1,84 @@
+"""笔记分析测试 - 命中缓存的笔记无需启动浏览器，可直接验证领域检测和关键词提取"""
+
+import asyncio
+
+import content_analyzer
+from content_analyzer import NoteRecord, analyze_note
+from keyword_extractor import KeywordExtractor
+from note_cache import NoteCache
+from storage import Storage, StorageWriter
+
+NOTE_ID = "65a1b2c3d4e5f60718293a4b"
+NOTE_URL = f"https://www.xiaohongshu.com/explore/{NOTE_ID}?xsec_token=abc&xsec_source=pc_search"
+
+def _notes_store(tmp_path, notes: list) -> Storage:
+    """在临时数据库中写入笔记，供IDF统计使用"""
+    store = Storage(str(tmp_path / "storage.db"))
+    store.upsert_notes([{"note_id": note_id, "title": title, "content": content} for note_id, title, content in notes])
+    return store
+
+def test_extract_ranks_by_tfidf(tmp_path):
+    extractor = KeywordExtractor(_notes_store(tmp_path, [
+        ("n1", "成都美食", "成都火锅推荐"),
+        ("n2", "成都旅行", "成都景点攻略"),
+        ("n3", "成都穿搭", "成都街拍穿搭")
+    ]))
+
+    keywords = extractor.extract("成都口红试色 口红 口红", top_k=3)
+
+    # 每篇笔记都出现的"成都"IDF最低，排在只在本文出现的"口红"之后
+    assert keywords[0] == "口红"
+    assert extractor.get_stats()["documents"] == 3
+    assert extractor.extract("成都口红试色 口红 口红", top_k=3) == keywords
+
+def test_extract_counts_each_note_once(tmp_path):
+    store = _notes_store(tmp_path, [("n1", "成都美食", "成都火锅推荐")])
+    extractor = KeywordExtractor(store, refresh_interval=0)
+
+    assert extractor.refresh() == 1
+    assert extractor.refresh() == 0
+    # 重新获取的笔记 fetched_at 更新，但不重复计数；文档频率保存在同一个数据库中，重启后仍有效
+    store.upsert_notes([{"note_id": "n1", "title": "成都美食", "content": "成都火锅推荐"}])
+    assert extractor.refresh() == 0
+    restarted = KeywordExtractor(Storage(store.db_path))
+    restarted.refresh()
+    assert restarted.get_stats()["documents"] == 1
+
+def test_analyze_cached_note(tmp_path, monkeypatch):
+    cache = NoteCache(db_path=str(tmp_path / "cache.db"), writer=StorageWriter(str(tmp_path / "storage.db")))
+    record = NoteRecord.create(NOTE_URL, note_id=NOTE_ID, title="平价口红试色",
+                               content="分享几支平价口红，口红颜色很显白，适合日常化妆")
+    cache.put(NOTE_ID, record.to_dict())
+    monkeypatch.setattr(content_analyzer, "note_cache", cache)
+    monkeypatch.setattr(content_analyzer, "keyword_extractor", KeywordExtractor(Storage(str(tmp_path / "storage.db"))))
+
+    async def no_browser():
+        raise AssertionError("命中缓存时不应启动浏览器")
+    monkeypatch.setattr(content_analyzer, "ensure_browser", no_browser)
+
+    result = asyncio.run(analyze_note(NOTE_URL))
+
+    assert result.error is None
+    assert result.record.title == "平价口红试色"
+    assert result.domains[0] == "美妆"
+    assert result.domain_hits["美妆"] >= 3
+    assert "口红" in result.keywords
+
+def test_retry_backoff_releases_concurrency_slot(monkeypatch):
+    bad_url = f"https://www.xiaohongshu.com/explore/{NOTE_ID}"
+    good_url = "https://www.xiaohongshu.com/explore/65a1b2c3d4e5f60718293a4c"
+    events = []
+
+    async def fake_fetch(url, use_cache=True, refresh=False):
+        events.append(url)
+        if url == bad_url and events.count(bad_url) == 1:
+            return NoteRecord.failed(url, "页面加载超时")
+        return NoteRecord.create(url, note_id=url.rsplit("/", 1)[-1], title="标题")
+    monkeypatch.setattr(content_analyzer, "fetch_note", fake_fetch)
+    monkeypatch.setattr(content_analyzer, "NOTE_BATCH_RETRY_DELAY", 0.05)
+
+    records = asyncio.run(content_analyzer.fetch_notes([bad_url, good_url], concurrency=1))
+
+    assert [record.error for record in records] == [None, None]
+    # 失败的笔记退避等待时，另一条笔记已经拿到并发名额
+    assert events == [bad_url, good_url, bad_url]
@@ -0,0 +1,72 @@
+"""去重测试 - 同一笔记的不同链接和近似相同的笔记合并为一条"""
+
+import pytest
+
+from dedupe import SimHashIndex, dedupe_results, hamming_distance, parse_count, simhash
+
+NOTE_A = "65a1b2c3d4e5f60718293a4b"
+NOTE_B = "65a1b2c3d4e5f60718293a4c"
+NOTE_C = "65a1b2c3d4e5f60718293a4d"
+
+def _link(note_id: str, token: str = "") -> str:
+    url = f"https://www.xiaohongshu.com/explore/{note_id}"
+    return f"{url}?xsec_token={token}&xsec_source=pc_search" if token else url
+
+@pytest.mark.parametrize("text, expected", [("1.2万", 12000), ("3k", 3000), ("86", 86), ("", 0), ("赞", 0)])
+def test_parse_count(text, expected):
+    assert parse_count(text) == expected
+
+def test_simhash_ignores_feature_order():
+    features = ["成都", "火锅", "推荐", "本地人", "必吃", "老店", "排队", "牛油", "锅底", "毛肚"]
+
+    assert simhash(features) == simhash(list(reversed(features)))
+    assert hamming_distance(simhash(features), simhash(["杭州", "西湖", "攻略"])) > 3
+
+def test_index_finds_near_fingerprints():
+    index = SimHashIndex(bits=64, bands=4, max_distance=3)
+    index.add("a", 0b1011)
+    index.add("b", 1 << 63)
+
+    assert index.find(0b1011 ^ 0b111) == "a"
+    assert index.find(0b1011 ^ (0b1111 << 20)) is None
+
+def test_index_requires_distance_below_bands():
+    with pytest.raises(ValueError):
+        SimHashIndex(bands=3, max_distance=3)
+
+def test_merges_same_note_and_near_duplicates():
+    title = "成都火锅推荐 本地人必吃的老店 牛油锅底 毛肚鸭肠"
+    results = [
+        {"标题": title, "链接": _link(NOTE_A, "aaa"), "点赞数": "120"},
+        {"标题": "杭州西湖一日游攻略 路线和美食都整理好了", "链接": _link(NOTE_C), "点赞数": "80"},
+        {"标题": title, "链接": _link(NOTE_A, "bbb"), "点赞数": "120"},
+        {"标题": title + "！", "链接": _link(NOTE_B), "点赞数": "1.5万"}
+    ]
+
+    merged, same_note, similar = dedupe_results(results)
+
+    assert (same_note, similar) == (1, 1)
+    # 每组保留点赞数最多的一条，按每组首次出现的顺序排列
+    assert [result["链接"] for result in merged] == [_link(NOTE_B), _link(NOTE_C)]
+
+def test_prefers_result_with_body():
+    results = [
+        {"标题": "平价口红试色", "链接": _link(NOTE_A, "aaa"), "点赞数": "999"},
+        {"标题": "平价口红试色", "链接": _link(NOTE_A, "bbb"), "点赞数": "1"}
+    ]
+
+    merged, same_note, _ = dedupe_results(results, bodies={_link(NOTE_A, "bbb"): "正文"})
+
+    assert same_note == 1
+    assert merged == [results[1]]
+
+def test_short_titles_are_not_fingerprinted():
+    results = [
+        {"标题": "好看", "链接": _link(NOTE_A)},
+        {"标题": "好看", "链接": _link(NOTE_B)}
+    ]
+
+    merged, _, similar = dedupe_results(results)
+
+    assert similar == 0
+    assert len(merged) == 2
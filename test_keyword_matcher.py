@@ -0,0 +1,47 @@
+"""关键词匹配测试 - Aho-Corasick 匹配结果与逐个关键词计数一致"""
+
+from keyword_matcher import DOMAIN_KEYWORDS, KeywordMatcher
+
+def _naive_count(text: str, keyword: str) -> int:
+    """逐位置统计关键词出现次数（允许重叠）"""
+    return sum(text.startswith(keyword, start) for start in range(len(text)))
+
+def test_counts_overlapping_keywords():
+    matcher = KeywordMatcher({"美妆": ["化妆", "化妆教程", "妆教"], "教育": ["教程"]})
+
+    assert matcher.keyword_counts("化妆教程：新手化妆") == {"化妆": 2, "化妆教程": 1, "妆教": 1, "教程": 1}
+    assert matcher.count("化妆教程：新手化妆") == {"美妆": 4, "教育": 1}
+
+def test_matches_naive_counts_on_domain_table():
+    # 默认忽略大小写，keyword_counts 返回小写的关键词
+    matcher = KeywordMatcher(DOMAIN_KEYWORDS)
+    text = "周末去成都旅行，打卡美食餐厅，顺便买了口红和粉底，用AI做了旅游攻略，Claude和gpt都试了"
+
+    expected = {}
+    for keywords in DOMAIN_KEYWORDS.values():
+        for keyword in keywords:
+            count = _naive_count(text.lower(), keyword.lower())
+            if count:
+                expected[keyword.lower()] = count
+    assert matcher.keyword_counts(text) == expected
+
+def test_category_order_and_multiple_texts():
+    matcher = KeywordMatcher({"穿搭": ["穿搭"], "美食": ["好吃"]})
+
+    counts = matcher.count("这家店好吃", "秋季穿搭", "好吃不贵")
+
+    assert counts == {"穿搭": 1, "美食": 2}
+    assert list(counts) == ["穿搭", "美食"]
+
+def test_keyword_in_several_categories_counts_once_per_position():
+    matcher = KeywordMatcher({"旅行": ["攻略"], "美食": ["攻略", "美食"]})
+
+    assert matcher.count("美食攻略") == {"旅行": 1, "美食": 2}
+    assert matcher.keyword_counts("美食攻略") == {"美食": 1, "攻略": 1}
+
+def test_case_sensitivity():
+    table = {"AI": ["GPT"]}
+
+    assert KeywordMatcher(table).count("gpt") == {"AI": 1}
+    assert KeywordMatcher(table, ignore_case=False).count("gpt") == {}
+    assert KeywordMatcher({}).count("任何文本") == {}
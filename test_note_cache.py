@@ -0,0 +1,96 @@
+"""笔记缓存测试 - 内存层按LRU淘汰，两层条目过期后不再命中"""
+
+import time
+
+from note_cache import NoteCache
+from storage import StorageWriter
+
+def _cache(tmp_path, **options) -> NoteCache:
+    """使用临时目录中的缓存数据库和写入线程"""
+    writer = StorageWriter(str(tmp_path / "storage.db"), flush_interval=0)
+    return NoteCache(db_path=str(tmp_path / "cache.db"), writer=writer, **options)
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", {"title": "a"})
+    cache.put("b", {"title": "b"}).result(timeout=5)
+    assert cache.get("a") == {"title": "a"}
+
+    cache.put("c", {"title": "c"})
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_entries"] == 2
+    # b 最久未使用，被淘汰出内存层，但仍可从磁盘层读回
+    assert cache.get("b") == {"title": "b"}
+    assert cache.get_stats()["disk_hits"] == 1
+    assert cache.get_stats()["hits"] == 1
+
+def test_returned_records_are_copies(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("a", {"title": "a"})
+
+    cache.get("a")["title"] = "changed"
+
+    assert cache.get("a") == {"title": "a"}
+
+def test_put_does_not_wait_for_disk(tmp_path):
+    class PausedWriter:
+        def __init__(self):
+            self.jobs = []
+
+        def submit(self, job):
+            self.jobs.append(job)
+
+    writer = PausedWriter()
+    cache = NoteCache(db_path=str(tmp_path / "cache.db"), writer=writer)
+
+    cache.put("a", {"title": "a"})
+
+    assert cache.get("a") == {"title": "a"}
+    assert len(writer.jobs) == 1 and cache.get_stats()["writes"] == 0
+    writer.jobs[0](None)
+    assert cache.get_stats()["writes"] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    _cache(tmp_path).put("a", {"title": "a"}).result(timeout=5)
+
+    cache = _cache(tmp_path)
+
+    assert cache.get("a") == {"title": "a"}
+    assert cache.get_stats()["disk_hits"] == 1
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache = _cache(tmp_path, ttl=60)
+    cache.put("a", {"title": "a"}).result(timeout=5)
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert _cache(tmp_path, ttl=60).get("a") is None
+    stats = cache.get_stats()
+    assert (stats["expired"], stats["misses"], stats["memory_entries"]) == (1, 1, 0)
+
+def test_put_prunes_expired_disk_rows(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache = _cache(tmp_path, ttl=60)
+    cache.put("old", {"title": "old"}).result(timeout=5)
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    cache.put("new", {"title": "new"}).result(timeout=5)
+
+    rows = cache._get_conn().execute("SELECT note_id FROM note_cache").fetchall()
+    assert rows == [("new",)]
+
+def test_invalidate(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("a", {"title": "a"})
+
+    cache.invalidate("a").result(timeout=5)
+
+    assert cache.get("a") is None
+    assert _cache(tmp_path).get("a") is None
+    assert cache.get_stats()["hit_rate"] == 0.0
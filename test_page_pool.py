@@ -0,0 +1,42 @@
+"""页面池测试 - 用不启动浏览器的假上下文验证借出/排队计数"""
+
+import asyncio
+
+from browser_manager import PagePool
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def goto(self, url, timeout=None):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+class FakeContext:
+    async def new_page(self):
+        return FakePage()
+
+def test_cancelled_waiter_does_not_leak_load():
+    async def scenario():
+        pool = PagePool(FakeContext(), size=1)
+        page = await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert (pool.in_use, pool.waiting, pool.load) == (1, 1, 2)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert (pool.in_use, pool.waiting) == (1, 0)
+
+        await pool.release(page)
+        assert pool.load == 0
+
+        # 归还的页面被复用
+        assert await pool.acquire() is page
+        assert pool.in_use == 1
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+"""查询扩展测试 - 词表文件修改后自动重新加载，新文件有误时继续使用原词表"""
+
+import json
+import os
+
+from query_expansion import QueryExpander, load_expansion_table
+
+def _write_table(path, data, mtime: float):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # 显式设置修改时间，避免同一秒内两次写入的修改时间相同
+    os.utime(path, (mtime, mtime))
+
+def test_load_accepts_list_shorthand(tmp_path):
+    path = tmp_path / "expansions.json"
+    _write_table(path, {
+        "美食": ["火锅", "烧烤", "甜品", "奶茶"],
+        "旅行": {"terms": ["旅游", "出行"], "expansions": ["旅行攻略"]}
+    }, 1000)
+
+    table = load_expansion_table(str(path))
+
+    assert table["美食"] == (["火锅", "烧烤", "甜品", "奶茶"], ["火锅", "烧烤", "甜品"])
+    assert table["旅行"] == (["旅游", "出行"], ["旅行攻略"])
+
+def test_expand_merges_categories(tmp_path):
+    path = tmp_path / "expansions.json"
+    _write_table(path, {
+        "美食": {"terms": ["火锅"], "expansions": ["美食推荐", "探店"]},
+        "旅行": {"terms": ["旅游"], "expansions": ["旅行攻略", "探店"]}
+    }, 1000)
+    expander = QueryExpander(str(path), check_interval=0)
+
+    assert expander.match_categories("成都旅游吃火锅") == {"美食": 1, "旅行": 1}
+    assert expander.expand("成都旅游吃火锅") == ["美食推荐", "探店", "旅行攻略"]
+    assert expander.get_stats()["terms"] == 2
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "expansions.json"
+    _write_table(path, {"美食": {"terms": ["火锅"], "expansions": ["美食推荐"]}}, 1000)
+    expander = QueryExpander(str(path), check_interval=0)
+    assert expander.expand("露营装备") == []
+
+    _write_table(path, {"户外": {"terms": ["露营"], "expansions": ["露营攻略"]}}, 2000)
+
+    assert expander.expand("露营装备") == ["露营攻略"]
+    assert expander.expand("吃火锅") == []
+
+def test_keeps_table_when_new_file_is_invalid(tmp_path):
+    path = tmp_path / "expansions.json"
+    _write_table(path, {"美食": {"terms": ["火锅"], "expansions": ["美食推荐"]}}, 1000)
+    expander = QueryExpander(str(path), check_interval=0)
+
+    path.write_text("{不是JSON", encoding="utf-8")
+    os.utime(path, (2000, 2000))
+    assert expander.expand("吃火锅") == ["美食推荐"]
+
+    path.unlink()
+    assert expander.expand("吃火锅") == ["美食推荐"]
+
+def test_check_interval_limits_reloads(tmp_path):
+    path = tmp_path / "expansions.json"
+    _write_table(path, {"美食": {"terms": ["火锅"], "expansions": ["美食推荐"]}}, 1000)
+    expander = QueryExpander(str(path), check_interval=3600)
+
+    _write_table(path, {"户外": {"terms": ["露营"], "expansions": ["露营攻略"]}}, 2000)
+
+    assert expander.expand("吃火锅") == ["美食推荐"]
+    assert expander.reload()
+    assert expander.expand("露营装备") == ["露营攻略"]
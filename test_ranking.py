@@ -0,0 +1,51 @@
+"""排序测试 - BM25 分数与查询词的相关性一致"""
+
+import numpy as np
+
+from ranking import bm25_scores, rank_results
+
+def test_more_matches_score_higher():
+    documents = [["火锅", "推荐"], ["火锅", "火锅", "推荐"], ["西湖", "攻略"]]
+
+    scores = bm25_scores(["火锅"], documents)
+
+    assert scores[1] > scores[0] > scores[2] == 0
+
+def test_rare_terms_weigh_more():
+    documents = [["成都", "火锅"], ["成都", "串串"], ["成都", "旅行"]]
+
+    scores = bm25_scores(["成都", "火锅"], documents)
+
+    # "成都"出现在每篇文档中，IDF低于只出现一次的"火锅"
+    assert scores.argmax() == 0
+    assert scores[1] == scores[2] > 0
+
+def test_shorter_documents_score_higher():
+    documents = [["火锅"], ["火锅", "推荐", "本地人", "老店"], ["西湖"]]
+
+    scores = bm25_scores(["火锅"], documents)
+
+    assert scores[0] > scores[1]
+
+def test_empty_inputs():
+    assert bm25_scores(["火锅"], []).shape == (0,)
+    assert not bm25_scores([], [["火锅"]]).any()
+    assert np.array_equal(bm25_scores(["火锅"], [[], []], b=1.0), np.zeros(2))
+
+def test_rank_results_orders_by_title_and_body():
+    results = [
+        {"标题": "杭州西湖攻略", "链接": "a"},
+        {"标题": "周末吃什么", "链接": "b"},
+        {"标题": "成都火锅推荐", "链接": "c"}
+    ]
+
+    ranked = rank_results(results, ["火锅"], bodies={"b": "这家火锅店的牛油锅底很香"})
+
+    assert [result["链接"] for result in ranked] == ["c", "b", "a"]
+    assert ranked[0]["相关性评分"] > ranked[1]["相关性评分"] > 0
+    assert ranked[2]["相关性评分"] == 0
+
+def test_ties_keep_original_order():
+    results = [{"标题": "西湖", "链接": "a"}, {"标题": "断桥", "链接": "b"}]
+
+    assert [result["链接"] for result in rank_results(results, ["火锅"])] == ["a", "b"]
@@ -0,0 +1,35 @@
+"""持久化写入测试 - 同一批次中失败的任务不应留下部分写入"""
+
+from concurrent.futures import Future
+
+import pytest
+
+from storage import Storage, StorageWriter
+
+def _note(note_id: str) -> dict:
+    return {"note_id": note_id, "url": f"https://www.xiaohongshu.com/explore/{note_id}",
+            "title": note_id, "content": f"{note_id} 正文"}
+
+def test_failed_job_is_rolled_back_within_batch(tmp_path):
+    db_path = str(tmp_path / "storage.db")
+    writer = StorageWriter(db_path)
+    store = Storage(db_path)
+
+    def failing_job(store):
+        store.upsert_notes([_note("partial")])
+        raise RuntimeError("写入中途失败")
+
+    jobs = [
+        lambda store: store.upsert_notes([_note("before")]),
+        failing_job,
+        lambda store: store.upsert_notes([_note("after")])
+    ]
+    futures = [Future() for _ in jobs]
+    writer._write_batch(store, [(job, future, 0.0) for job, future in zip(jobs, futures)])
+
+    futures[0].result(timeout=0)
+    futures[2].result(timeout=0)
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=0)
+    assert set(store.get_note_contents(["before", "partial", "after"])) == {"before", "after"}
+    assert writer.get_stats()["failed"] == 1
@@ -0,0 +1,46 @@
+"""URL规范化测试 - 同一笔记的各种链接形式得到相同的笔记ID"""
+
+import pytest
+
+from url_canonical import parse_note_url, extract_note_id, has_access_token, note_key, process_url
+
+NOTE_ID = "65a1b2c3d4e5f60718293a4b"
+
+@pytest.mark.parametrize("url", [
+    f"https://www.xiaohongshu.com/explore/{NOTE_ID}",
+    f"http://xiaohongshu.com/explore/{NOTE_ID}",
+    f"@www.xiaohongshu.com/explore/{NOTE_ID}",
+    f"https://www.xiaohongshu.com/discovery/item/{NOTE_ID}?source=webshare",
+    f"https://www.xiaohongshu.com/search_result/{NOTE_ID}",
+    f"https://www.xiaohongshu.com/user/profile/5f1e2d3c4b5a69788796a5b4/{NOTE_ID}",
+    NOTE_ID
+])
+def test_path_variants_share_note_id(url):
+    assert extract_note_id(url) == NOTE_ID
+    assert note_key(url) == NOTE_ID
+
+def test_access_token_is_kept():
+    ref = parse_note_url(f"https://www.xiaohongshu.com/explore/{NOTE_ID}?xsec_token=AB%3D%3D&xsec_source=pc_feed")
+
+    assert (ref.xsec_token, ref.xsec_source) == ("AB==", "pc_feed")
+    assert ref.canonical_url == f"https://www.xiaohongshu.com/explore/{NOTE_ID}"
+    assert ref.navigation_url == f"{ref.canonical_url}?xsec_token=AB%3D%3D&xsec_source=pc_feed"
+
+def test_different_tokens_share_note_key():
+    first = f"https://www.xiaohongshu.com/explore/{NOTE_ID}?xsec_token=aaa&xsec_source=pc_search"
+    second = f"https://www.xiaohongshu.com/discovery/item/{NOTE_ID}?xsec_source=pc_user&xsec_token=bbb"
+
+    assert note_key(first) == note_key(second)
+    assert parse_note_url(second).xsec_token == "bbb"
+    assert has_access_token(first)
+    assert not has_access_token(f"https://www.xiaohongshu.com/explore/{NOTE_ID}")
+
+def test_missing_source_defaults_to_search():
+    url = process_url(f"xiaohongshu.com/search_result/{NOTE_ID}?xsec_token=abc")
+    assert url == f"https://www.xiaohongshu.com/explore/{NOTE_ID}?xsec_token=abc&xsec_source=pc_search"
+
+def test_non_note_urls():
+    assert parse_note_url("https://www.xiaohongshu.com/user/profile/5f1e2d3c4b5a69788796a5b4") is None
+    assert extract_note_id("") is None
+    assert note_key("http://xiaohongshu.com/search") == "https://www.xiaohongshu.com/search"
+    assert process_url("@xiaohongshu.com/search") == "https://www.xiaohongshu.com/search"
@@ -0,0 +1,121 @@
+"""URL规范化模块 - 从各种形式的笔记链接中提取规范的笔记ID和访问令牌，作为缓存、存储和去重的统一键"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+NOTE_BASE_URL = "https://www.xiaohongshu.com/explore/"
+
+# 笔记链接路径：/explore/<id>、/discovery/item/<id>、/search_result/<id>、/user/profile/<用户ID>/<id>
+# （正则同时兼容 JavaScript，页面脚本中按相同规则提取笔记ID）
+NOTE_PATH_REGEX = r'/(?:explore|discovery/item|search_result|user/profile/[0-9a-zA-Z]+)/([0-9a-zA-Z]+)'
+_NOTE_PATH_PATTERN = re.compile(NOTE_PATH_REGEX)
+# 直接传入的笔记ID（24位十六进制）
+_BARE_NOTE_ID_PATTERN = re.compile(r'^[0-9a-fA-F]{24}$')
+_XSEC_PARAM_PATTERN = re.compile(r'[?&#](xsec_token|xsec_source)=([^&#]*)')
+
+@dataclass(frozen=True)
+class NoteRef:
+    """规范化的笔记引用
+
+    同一笔记的不同链接（不同路径形式、不同 xsec_token/xsec_source 参数）得到相同的 note_id；
+    xsec_token 为打开笔记页面所需的访问令牌，链接中没有时为空字符串。
+    """
+    __slots__ = ("note_id", "xsec_token", "xsec_source")
+    note_id: str
+    xsec_token: str
+    xsec_source: str
+
+    @property
+    def canonical_url(self) -> str:
+        """不含参数的规范链接"""
+        return NOTE_BASE_URL + self.note_id
+
+    @property
+    def navigation_url(self) -> str:
+        """打开笔记页面使用的链接，有访问令牌时带上令牌参数"""
+        if not self.xsec_token:
+            return self.canonical_url
+        return (f"{self.canonical_url}?xsec_token={quote(self.xsec_token, safe='')}"
+                f"&xsec_source={quote(self.xsec_source or 'pc_search', safe='')}")
+
+def _normalize_url(url: str) -> str:
+    """修正协议、@前缀和域名"""
+    processed_url = url.strip()
+
+    # 移除可能的@符号前缀
+    if processed_url.startswith('@'):
+        processed_url = processed_url[1:]
+
+    # 确保URL使用https协议
+    if processed_url.startswith('http://'):
+        processed_url = 'https://' + processed_url[7:]
+    elif not processed_url.startswith('https://'):
+        processed_url = 'https://' + processed_url
+
+    # 如果URL不包含www.xiaohongshu.com，则添加它
+    if 'xiaohongshu.com' in processed_url and 'www.xiaohongshu.com' not in processed_url:
+        processed_url = processed_url.replace('xiaohongshu.com', 'www.xiaohongshu.com')
+
+    return processed_url
+
+@lru_cache(maxsize=4096)
+def parse_note_url(url: str):
+    """解析笔记链接或笔记ID，无法识别为笔记时返回None
+
+    Args:
+        url: 笔记链接（可带 @ 前缀、缺少协议或 www），也可以直接是笔记ID
+
+    Returns:
+        NoteRef: 规范化的笔记引用
+    """
+    text = (url or "").strip().lstrip('@')
+    if _BARE_NOTE_ID_PATTERN.match(text):
+        return NoteRef(text, "", "")
+
+    match = _NOTE_PATH_PATTERN.search(text)
+    if not match:
+        return None
+
+    params = {}
+    for name, value in _XSEC_PARAM_PATTERN.findall(text):
+        params.setdefault(name, unquote(value))
+    return NoteRef(match.group(1), params.get("xsec_token", ""), params.get("xsec_source", ""))
+
+def extract_note_id(url: str):
+    """从笔记URL中提取笔记ID，无法识别时返回None
+
+    Args:
+        url: 笔记 URL
+
+    Returns:
+        str: 笔记ID
+    """
+    ref = parse_note_url(url)
+    return ref.note_id if ref else None
+
+def has_access_token(url: str) -> bool:
+    """判断笔记链接是否带有访问令牌"""
+    ref = parse_note_url(url)
+    return bool(ref and ref.xsec_token)
+
+def note_key(url: str) -> str:
+    """缓存、存储和去重使用的键：能识别的笔记为笔记ID，否则为规范化后的URL"""
+    ref = parse_note_url(url)
+    return ref.note_id if ref else _normalize_url(url or "")
+
+@lru_cache(maxsize=4096)
+def process_url(url: str) -> str:
+    """处理URL，笔记链接统一为 /explore/<笔记ID> 形式并保留访问令牌，其他链接只修正协议和域名
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 处理后的URL
+    """
+    ref = parse_note_url(url)
+    if ref:
+        return ref.navigation_url
+    return _normalize_url(url)
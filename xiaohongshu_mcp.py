@@ -1,16 +1,109 @@
-"""小红书搜索和评论 MCP 服务器 - 重构版本"""
+"""小红书搜索和评论 MCP 服务器 - 重构版本
 
-from fastmcp import FastMCP
+各功能模块（及其依赖的 Playwright、SQLite 等）在工具首次调用时才导入，
+MCP 客户端启动服务器后可以立即响应工具列表请求。
+"""
 
-# 导入模块
-from config import DATA_DIR, TIMESTAMP
-from browser_manager import ensure_browser, login, reset_login
-from search_engine import search_notes, smart_search_notes, deep_search_and_analyze
-from content_analyzer import get_note_content, analyze_note
-from comment_manager import get_note_comments, post_smart_comment, post_comment
+import asyncio
+import importlib
+import sys
+from contextlib import asynccontextmanager
+from fastmcp import FastMCP, Context
+
+# 只导入配置常量（无副作用），用作工具参数的默认值
+from config import (
+    NOTE_BATCH_CONCURRENCY, NOTE_BATCH_MAX_RETRIES, COMMENT_MAX_COMMENTS, EXPORT_FILES,
+    PREWARM_BROWSER, init_environment
+)
+
+# 是否在启动时预热浏览器，命令行参数 --prewarm 可覆盖配置
+_prewarm_enabled = PREWARM_BROWSER
+
+@asynccontextmanager
+async def _server_lifespan(server):
+    """服务器生命周期：开启预热时在后台启动浏览器，不阻塞客户端的初始化和工具列表请求"""
+    prewarm_task = None
+    if _prewarm_enabled:
+        from browser_manager import prewarm_browser
+        prewarm_task = asyncio.create_task(prewarm_browser())
+    try:
+        yield {}
+    finally:
+        if prewarm_task is not None and not prewarm_task.done():
+            prewarm_task.cancel()
 
 # 初始化 FastMCP 服务器
-mcp = FastMCP("xiaohongshu_scraper")
+mcp = FastMCP("xiaohongshu_scraper", lifespan=_server_lifespan)
+
+# 延迟导出：保留 `from xiaohongshu_mcp import search_notes` 等用法，首次访问时才导入所在模块
+_LAZY_EXPORTS = {
+    "ensure_browser": "browser_manager",
+    "login": "browser_manager",
+    "reset_login": "browser_manager",
+    "get_resource_block_stats": "browser_manager",
+    "get_browser_timing": "browser_manager",
+    "get_worker_stats": "browser_manager",
+    "prewarm_browser": "browser_manager",
+    "search_notes": "search_engine",
+    "smart_search_notes": "search_engine",
+    "deep_search_and_analyze": "search_engine",
+    "fetch_note": "content_analyzer",
+    "fetch_notes": "content_analyzer",
+    "analyze_note": "content_analyzer",
+    "NoteRecord": "content_analyzer",
+    "get_note_comments": "comment_manager",
+    "sync_note_comments": "comment_manager",
+    "post_smart_comment": "comment_manager",
+    "post_comment": "comment_manager",
+    "note_cache": "note_cache",
+    "storage": "storage",
+    "storage_writer": "storage"
+}
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+def _progress_reporter(ctx: Context):
+    """生成向 MCP 客户端发送进度通知的回调，每批结果同时以日志消息推送给客户端"""
+    async def report(done: int, total: int, message: str = None):
+        if ctx is None:
+            return
+        try:
+            await ctx.report_progress(done, total)
+            if message:
+                await ctx.info(message)
+        except Exception as e:
+            print(f"发送进度通知时出错: {str(e)}")
+    return report
+
+def format_note_record(record) -> str:
+    """将 NoteRecord 笔记记录格式化为工具输出文本"""
+    if record.error:
+        return record.error
+    
+    result = f"标题: {record.title}\n"
+    result += f"作者: {record.author}\n"
+    result += f"发布时间: {record.publish_time}\n"
+    if record.liked_count:
+        result += f"互动: 点赞 {record.liked_count} · 收藏 {record.collected_count} · 评论 {record.comment_count}\n"
+    result += f"链接: {record.url}\n\n"
+    result += f"内容:\n{record.content}"
+    return result
+
+async def get_note_content(url: str, use_cache: bool = True, refresh: bool = False) -> str:
+    """获取笔记详细内容并格式化为文本
+    
+    Args:
+        url: 笔记 URL
+        use_cache: 是否使用笔记缓存
+        refresh: 是否跳过缓存重新获取
+    """
+    from content_analyzer import fetch_note
+    record = await fetch_note(url, use_cache=use_cache, refresh=refresh)
+    return format_note_record(record)
 
 @mcp.tool()
 async def login_xiaohongshu() -> str:
@@ -19,6 +112,7 @@ async def login_xiaohongshu() -> str:
     Returns:
         str: 登录状态信息
     """
+    from browser_manager import login
     return await login()
 
 @mcp.tool()
@@ -28,95 +122,163 @@ async def reset_login_status() -> str:
     Returns:
         str: 重置状态信息
     """
+    from browser_manager import reset_login
     return await reset_login()
 
 @mcp.tool()
-async def search_xiaohongshu_notes(keyword: str, limit: int = 10) -> str:
-    """搜索小红书笔记
+async def search_xiaohongshu_notes(keyword: str, limit: int = 10, export_files: bool = EXPORT_FILES,
+                                   ctx: Context = None) -> str:
+    """搜索小红书笔记，每提取到一批结果即通过进度通知推送给客户端
     
     Args:
         keyword: 搜索关键词
         limit: 搜索结果数量限制，默认10条
+        export_files: 是否额外导出CSV文件，结果总会保存到数据库，默认False
     
     Returns:
         str: 搜索结果
     """
-    return await search_notes(keyword, limit)
+    from search_engine import search_notes
+    return await search_notes(keyword, limit, progress=_progress_reporter(ctx), export_files=export_files)
 
 @mcp.tool()
-async def smart_search_xiaohongshu_notes(keyword: str, limit: int = 10) -> str:
-    """智能搜索小红书笔记（AI增强版）
+async def smart_search_xiaohongshu_notes(keyword: str, limit: int = 10, export_files: bool = EXPORT_FILES,
+                                         ctx: Context = None) -> str:
+    """智能搜索小红书笔记（AI增强版），各搜索策略的结果分批通过进度通知推送给客户端
     
     Args:
         keyword: 搜索关键词
         limit: 搜索结果数量限制，默认10条
+        export_files: 是否额外导出CSV/JSON文件，结果总会保存到数据库，默认False
     
     Returns:
         str: 智能搜索结果
     """
-    return await smart_search_notes(keyword, limit)
+    from search_engine import smart_search_notes
+    return await smart_search_notes(keyword, limit, progress=_progress_reporter(ctx), export_files=export_files)
 
 @mcp.tool()
-async def deep_search_and_analyze_notes(task_description: str, analyze_content: bool = True, limit: int = 5) -> str:
+async def deep_search_and_analyze_notes(task_description: str, analyze_content: bool = True, limit: int = 5,
+                                        export_files: bool = EXPORT_FILES) -> str:
     """深度搜索和分析小红书笔记
     
     Args:
         task_description: 任务描述
         analyze_content: 是否分析内容，默认True
         limit: 搜索结果数量限制，默认5条
+        export_files: 是否额外导出CSV/JSON文件，结果总会保存到数据库，默认False
     
     Returns:
         str: 深度分析结果
     """
-    return await deep_search_and_analyze(task_description, analyze_content, limit)
+    from search_engine import deep_search_and_analyze
+    return await deep_search_and_analyze(task_description, analyze_content, limit, export_files=export_files)
 
 @mcp.tool()
-async def get_xiaohongshu_note_content(url: str) -> str:
+async def get_xiaohongshu_note_content(url: str, use_cache: bool = True, refresh: bool = False) -> str:
     """获取小红书笔记详细内容
     
     Args:
         url: 笔记URL
+        use_cache: 是否使用笔记缓存，默认True
+        refresh: 是否忽略缓存重新获取，默认False
     
     Returns:
         str: 笔记内容
     """
-    return await get_note_content(url)
+    return await get_note_content(url, use_cache=use_cache, refresh=refresh)
+
+@mcp.tool()
+async def batch_get_xiaohongshu_note_contents(urls: list[str], concurrency: int = NOTE_BATCH_CONCURRENCY,
+                                              max_retries: int = NOTE_BATCH_MAX_RETRIES,
+                                              use_cache: bool = True, ctx: Context = None) -> str:
+    """批量获取多篇小红书笔记的详细内容，并发获取，单篇失败不影响其他笔记
+    
+    Args:
+        urls: 笔记URL列表
+        concurrency: 同时获取的笔记数上限，默认4
+        max_retries: 单篇笔记失败后的最大重试次数，默认2
+        use_cache: 是否使用笔记缓存，默认True
+    
+    Returns:
+        str: 每篇笔记的内容或错误信息
+    """
+    from content_analyzer import fetch_notes
+    records = await fetch_notes(urls, concurrency=concurrency, max_retries=max_retries,
+                                use_cache=use_cache, progress=_progress_reporter(ctx))
+    failed = sum(1 for record in records if record.error)
+    
+    result = f"批量获取完成: 共 {len(records)} 篇，成功 {len(records) - failed} 篇，失败 {failed} 篇\n"
+    for i, record in enumerate(records, 1):
+        result += f"\n========== [{i}] {record.url} ==========\n"
+        if record.error:
+            result += f"❌ 获取失败: {record.error}\n"
+        else:
+            result += format_note_record(record) + "\n"
+    
+    return result
 
 @mcp.tool()
-async def analyze_xiaohongshu_note(url: str) -> str:
+async def analyze_xiaohongshu_note(url: str, use_cache: bool = True, refresh: bool = False) -> str:
     """分析小红书笔记内容
     
     Args:
         url: 笔记URL
+        use_cache: 是否使用笔记缓存，默认True
+        refresh: 是否忽略缓存重新获取，默认False
     
     Returns:
         str: 分析结果
     """
-    result = await analyze_note(url)
-    if "error" in result:
-        return result["error"]
+    from content_analyzer import analyze_note
+    result = await analyze_note(url, use_cache=use_cache, refresh=refresh)
+    if result.error:
+        return result.error
     
     # 格式化返回结果
     formatted_result = f"笔记分析结果:\n"
-    formatted_result += f"标题: {result.get('标题', '未知')}\n"
-    formatted_result += f"作者: {result.get('作者', '未知')}\n"
-    formatted_result += f"领域: {', '.join(result.get('领域', []))}\n"
-    formatted_result += f"关键词: {', '.join(result.get('关键词', [])[:10])}\n"
-    formatted_result += f"内容预览: {result.get('内容', '')[:200]}..."
+    formatted_result += f"标题: {result.record.title}\n"
+    formatted_result += f"作者: {result.record.author}\n"
+    # 领域后附关键词命中次数，未命中任何领域时为默认的"生活"
+    domains = [f"{domain}({result.domain_hits[domain]})" if domain in result.domain_hits else domain
+               for domain in result.domains]
+    formatted_result += f"领域: {', '.join(domains)}\n"
+    formatted_result += f"关键词: {', '.join(result.keywords[:10])}\n"
+    formatted_result += f"内容预览: {result.record.content[:200]}..."
     
     return formatted_result
 
 @mcp.tool()
-async def get_xiaohongshu_note_comments(url: str) -> str:
-    """获取小红书笔记的评论
+async def get_xiaohongshu_note_comments(url: str, max_comments: int = COMMENT_MAX_COMMENTS,
+                                        expand_replies: bool = True) -> str:
+    """获取小红书笔记的评论，滚动评论区直到加载完毕或达到数量上限
     
     Args:
         url: 笔记URL
+        max_comments: 最多获取的评论数（含回复），默认200
+        expand_replies: 是否展开楼中楼回复，默认True
     
     Returns:
-        str: 评论内容
+        str: 按楼层整理的评论内容
     """
-    return await get_note_comments(url)
+    from comment_manager import get_note_comments
+    return await get_note_comments(url, max_comments=max_comments, expand_replies=expand_replies)
+
+@mcp.tool()
+async def sync_xiaohongshu_note_comments(url: str, max_comments: int = COMMENT_MAX_COMMENTS,
+                                         reset: bool = False) -> str:
+    """增量同步小红书笔记的评论，只返回上次同步之后的新评论，适合定期轮询
+    
+    Args:
+        url: 笔记URL
+        max_comments: 最多抓取的评论数（含回复），默认200
+        reset: 是否清除该笔记的同步记录并重新建立基线，默认False
+    
+    Returns:
+        str: 新增的评论内容
+    """
+    from comment_manager import sync_note_comments
+    return await sync_note_comments(url, max_comments=max_comments, reset=reset)
 
 @mcp.tool()
 async def generate_smart_comment(url: str, comment_type: str = "点赞") -> str:
@@ -129,6 +291,7 @@ async def generate_smart_comment(url: str, comment_type: str = "点赞") -> str:
     Returns:
         str: 智能评论建议
     """
+    from comment_manager import post_smart_comment
     return await post_smart_comment(url, comment_type)
 
 @mcp.tool()
@@ -142,10 +305,82 @@ async def post_xiaohongshu_comment(url: str, comment_text: str) -> str:
     Returns:
         str: 发布结果
     """
+    from comment_manager import post_comment
     return await post_comment(url, comment_text)
 
+@mcp.tool()
+async def get_runtime_stats() -> str:
+    """获取服务运行统计信息（浏览器启动耗时、资源拦截、笔记缓存、数据库等）
+    
+    Returns:
+        str: 运行统计信息
+    """
+    from browser_manager import get_resource_block_stats, get_browser_timing, get_worker_stats
+    from note_cache import note_cache
+    from storage import storage, storage_writer
+    from keyword_extractor import keyword_extractor
+    from query_expansion import query_expander
+    
+    timing = get_browser_timing()
+    block_stats = get_resource_block_stats()
+    cache_stats = note_cache.get_stats()
+    
+    result = "运行统计:\n\n"
+    result += "浏览器启动:\n"
+    if timing["cold_starts"]:
+        source = "启动预热" if timing["prewarmed"] else "首次工具调用"
+        result += f"  冷启动: {timing['cold_starts']} 次（{source}），最近 {timing['last_cold_start_ms']:.0f}ms，最长 {timing['max_cold_start_ms']:.0f}ms\n"
+    else:
+        result += "  冷启动: 浏览器尚未启动\n"
+    if timing["prewarmed"]:
+        result += f"  预热用时（含打开页面池页面）: {timing['prewarm_ms']:.0f}ms\n"
+    result += f"  热调用: {timing['warm_calls']} 次，平均 {timing['avg_warm_ms']:.1f}ms，最长 {timing['max_warm_ms']:.1f}ms\n"
+    workers = get_worker_stats()
+    if len(workers) > 1:
+        result += f"  浏览器实例: {len(workers)} 个\n"
+        for index, worker in enumerate(workers):
+            result += f"  - 实例{index}: 使用中页面 {worker['in_use']}/{worker['size']}，排队 {worker['waiting']}（{worker['profile']}）\n"
+    result += "\n"
+    result += "资源拦截:\n"
+    result += f"  拦截请求数: {block_stats['blocked_requests']}\n"
+    result += f"  估算节省流量: {block_stats['estimated_bytes_saved'] / 1024 / 1024:.2f} MB\n"
+    for resource_type, count in sorted(block_stats["by_type"].items()):
+        result += f"  - {resource_type}: {count}\n"
+    
+    result += "\n笔记缓存:\n"
+    result += f"  内存命中: {cache_stats['hits']}，磁盘命中: {cache_stats['disk_hits']}，未命中: {cache_stats['misses']}\n"
+    result += f"  命中率: {cache_stats['hit_rate']:.1%}\n"
+    result += f"  过期: {cache_stats['expired']}，淘汰: {cache_stats['evictions']}，写入: {cache_stats['writes']}\n"
+    result += f"  内存条目数: {cache_stats['memory_entries']}\n"
+    
+    keyword_stats = keyword_extractor.get_stats()
+    result += "\n关键词提取:\n"
+    result += f"  分词: {keyword_stats['segmenter']}，IDF 已统计笔记: {keyword_stats['documents']}，词数: {keyword_stats['terms']}\n"
+    expansion_stats = query_expander.get_stats()
+    result += f"  查询扩展词表: {expansion_stats['categories']} 个分类，{expansion_stats['terms']} 个匹配词（{expansion_stats['path']}）\n"
+    
+    try:
+        storage_stats = storage.get_stats()
+        result += "\n数据库:\n"
+        result += f"  笔记: {storage_stats['notes']}，搜索: {storage_stats['searches']}，搜索结果: {storage_stats['search_hits']}\n"
+        result += f"  评论: {storage_stats['comments']}，报告: {storage_stats['reports']}\n"
+    except Exception as e:
+        result += f"\n读取数据库统计时出错: {str(e)}\n"
+    
+    writer_stats = storage_writer.get_stats()
+    result += "\n后台持久化:\n"
+    result += f"  队列深度: {writer_stats['queue_depth']}，已提交: {writer_stats['submitted']}，"
+    result += f"已写入: {writer_stats['written']}，失败: {writer_stats['failed']}\n"
+    result += f"  批次数: {writer_stats['batches']}，平均写入耗时: {writer_stats['avg_write_ms']:.1f}ms，"
+    result += f"最大写入耗时: {writer_stats['max_write_ms']:.1f}ms，最长排队: {writer_stats['max_queue_wait_ms']:.1f}ms\n"
+    
+    return result
+
 if __name__ == "__main__":
-    # 初始化并运行服务器
-    print("启动小红书MCP服务器（重构版本）...")
-    print("请在MCP客户端（如Claude for Desktop）中配置此服务器")
+    # 初始化运行环境并运行服务器（stdio 传输占用标准输出，提示信息输出到标准错误）
+    if "--prewarm" in sys.argv:
+        _prewarm_enabled = True
+    init_environment()
+    print("启动小红书MCP服务器（重构版本）...", file=sys.stderr)
+    print("请在MCP客户端（如Claude for Desktop）中配置此服务器", file=sys.stderr)
     mcp.run(transport='stdio')
\ No newline at end of file